@@ -0,0 +1,72 @@
+"""
+Бенчмарки проекта. Запускаются из корня репозитория как модули:
+
+    python -m benchmarks.cache_backends --json bench_output.json
+
+Каждый бенчмарк печатает таблицу и при --json сохраняет результаты,
+чтобы сравнивать прогоны между собой.
+"""
+import json
+import os
+import statistics
+import time
+
+
+def setup_django(settings_module="yatube.settings"):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+    django.setup()
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples):
+    """Сводка по замерам в секундах: число, среднее и перцентили в мс."""
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.mean(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 0.50) * 1000,
+        "p95_ms": percentile(samples, 0.95) * 1000,
+        "p99_ms": percentile(samples, 0.99) * 1000,
+    }
+
+
+def timed(func, repeat):
+    samples = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def print_table(rows, columns):
+    widths = [
+        max(len(str(column)), *(len(format_cell(row.get(column))) for row in rows))
+        for column in columns
+    ]
+    print("  ".join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(
+            format_cell(row.get(c)).ljust(w) for c, w in zip(columns, widths)))
+
+
+def format_cell(value):
+    if isinstance(value, float):
+        return "%.3f" % value
+    return "" if value is None else str(value)
+
+
+def write_json(path, name, results):
+    if not path:
+        return
+    with open(path, "w") as output:
+        json.dump({"benchmark": name, "results": results}, output,
+                  indent=2, ensure_ascii=False)
+    print("Результаты сохранены в %s" % path)
@@ -0,0 +1,165 @@
+"""
+Пропускная способность читающих страниц под WSGI и ASGI при параллельной
+нагрузке.
+
+Запускается на заполненной базе (см. команду seed_yatube):
+
+    python -m benchmarks.asgi [--concurrency 16] [--requests 400]
+                              [--latency 2] [--json out.json]
+
+Запросы выполняются в этом же процессе, без сети: WSGI — приложение
+yatube.wsgi в пуле из concurrency потоков, как у многопоточного сервера;
+ASGI — yatube.asgi из concurrency одновременных корутин в одном цикле
+событий. Запросы идут от читателя с сессией: анонимам страницы отдаются
+из кэша, и замер был бы не о базе. --latency добавляет задержку к каждому
+запросу к базе, как у сервера базы по сети: на SQLite в том же процессе
+разница между путями почти не видна.
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import print_table, setup_django, summarize, write_json
+from benchmarks.feeds import sample
+
+
+ROUTES = ("index", "group", "profile", "post", "follow_index")
+
+
+def add_latency(seconds):
+    """Задерживает каждый запрос к базе на seconds (только для замера)."""
+    from django.db.backends.utils import CursorWrapper
+
+    execute = CursorWrapper._execute
+
+    def delayed(self, *args, **kwargs):
+        time.sleep(seconds)
+        return execute(self, *args, **kwargs)
+    CursorWrapper._execute = delayed
+
+
+def session_cookie(user):
+    from django.test import Client
+
+    client = Client()
+    client.force_login(user)
+    return "; ".join(
+        "%s=%s" % (name, morsel.value) for name, morsel in client.cookies.items())
+
+
+def scope_for(url, cookie):
+    return {
+        "type": "http", "method": "GET", "path": url, "query_string": b"",
+        "headers": [(b"host", b"localhost"), (b"cookie", cookie.encode())],
+        "server": ("localhost", 80), "client": ("10.0.0.1", 0),
+        "scheme": "http", "http_version": "1.1",
+    }
+
+
+def run_wsgi(url, cookie, total, concurrency):
+    from yatube.asgi import build_environ
+    from yatube.wsgi import application
+
+    scope = scope_for(url, cookie)
+    statuses = []
+
+    def request(_):
+        started = time.perf_counter()
+        response = application(
+            build_environ(scope, b""),
+            lambda status, headers, exc_info=None: statuses.append(status[:3]))
+        try:
+            b"".join(response)
+        finally:
+            response.close()
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        samples = list(pool.map(request, range(total)))
+        elapsed = time.perf_counter() - started
+    return samples, elapsed, sorted(set(statuses))
+
+
+def run_asgi(url, cookie, total, concurrency):
+    from yatube.asgi import application
+
+    scope = scope_for(url, cookie)
+    statuses = []
+    samples = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(str(message["status"]))
+
+    async def worker(queue):
+        while queue:
+            queue.pop()
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            samples.append(time.perf_counter() - started)
+
+    async def main():
+        queue = list(range(total))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(queue) for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(main())
+    return samples, elapsed, sorted(set(statuses))
+
+
+def run(total, concurrency):
+    from django.urls import reverse
+
+    data = sample()
+    cookie = session_cookie(data["reader"])
+    kwargs = data["kwargs"]
+    urls = {
+        "index": reverse("index"),
+        "group": reverse("group", kwargs={"slug": kwargs["slug"]}),
+        "profile": reverse("profile", kwargs={"username": kwargs["username"]}),
+        "post": reverse("post", kwargs={
+            "username": kwargs["username"], "post_id": kwargs["post_id"]}),
+        "follow_index": reverse("follow_index"),
+    }
+    results = []
+    for name in ROUTES:
+        for mode, runner in (("wsgi", run_wsgi), ("asgi", run_asgi)):
+            # Прогрев: шаблоны, соединения потоков, пулы
+            runner(urls[name], cookie, concurrency, concurrency)
+            samples, elapsed, statuses = runner(
+                urls[name], cookie, total, concurrency)
+            row = {"name": name, "mode": mode, "status": ",".join(statuses)}
+            row["rps"] = total / elapsed
+            row.update(summarize(samples))
+            results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400,
+                        help="Запросов на каждую страницу и режим")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Задержка каждого запроса к базе, мс")
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    setup_django()
+    if args.latency:
+        add_latency(args.latency / 1000)
+    results = run(args.requests, args.concurrency)
+    print_table(results, [
+        "name", "mode", "status", "rps", "p50_ms", "p95_ms", "p99_ms",
+    ])
+    write_json(args.json_path, "asgi", results)
+
+
+if __name__ == "__main__":
+    main()
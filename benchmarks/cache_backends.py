@@ -0,0 +1,102 @@
+"""
+Сравнение бэкендов кэша: LocMemCache, FileBasedCache и SQLiteCache.
+
+Замеряются set/get/incr в одном процессе и incr одного ключа из нескольких
+процессов: итоговое значение показывает, видят ли процессы общий кэш и не
+теряются ли увеличения.
+
+    python -m benchmarks.cache_backends [--repeat 2000] [--workers 4] [--json out.json]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+from benchmarks import print_table, setup_django, summarize, timed, write_json
+
+
+VALUE = "<div class='card'>%s</div>" % ("x" * 2000)
+
+
+def backends(directory):
+    return {
+        "locmem": ("django.core.cache.backends.locmem.LocMemCache", {
+            "LOCATION": "bench",
+        }),
+        "filebased": ("django.core.cache.backends.filebased.FileBasedCache", {
+            "LOCATION": os.path.join(directory, "filebased"),
+            "OPTIONS": {"MAX_ENTRIES": 100000},
+        }),
+        "sqlite": ("yatube.sqlite_cache.SQLiteCache", {
+            "LOCATION": os.path.join(directory, "cache.sqlite3"),
+            "OPTIONS": {"MAX_ENTRIES": 100000},
+        }),
+    }
+
+
+def create(name, directory):
+    from django.core.cache import _create_cache
+    backend, params = backends(directory)[name]
+    return _create_cache(backend, **params)
+
+
+def incr_worker(name, directory, times):
+    setup_django()
+    cache = create(name, directory)
+    for _ in range(times):
+        cache.incr("shared-counter")
+
+
+def run(repeat, workers):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name in backends(directory):
+            cache = create(name, directory)
+            cache.clear()
+            row = {"backend": name}
+            for op, func in (
+                ("set", lambda i: cache.set("key:%d" % i, VALUE)),
+                ("get_hit", lambda i: cache.get("key:%d" % i)),
+                ("get_miss", lambda i: cache.get("missing:%d" % i)),
+                ("incr", lambda i: cache.incr("counter")),
+            ):
+                if op == "incr":
+                    cache.set("counter", 0)
+                row[op + "_p50_ms"] = summarize(timed(func, repeat))["p50_ms"]
+
+            cache.set("shared-counter", 0, None)
+            per_worker = max(repeat // 10, 1)
+            context = multiprocessing.get_context("fork")
+            processes = [
+                context.Process(
+                    target=incr_worker, args=(name, directory, per_worker))
+                for _ in range(workers)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            row["shared_incr"] = "%s/%s" % (
+                cache.get("shared-counter"), per_worker * workers)
+            results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    setup_django()
+    results = run(args.repeat, args.workers)
+    print_table(results, [
+        "backend", "set_p50_ms", "get_hit_p50_ms", "get_miss_p50_ms",
+        "incr_p50_ms", "shared_incr",
+    ])
+    write_json(args.json_path, "cache_backends", results)
+
+
+if __name__ == "__main__":
+    main()
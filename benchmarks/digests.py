@@ -0,0 +1,146 @@
+"""
+Время и память рассылки дайджестов (posts/notifications.py) в зависимости
+от числа подписчиков.
+
+    python -m benchmarks.digests [--followers 10000 50000 100000]
+                                 [--batch 1000] [--posts 3] [--json out.json]
+
+Для каждого числа подписчиков в отдельном процессе создаётся новая база:
+один автор, --posts его постов за последний час и подписчики с почтой.
+Письма принимает CountingBackend: он только считает их, чтобы замер был о
+сборке дайджестов, а не о почтовом сервере. Пиковая память измеряется
+tracemalloc во втором прогоне, потому что он замедляет выполнение.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.mail.backends.base import BaseEmailBackend
+
+from benchmarks import print_table, write_json
+
+
+class CountingBackend(BaseEmailBackend):
+    sent = 0
+
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            message.message()
+        CountingBackend.sent += len(email_messages)
+        return len(email_messages)
+
+
+def configure(directory, batch):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+    from django.conf import settings
+
+    settings.DATABASES = {"default": {
+        "ENGINE": "yatube.sqlite_backend",
+        "NAME": os.path.join(directory, "digests.sqlite3"),
+        "OPTIONS": settings.SQLITE_OPTIONS,
+    }}
+    settings.DATABASE_REPLICAS = []
+    settings.CACHES = {"default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    settings.JOBS_EMAIL_BACKEND = "benchmarks.digests.CountingBackend"
+    settings.NOTIFY_DIGEST_BATCH = batch
+    import django
+    django.setup()
+
+
+def seed(followers, posts):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from django.utils import timezone
+
+    from posts.models import Follow, Post
+    from posts.transfer import keep_dates
+
+    call_command("migrate", verbosity=0)
+    User = get_user_model()
+    author = User.objects.create_user("author")
+    published = timezone.now() - timedelta(hours=1)
+    with keep_dates([Post]):
+        Post.objects.bulk_create(
+            Post(text="Пост номер %d" % i, author=author, pub_date=published)
+            for i in range(posts))
+    chunk = 5000
+    for start in range(0, followers, chunk):
+        users = User.objects.bulk_create(
+            User(username="reader%d" % i, email="reader%d@example.com" % i,
+                 password="!")
+            for i in range(start, min(start + chunk, followers)))
+        if not users[0].pk:
+            users = User.objects.filter(username__startswith="reader") \
+                .order_by("-pk")[:len(users)]
+        Follow.objects.bulk_create(Follow(user=user, author=author) for user in users)
+
+
+def run_case(followers, options, directory, queue):
+    configure(directory, options["batch"])
+    from posts import notifications
+    from posts.models import DigestRun
+
+    seed(followers, options["posts"])
+
+    started = time.perf_counter()
+    sent = notifications.send(notifications.next_run())
+    elapsed = time.perf_counter() - started
+
+    DigestRun.objects.all().delete()
+    tracemalloc.start()
+    notifications.send(notifications.next_run())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    queue.put({
+        "followers": followers,
+        "batch": options["batch"],
+        "emails": sent,
+        "seconds": elapsed,
+        "emails_per_s": sent / elapsed if elapsed else 0.0,
+        "peak_mb": peak / 1024 / 1024,
+        "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def run(options):
+    results = []
+    context = multiprocessing.get_context("fork")
+    for followers in options["followers"]:
+        with tempfile.TemporaryDirectory() as directory:
+            queue = context.Queue()
+            process = context.Process(
+                target=run_case, args=(followers, options, directory, queue))
+            process.start()
+            process.join()
+            if process.exitcode:
+                raise SystemExit("Замер для %d подписчиков упал" % followers)
+            results.append(queue.get())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--followers", type=int, nargs="+",
+                        default=[10000, 50000, 100000])
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=3)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    results = run(vars(args))
+    print_table(results, [
+        "followers", "batch", "emails", "seconds", "emails_per_s",
+        "peak_mb", "maxrss_mb",
+    ])
+    write_json(args.json_path, "digests", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Задержка и число запросов к базе для страниц из posts/urls.py.
+
+Запускается на заполненной базе (см. команду seed_yatube):
+
+    python manage.py seed_yatube --users 100000 --posts 1000000
+    python -m benchmarks.feeds [--repeat 50] [--cold] [--json out.json]
+
+Каждый URL запрашивается через тестовый клиент Django repeat раз. Для
+параметров берутся самый активный автор, его последний пост, самая
+большая группа и читатель с наибольшим числом подписок. --cold очищает
+кэш перед каждым запросом, и замер показывает страницы без кэша.
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks import print_table, setup_django, summarize, write_json
+
+
+# GET на эти адреса меняет подписки: повторные замеры были бы не о том
+MUTATING = {"profile_follow", "profile_unfollow"}
+
+
+def sample():
+    from django.contrib.auth import get_user_model
+    from django.db.models import Count
+
+    from posts.models import Group, Post
+    from users.models import Profile
+
+    User = get_user_model()
+    author = User.objects.filter(profile__isnull=False) \
+        .order_by("-profile__post_count").first()
+    reader_profile = Profile.objects.order_by("-following_count").first()
+    if author is None or reader_profile is None:
+        raise SystemExit("База пуста: сначала выполните manage.py seed_yatube")
+    post = Post.objects.filter(author=author).order_by("-pub_date").first()
+    group = Group.objects.annotate(size=Count("post")).order_by("-size").first()
+    return {
+        "author": author,
+        "reader": reader_profile.user,
+        "kwargs": {
+            "username": author.username,
+            "post_id": post.pk if post else 0,
+            "slug": group.slug if group else "",
+        },
+        "query": (post.text.split() or [""])[0] if post else "",
+    }
+
+
+def targets(data):
+    """(имя маршрута, адрес) для каждого маршрута posts/urls.py."""
+    from django.urls import reverse
+
+    from posts.urls import urlpatterns
+
+    for pattern in urlpatterns:
+        if pattern.name in MUTATING:
+            continue
+        converters = pattern.pattern.converters
+        url = reverse(pattern.name, kwargs={
+            name: data["kwargs"][name] for name in converters
+        })
+        if pattern.name == "search":
+            url += "?q=" + data["query"]
+        yield pattern.name, url
+
+
+def client_for(user):
+    from django.test import Client
+
+    # Адрес не из INTERNAL_IPS: иначе замеры включали бы debug_toolbar
+    client = Client(HTTP_HOST="localhost", REMOTE_ADDR="10.0.0.1")
+    if user is not None:
+        client.force_login(user)
+    return client
+
+
+def measure(client, url, repeat, cold):
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    samples, queries, status = [], [], None
+    for _ in range(repeat):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            samples.append(time.perf_counter() - started)
+        queries.append(len(context.captured_queries))
+        status = response.status_code
+    return samples, queries, status
+
+
+def run(repeat, cold):
+    data = sample()
+    clients = {
+        "anonymous": client_for(None),
+        "reader": client_for(data["reader"]),
+        # Форму редактирования видит только автор поста
+        "author": client_for(data["author"]),
+    }
+    results = []
+    for name, url in targets(data):
+        for client_name in ("anonymous", "reader"):
+            if name == "post_edit" and client_name == "reader":
+                client_name = "author"
+            samples, queries, status = measure(
+                clients[client_name], url, repeat, cold)
+            row = {"name": name, "url": url, "client": client_name, "status": status}
+            row.update(summarize(samples))
+            row["queries"] = statistics.mean(queries)
+            row["max_queries"] = max(queries)
+            results.append(row)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--cold", action="store_true",
+                        help="Очищать кэш перед каждым запросом")
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    setup_django()
+    results = run(args.repeat, args.cold)
+    print_table(results, [
+        "name", "client", "status", "p50_ms", "p95_ms", "p99_ms",
+        "queries", "max_queries", "url",
+    ])
+    write_json(args.json_path, "feeds", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Накладные расходы ограничения частоты (yatube/ratelimit.py) на запрос.
+
+Замеряется view, которая сразу возвращает ответ, с декоратором ratelimit
+и без него, на LocMemCache и на SQLiteCache (общий кэш воркеров). У
+пользователя и IP свои корзины, то есть две атомарные операции кэша на
+запрос. Лимиты заданы так, чтобы ни один запрос не получил 429.
+
+    python -m benchmarks.ratelimit [--repeat 5000] [--json out.json]
+"""
+import argparse
+import tempfile
+
+from benchmarks import print_table, setup_django, summarize, timed, write_json
+from benchmarks.cache_backends import create
+
+
+def run(repeat):
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.http import HttpResponse
+    from django.test import RequestFactory
+
+    from yatube import ratelimit
+
+    settings.RATELIMIT_ENABLED = True
+    settings.RATE_LIMITS = {"bench": {
+        "user": ("1000000/s", 1000000), "ip": ("1000000/s", 1000000),
+    }}
+
+    def view(request):
+        return HttpResponse()
+
+    limited = ratelimit.ratelimit("bench")(view)
+    request = RequestFactory().post("/new/")
+    request.user = get_user_model()(pk=1, username="bench")
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("locmem", "sqlite"):
+            ratelimit.cache = create(name, directory)
+            ratelimit.cache.clear()
+            base = summarize(timed(lambda i: view(request), repeat))
+            with_limit = summarize(timed(lambda i: limited(request), repeat))
+            results.append({
+                "cache": name,
+                "view_p50_ms": base["p50_ms"],
+                "limited_p50_ms": with_limit["p50_ms"],
+                "limited_p99_ms": with_limit["p99_ms"],
+                "overhead_mean_ms": with_limit["mean_ms"] - base["mean_ms"],
+                "overhead_p50_ms": with_limit["p50_ms"] - base["p50_ms"],
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5000)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    setup_django()
+    results = run(args.repeat)
+    print_table(results, [
+        "cache", "view_p50_ms", "limited_p50_ms", "limited_p99_ms",
+        "overhead_mean_ms", "overhead_p50_ms",
+    ])
+    write_json(args.json_path, "ratelimit", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Стандартный бэкенд SQLite против yatube.sqlite_backend при смешанной
+нагрузке: одни потоки публикуют посты (POST /new/), другие читают ленту
+(GET /).
+
+    python -m benchmarks.sqlite_tuning [--writers 4] [--readers 12]
+                                       [--seconds 10] [--json out.json]
+
+Каждый вариант запускается в своём процессе на новой базе во временном
+каталоге: миграции, --users авторов и --posts постов. Запросы идут через
+WSGI-обработчик Django, как у многопоточного сервера, поэтому работает и
+CONN_MAX_AGE (тестовый клиент Django закрывать соединения не даёт).
+Читатели вошли на сайт: иначе ленту отдавал бы кэш страниц, а не база.
+Ответы 5xx — в основном «database is locked» — считаются ошибками.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+from benchmarks import print_table, summarize, write_json
+
+
+VARIANTS = {
+    "django": ("django.db.backends.sqlite3", 0, {}),
+    "tuned": ("yatube.sqlite_backend", 60, None),
+}
+
+
+def configure(name, directory):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "yatube.settings")
+    from django.conf import settings
+
+    engine, max_age, options = VARIANTS[name]
+    settings.DATABASES = {"default": {
+        "ENGINE": engine,
+        "NAME": os.path.join(directory, "%s.sqlite3" % name),
+        "CONN_MAX_AGE": max_age,
+        "OPTIONS": settings.SQLITE_OPTIONS if options is None else options,
+    }}
+    settings.DATABASE_REPLICAS = []
+    # Замеряется база, а не ограничение частоты записи
+    settings.RATELIMIT_ENABLED = False
+    settings.CACHES["default"]["LOCATION"] = os.path.join(
+        directory, "%s-cache.sqlite3" % name)
+    import django
+    django.setup()
+    # Ошибки 5xx считаются, а не печатаются
+    logging.disable(logging.CRITICAL)
+
+
+def seed(users, posts):
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+
+    from posts.models import Post
+
+    call_command("migrate", verbosity=0)
+    User = get_user_model()
+    authors = [User.objects.create_user("bench%d" % i) for i in range(users)]
+    Post.objects.bulk_create(
+        Post(text="Пост номер %d" % i, author=authors[i % users])
+        for i in range(posts))
+    call_command("recount", stdout=open(os.devnull, "w"))
+    return authors
+
+
+def cookies_for(user):
+    from django.conf import settings
+    from django.middleware.csrf import _get_new_csrf_token
+    from django.test import Client
+
+    client = Client()
+    client.force_login(user)
+    token = _get_new_csrf_token()
+    cookie = "%s=%s; %s=%s" % (
+        settings.SESSION_COOKIE_NAME,
+        client.cookies[settings.SESSION_COOKIE_NAME].value,
+        settings.CSRF_COOKIE_NAME, token)
+    return cookie, token
+
+
+def request(application, method, path, cookie, token=None, body=b""):
+    from yatube.asgi import build_environ
+
+    headers = [(b"host", b"localhost"), (b"cookie", cookie.encode())]
+    if method == "POST":
+        headers += [
+            (b"content-type", b"application/x-www-form-urlencoded"),
+            (b"content-length", str(len(body)).encode()),
+            (b"x-csrftoken", token.encode()),
+        ]
+    environ = build_environ({
+        "type": "http", "method": method, "path": path, "query_string": b"",
+        "headers": headers, "client": ("10.0.0.1", 0),
+    }, body)
+    status = []
+    response = application(
+        environ, lambda line, headers, exc_info=None: status.append(int(line[:3])))
+    try:
+        b"".join(response)
+    finally:
+        response.close()
+    return status[0]
+
+
+def run_variant(name, directory, options, results):
+    configure(name, directory)
+    from django.core.wsgi import get_wsgi_application
+
+    authors = seed(options["users"], options["posts"])
+    application = get_wsgi_application()
+    samples = {"new_post": [], "index": []}
+    errors = {"new_post": 0, "index": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + options["seconds"]
+
+    def worker(op, user, number):
+        cookie, token = cookies_for(user)
+        sequence = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if op == "new_post":
+                sequence += 1
+                body = urlencode(
+                    {"text": "Новый пост %d-%d" % (number, sequence)}).encode()
+                status = request(application, "POST", "/new/", cookie, token, body)
+            else:
+                status = request(application, "GET", "/", cookie)
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples[op].append(elapsed)
+                errors[op] += status >= 500
+
+    threads = [
+        threading.Thread(target=worker, args=("new_post", authors[i % len(authors)], i))
+        for i in range(options["writers"])
+    ] + [
+        threading.Thread(target=worker, args=("index", authors[-1 - i % len(authors)], i))
+        for i in range(options["readers"])
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = []
+    for op in ("new_post", "index"):
+        row = {"variant": name, "op": op}
+        row.update(summarize(samples[op]))
+        row["rps"] = len(samples[op]) / options["seconds"]
+        row["errors"] = errors[op]
+        rows.append(row)
+    results.put(rows)
+
+
+def run(options):
+    results = []
+    context = multiprocessing.get_context("fork")
+    with tempfile.TemporaryDirectory() as directory:
+        for name in VARIANTS:
+            queue = context.Queue()
+            process = context.Process(
+                target=run_variant, args=(name, directory, options, queue))
+            process.start()
+            results.extend(queue.get())
+            process.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=12)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    results = run(vars(args))
+    print_table(results, [
+        "variant", "op", "count", "rps", "errors", "p50_ms", "p95_ms", "p99_ms",
+    ])
+    write_json(args.json_path, "sqlite_tuning", results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Post, Group
+from . import jobs
+from .models import Post, Group, ImageVariant, Job, ThumbnailJob
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -19,3 +20,41 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 admin.site.register(Group, GroupAdmin)
+
+
+class ThumbnailJobAdmin(admin.ModelAdmin):
+    list_display = ("image", "status", "attempts", "updated")
+    list_filter = ("status",)
+    search_fields = ("image",)
+
+
+admin.site.register(ThumbnailJob, ThumbnailJobAdmin)
+
+
+class ImageVariantAdmin(admin.ModelAdmin):
+    list_display = ("name", "format", "width", "height", "size")
+    list_filter = ("format", "width")
+    search_fields = ("image",)
+
+
+admin.site.register(ImageVariant, ImageVariantAdmin)
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "task", "status", "priority", "attempts", "run_at", "updated")
+    list_filter = ("status", "task")
+    search_fields = ("task", "key", "payload")
+    readonly_fields = ("created", "updated")
+    actions = ("retry",)
+
+    def retry(self, request, queryset):
+        count = jobs.retry(queryset)
+        self.message_user(request, "Поставлено в очередь заново: %d" % count)
+    retry.short_description = "Поставить в очередь заново"
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = dict(extra_context or {}, jobs_summary=jobs.summary())
+        return super().changelist_view(request, extra_context)
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,200 @@
+"""
+JSON API лент для мобильного клиента.
+
+    GET /api/posts/               — все посты
+    GET /api/<username>/posts/    — посты автора
+    GET /api/follow/              — лента подписок (нужен вход)
+
+Параметры: ?cursor= из ссылок next/previous и ?limit= (до MAX_LIMIT).
+Строки читаются через .values(), без создания моделей и без шаблонов,
+и отдаются потоком. ETag строится из версии ленты (см. caching) и
+параметров запроса, Last-Modified — дата самого нового поста ленты.
+Если лента не менялась, опрос получает 304 до чтения страницы.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
+
+from . import caching, timeline
+from .models import Post, TimelineEntry, User
+from .pagination import FEED_ORDERING, CursorPaginator
+from yatube.db_router import replica_reads
+
+
+API_VERSION = 1
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+FIELDS = (
+    "id", "text", "pub_date", "image", "comment_count",
+    "author__username", "group__slug", "group__title",
+)
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        return DEFAULT_LIMIT
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def _etag(request, *parts):
+    raw = ":".join(str(part) for part in (
+        API_VERSION, *parts, request.GET.get("cursor", ""), _limit(request),
+    ))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _newest(feed, queryset):
+    # Пока версия ленты та же, самый новый пост тоже не менялся
+    key = "api-newest:%s:%s" % (feed, caching.feed_version(feed))
+    cached = cache.get(key)
+    if cached is None:
+        cached = (queryset.aggregate(newest=Max("pub_date"))["newest"],)
+        cache.set(key, cached, caching.feed_timeout(feed))
+    return cached[0]
+
+
+def feed_reads(feed_func):
+    """
+    replica_reads для ленты feed_func(request, ...), но вскоре после её
+    изменения чтение идёт на primary: ETag и тело ответа согласованы.
+    """
+    def decorator(view):
+        replica_view = replica_reads(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if caching.recently_bumped(feed_func(request, *args, **kwargs)):
+                return view(request, *args, **kwargs)
+            return replica_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def serialize(row):
+    group = None
+    if row["group__slug"]:
+        group = {"slug": row["group__slug"], "title": row["group__title"]}
+    return {
+        "id": row["id"],
+        "text": row["text"],
+        "pub_date": row["pub_date"].isoformat(),
+        "author": row["author__username"],
+        "group": group,
+        "image": default_storage.url(row["image"]) if row["image"] else None,
+        "comment_count": row["comment_count"],
+        "url": reverse("post", args=[row["author__username"], row["id"]]),
+    }
+
+
+def _link(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params["cursor"] = cursor
+    return request.build_absolute_uri("?" + params.urlencode())
+
+
+def _stream(request, page):
+    yield '{"results":['
+    for index, row in enumerate(page):
+        yield ("," if index else "") + json.dumps(serialize(row), ensure_ascii=False)
+    yield '],"next":%s,"previous":%s}' % (
+        json.dumps(_link(request, page.next_cursor)),
+        json.dumps(_link(request, page.previous_cursor)),
+    )
+
+
+def feed_response(request, queryset, ordering=FEED_ORDERING):
+    names = [name.lstrip("-") for name in ordering if name.lstrip("-") not in FIELDS]
+    paginator = CursorPaginator(
+        queryset.values(*FIELDS, *names), _limit(request), ordering)
+    page = paginator.get_page(request.GET.get("cursor"))
+    response = StreamingHttpResponse(
+        _stream(request, page), content_type="application/json; charset=utf-8")
+    # клиент может хранить ответ, но перед показом обязан перепроверить его
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@feed_reads(lambda request: caching.INDEX_FEED)
+@require_GET
+@condition(
+    etag_func=lambda request: _etag(
+        request, caching.INDEX_FEED, caching.feed_version(caching.INDEX_FEED)),
+    last_modified_func=lambda request: _newest(
+        caching.INDEX_FEED, Post.objects.all()),
+)
+def index(request):
+    return feed_response(request, Post.objects.order_by(*FEED_ORDERING))
+
+
+def _profile_etag(request, username):
+    feed = caching.profile_feed(username)
+    return _etag(request, feed, caching.feed_version(feed))
+
+
+def _profile_newest(request, username):
+    return _newest(
+        caching.profile_feed(username),
+        Post.objects.filter(author__username=username))
+
+
+@feed_reads(lambda request, username: caching.profile_feed(username))
+@require_GET
+@condition(etag_func=_profile_etag, last_modified_func=_profile_newest)
+def profile(request, username):
+    # Как и HTML-профиль, неизвестный автор — 404, а не пустая лента
+    author_id = User.objects.filter(username=username) \
+        .values_list("pk", flat=True).first()
+    if author_id is None:
+        return JsonResponse({"detail": "Автор не найден"}, status=404)
+    posts = Post.objects.filter(author_id=author_id).order_by(*FEED_ORDERING)
+    return feed_response(request, posts)
+
+
+def _follow_state(request):
+    # Одним запросом по индексу: число записей ленты и самая новая из них
+    if not hasattr(request, "_follow_state"):
+        request._follow_state = TimelineEntry.objects.filter(user=request.user) \
+            .aggregate(count=Count("id"), newest=Max("pub_date"))
+    return request._follow_state
+
+
+def _follow_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    state = _follow_state(request)
+    # Версия общей ленты меняется при любом изменении постов и комментариев,
+    # а число записей — при отписке
+    return _etag(
+        request, "follow", request.user.pk,
+        caching.feed_version(caching.INDEX_FEED),
+        state["count"], state["newest"],
+    )
+
+
+def _follow_newest(request):
+    if not request.user.is_authenticated:
+        return None
+    return _follow_state(request)["newest"]
+
+
+# Без replica_reads, как и posts.views.follow_index: лента подписок пишет
+@require_GET
+@condition(etag_func=_follow_etag, last_modified_func=_follow_newest)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({"detail": "Нужно войти"}, status=401)
+    posts = timeline.feed_for(request.user).order_by(*timeline.FEED_ORDERING)
+    return feed_response(request, posts, timeline.FEED_ORDERING)
@@ -0,0 +1,19 @@
+"""Маршруты posts.urls, где читающие view заменены асинхронными."""
+from django.urls import path
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+ASYNC_VIEWS = {
+    "index": async_views.index,
+    "group": async_views.group_posts,
+    "profile": async_views.profile,
+    "post": async_views.post_view,
+    "follow_index": async_views.follow_index,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,105 @@
+"""
+Асинхронные версии читающих view для ASGI (yatube/asgi.py).
+
+Контекст и шаблоны те же, что у posts.views. Запросы к базе и рендеринг
+(шаблон тоже может обращаться к базе, например за request.user) идут
+через run_db, а независимые запросы выполняются одновременно.
+"""
+import asyncio
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import get_object_or_404, render
+
+from yatube.aio import run_db, sync_view
+from yatube.db_router import replica_reads
+
+from . import caching, timeline
+from .forms import CommentForm
+from .models import Group, Post, User
+from .pagination import CursorPaginator, paginate
+from .views import COMMENT_ORDERING, post_comment_list
+
+
+async def _index(request):
+    paginator, page = await run_db(paginate, request, Post.objects.for_feed())
+    return await run_db(render, request, "index.html", {
+        "page": page, "paginator": paginator, "feed": caching.INDEX_FEED,
+    })
+
+
+async def _group_posts(request, slug):
+    # Посты выбираются по slug группы, не дожидаясь самой группы
+    group, (paginator, page) = await asyncio.gather(
+        run_db(get_object_or_404, Group, slug=slug),
+        run_db(paginate, request, Post.objects.for_feed().filter(group__slug=slug)),
+    )
+    return await run_db(render, request, "group.html", {
+        "group": group, "page": page, "paginator": paginator,
+        "feed": caching.group_feed(slug),
+    })
+
+
+async def _profile(request, username):
+    author = await run_db(
+        get_object_or_404, User.objects.select_related("profile"), username=username)
+    post_list = Post.objects.for_feed().filter(author=author)
+    # кнопку подписки рендерит дыра follow_button, как и в posts.views
+    paginator, page = await run_db(
+        paginate, request, post_list, count=author.profile.post_count)
+    return await run_db(render, request, "profile.html", {
+        "page": page,
+        "paginator": paginator,
+        "author": author,
+        "post_list": post_list,
+        "username": username,
+        "feed": caching.profile_feed(username),
+    })
+
+
+async def _post_view(request, username, post_id):
+    comments = post_comment_list(post_id)
+    paginator = CursorPaginator(comments, settings.COMMENTS_FIRST_PAGE, COMMENT_ORDERING)
+    # Пост, автор со счётчиком постов и первая страница комментариев
+    # друг от друга не зависят
+    post, author, items = await asyncio.gather(
+        run_db(get_object_or_404, Post.objects.for_feed(), pk=post_id),
+        run_db(get_object_or_404, User.objects.select_related("profile"), username=username),
+        run_db(paginator.get_page, request.GET.get("cursor")),
+    )
+    return await run_db(render, request, "post.html", {
+        "post": post,
+        "author": author,
+        "post_count": author.profile.post_count,
+        "form": CommentForm(),
+        "comments": comments,
+        "items": items,
+    })
+
+
+def _follow_page(request):
+    post_list = timeline.feed_for(request.user).for_feed() \
+        .order_by(*timeline.FEED_ORDERING)
+    return paginate(
+        request, post_list, count=timeline.feed_count(request.user),
+        ordering=timeline.FEED_ORDERING)
+
+
+async def _follow_index(request):
+    # Подтягивание постов «знаменитостей», число записей и страница ленты
+    # идут друг за другом, но цикл событий не блокируют
+    paginator, page = await run_db(_follow_page, request)
+    return await run_db(render, request, "follow.html", {
+        "page": page, "paginator": paginator,
+    })
+
+
+index = replica_reads(caching.cache_feed_page(
+    lambda request: caching.INDEX_FEED)(sync_view(_index)))
+group_posts = replica_reads(caching.cache_feed_page(
+    lambda request, slug: caching.group_feed(slug))(sync_view(_group_posts)))
+profile = replica_reads(caching.cache_feed_page(
+    lambda request, username: caching.profile_feed(username))(sync_view(_profile)))
+post_view = replica_reads(sync_view(_post_view))
+# лента подписок пишет в primary, см. posts.views.follow_index
+follow_index = login_required(sync_view(_follow_index))
@@ -0,0 +1,261 @@
+"""
+Кэш лент с поколениями (generation-based caching).
+
+У каждой ленты есть номер версии в кэше. Он входит в ключи закэшированных
+страниц и фрагментов. При сохранении или удалении поста версии его лент
+увеличиваются, и старые записи просто перестают читаться. Поэтому кэш можно
+держать долго, не рискуя показать устаревшие данные.
+
+Страница ленты кэшируется как «скелет»: она рендерится от имени анонимного
+посетителя, а части, зависящие от пользователя (меню, ссылки на
+редактирование, кнопка подписки), вместо HTML содержат метки-«дыры» (тег
+{% hole %}). Скелет общий для всех. Перед ответом дыры заполняются
+шаблонами для текущего пользователя; анонимным посетителям заполненная
+страница кэшируется целиком.
+"""
+import base64
+import hashlib
+import json
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template import Context, Engine
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from yatube import db_router
+
+
+INDEX_FEED = "index"
+STATS_KINDS = ("page", "skeleton", "fragment", "post")
+
+# Текст постов в скелете экранирован, поэтому метку может вставить только
+# тег {% hole %}
+HOLE_RE = re.compile(r"<!--hole:([A-Za-z0-9_=-]+)-->")
+
+_holes = {}
+
+
+def feed_timeout(feed=None):
+    """
+    Срок хранения записей ленты feed. Страница, собранная с реплики вскоре
+    после изменения ленты, может не содержать изменения: такие записи
+    живут не дольше REPLICA_MAX_LAG.
+    """
+    timeout = getattr(settings, "FEED_CACHE_TIMEOUT", 60 * 60 * 24)
+    if feed is not None and db_router.current_replica() is not None \
+            and recently_bumped(feed):
+        return min(timeout, replica_max_lag())
+    return timeout
+
+
+def replica_max_lag():
+    return getattr(settings, "REPLICA_MAX_LAG", 5)
+
+
+def group_feed(slug):
+    return "group:%s" % slug
+
+
+def profile_feed(username):
+    return "profile:%s" % username
+
+
+def post_feeds(post):
+    """Ленты, в которых показывается пост."""
+    feeds = [INDEX_FEED, profile_feed(post.author.username)]
+    if post.group_id:
+        feeds.append(group_feed(post.group.slug))
+    return feeds
+
+
+def _version_key(feed):
+    return "feed-version:%s" % feed
+
+
+def _bumped_key(feed):
+    return "feed-bumped:%s" % feed
+
+
+def recently_bumped(feed):
+    """Лента менялась последние REPLICA_MAX_LAG: реплика могла отстать."""
+    return cache.get(_bumped_key(feed)) is not None
+
+
+def feed_version(feed):
+    # Начальная версия — текущее время в миллисекундах: если ключ версии
+    # вытеснят из кэша, новая версия не совпадёт ни с одной из старых
+    return cache.get_or_set(_version_key(feed), int(time.time() * 1000), None)
+
+
+def bump_feeds(feeds):
+    for feed in set(feeds):
+        try:
+            cache.incr(_version_key(feed))
+        except ValueError:
+            cache.set(_version_key(feed), int(time.time() * 1000), None)
+    if db_router.replicas():
+        cache.set_many(
+            {_bumped_key(feed): time.time() for feed in set(feeds)},
+            replica_max_lag())
+
+
+def _counter_key(kind, outcome):
+    return "feed-cache:%s:%s" % (kind, outcome)
+
+
+def record(kind, hit, count=1):
+    if not count:
+        return
+    key = _counter_key(kind, "hit" if hit else "miss")
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, count)
+
+
+def stats():
+    """Счётчики попаданий и промахов: {"page": {"hit": .., "miss": ..}, ...}"""
+    keys = [
+        _counter_key(kind, outcome)
+        for kind in STATS_KINDS for outcome in ("hit", "miss")
+    ]
+    values = cache.get_many(keys)
+    return {
+        kind: {
+            outcome: values.get(_counter_key(kind, outcome), 0)
+            for outcome in ("hit", "miss")
+        }
+        for kind in STATS_KINDS
+    }
+
+
+def make_key(prefix, feed, *vary_on):
+    digest = hashlib.md5(
+        ":".join(str(value) for value in vary_on).encode()).hexdigest()
+    return "%s:%s:%s:%s" % (prefix, feed, feed_version(feed), digest)
+
+
+def post_key(post):
+    """
+    Ключ карточки поста. Кроме версии поста в него входит то, что меняется
+    в обход Post.save(): число комментариев, имена автора и группы.
+    """
+    group = (post.group.slug, post.group.title) if post.group_id else ()
+    digest = hashlib.md5(":".join(
+        str(value) for value in
+        (post.comment_count, post.author.username) + group
+    ).encode()).hexdigest()
+    return "post-item:%s:%s:%s" % (post.pk, post.version, digest)
+
+
+def hole(name, template_name):
+    """
+    Регистрирует дыру name: функция получает request и аргументы тега
+    {% hole %} и возвращает контекст шаблона template_name. Шаблону
+    доступны также request и user.
+    """
+    def decorator(func):
+        _holes[name] = (template_name, func)
+        return func
+    return decorator
+
+
+def rendering_skeleton(request):
+    return getattr(request, "feed_skeleton", False)
+
+
+def punching_holes(context):
+    """Дыры рендерятся метками: в скелете страницы и в карточках постов."""
+    return context.get("punch_holes", False) \
+        or rendering_skeleton(context.get("request"))
+
+
+def hole_marker(name, kwargs):
+    data = json.dumps([name, kwargs], sort_keys=True).encode()
+    return "<!--hole:%s-->" % base64.urlsafe_b64encode(data).decode()
+
+
+def render_hole(request, name, kwargs, context=None):
+    """HTML дыры name для пользователя запроса."""
+    template_name, func = _holes[name]
+    values = {"request": request, "user": request.user}
+    values.update(func(request, **kwargs))
+    context = context.new(values) if context is not None else Context(values)
+    return Engine.get_default().get_template(template_name).render(context)
+
+
+def fill_holes(request, content):
+    def replace(match):
+        name, kwargs = json.loads(base64.urlsafe_b64decode(match.group(1)))
+        return render_hole(request, name, kwargs)
+    return HOLE_RE.sub(replace, content)
+
+
+def _cached_response(cached):
+    content, content_type = cached
+    return HttpResponse(content, content_type=content_type)
+
+
+def _skeleton(view, feed, request, args, kwargs):
+    key = make_key("feed-skeleton", feed, request.get_full_path())
+    cached = cache.get(key)
+    record("skeleton", cached is not None)
+    if cached is not None:
+        return _cached_response(cached)
+    user = request.user
+    request.user, request.feed_skeleton = AnonymousUser(), True
+    try:
+        response = view(request, *args, **kwargs)
+    finally:
+        request.user, request.feed_skeleton = user, False
+    if response.status_code == 200:
+        cache.set(
+            key, (response.content, response["Content-Type"]), feed_timeout(feed))
+    return response
+
+
+def cache_feed_page(feed_for_request):
+    """
+    Кэширует страницу ленты: анонимным посетителям — целиком, остальным —
+    общий скелет, в который вставляются их дыры.
+    feed_for_request получает аргументы view и возвращает имя ленты.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            feed = feed_for_request(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                response = _skeleton(view, feed, request, args, kwargs)
+                if response.status_code == 200:
+                    response.content = fill_holes(
+                        request, response.content.decode(response.charset))
+                patch_cache_control(response, private=True)
+            else:
+                key = make_key("feed-page", feed, request.get_full_path())
+                cached = cache.get(key)
+                record("page", cached is not None)
+                if cached is not None:
+                    response = _cached_response(cached)
+                else:
+                    response = _skeleton(view, feed, request, args, kwargs)
+                    if response.status_code == 200:
+                        response.content = fill_holes(
+                            request, response.content.decode(response.charset))
+                        cache.set(
+                            key,
+                            (response.content, response["Content-Type"]),
+                            feed_timeout(feed),
+                        )
+            patch_vary_headers(response, ("Cookie",))
+            return response
+        return wrapper
+    return decorator
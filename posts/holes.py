@@ -0,0 +1,30 @@
+"""
+Дыры в закэшированных страницах лент (см. posts/caching.py): части,
+которые отличаются у разных пользователей и рендерятся на каждый запрос.
+Они должны быть дешёвыми — не больше одного запроса к базе на дыру.
+"""
+from .caching import hole
+from .models import Follow
+
+
+@hole("nav", "holes/nav.html")
+def nav(request):
+    return {}
+
+
+@hole("menu", "holes/menu.html")
+def menu(request, index=False, follow=False):
+    return {"index": index, "follow": follow}
+
+
+@hole("post_actions", "holes/post_actions.html")
+def post_actions(request, author, post_id):
+    return {"author": author, "post_id": post_id}
+
+
+@hole("follow_button", "holes/follow_button.html")
+def follow_button(request, author):
+    user = request.user
+    following = user.is_authenticated and user.username != author \
+        and Follow.objects.filter(user=user, author__username=author).exists()
+    return {"author": author, "following": following}
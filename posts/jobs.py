@@ -0,0 +1,156 @@
+"""
+Очередь отложенных действий в базе.
+
+То, что не нужно для ответа на запрос, — раскладка поста по лентам
+подписчиков, поисковый индекс, отправка писем — выполняют воркеры команды
+run_workers. enqueue() записывает задачу в той же транзакции, что и
+основную запись (view, которые пишут, оборачивают запись в
+transaction.atomic()): при откате задачи не будет, а после коммита её
+заберёт воркер, и запрос не ждёт побочных действий.
+
+Задача — функция модуля с декоратором @task, аргументы передаются по
+имени и сериализуются в JSON. Упавшая задача повторяется через
+JOBS_RETRY_DELAY * 2**(попытка - 1) секунд (не дольше JOBS_MAX_RETRY_DELAY),
+после max_attempts попыток остаётся со статусом «Ошибка». Первыми
+выполняются задачи с большим priority.
+
+При JOBS_EAGER задачи выполняются сразу после коммита в том же процессе:
+так работают тесты.
+"""
+import json
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import workers
+from .models import Job
+
+
+HIGH = 10
+NORMAL = 0
+LOW = -10
+
+_tasks = {}
+
+
+def task(func):
+    """Регистрирует функцию как задачу очереди под её полным именем."""
+    func.task_name = "%s.%s" % (func.__module__, func.__qualname__)
+    _tasks[func.task_name] = func
+    return func
+
+
+def get_task(name):
+    func = _tasks.get(name)
+    if func is None:
+        func = import_string(name)
+        if getattr(func, "task_name", None) != name:
+            raise ValueError("%s is not a task" % name)
+    return func
+
+
+def eager():
+    return getattr(settings, "JOBS_EAGER", False)
+
+
+def retry_delay(attempts):
+    """Пауза перед повтором после attempts неудачных попыток, с разбросом."""
+    base = getattr(settings, "JOBS_RETRY_DELAY", 5)
+    limit = getattr(settings, "JOBS_MAX_RETRY_DELAY", 60 * 60)
+    delay = min(base * 2 ** (attempts - 1), limit)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def enqueue(func, priority=NORMAL, key=None, delay=0, max_attempts=5, **kwargs):
+    """
+    Ставит в очередь вызов func(**kwargs). Если задача с тем же key ещё
+    ждёт в очереди, новая не создаётся: возвращается ожидающая.
+    """
+    payload = json.dumps(kwargs, sort_keys=True)
+    if eager():
+        transaction.on_commit(lambda: func(**json.loads(payload)))
+        return None
+    job = Job(
+        task=func.task_name, payload=payload, key=key, priority=priority,
+        max_attempts=max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+    if key is None:
+        job.save()
+        return job
+    try:
+        with transaction.atomic():
+            job.save()
+    except IntegrityError:
+        existing = Job.objects.filter(key=key).first()
+        if existing is not None:
+            return existing
+        # ожидавшую задачу только что забрал воркер: ключ свободен
+        job.pk = None
+        job.save()
+    return job
+
+
+def claim(limit):
+    """Забирает из очереди до limit готовых к запуску задач."""
+    # Ключ освобождается: изменения после запуска требуют новой задачи
+    return workers.claim(
+        Job.objects.filter(run_at__lte=timezone.now()), limit,
+        ordering=("-priority", "run_at", "id"), key=None)
+
+
+def run(name, payload):
+    """Выполняет задачу; вызывается в процессе пула."""
+    return get_task(name)(**json.loads(payload))
+
+
+def finish(job, error=None):
+    job.attempts += 1
+    if error is None:
+        job.status, job.error = Job.DONE, ""
+    else:
+        job.error = error
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + retry_delay(job.attempts)
+    job.save(update_fields=["status", "attempts", "error", "run_at", "updated"])
+
+
+def requeue_stale(older_than):
+    """Возвращает в очередь задачи, зависшие после падения воркера."""
+    return workers.requeue_stale(Job, older_than)
+
+
+def retry(queryset):
+    """Снова ставит задачи в очередь с чистым счётчиком попыток."""
+    return queryset.exclude(status=Job.RUNNING).update(
+        status=Job.PENDING, attempts=0, error="", run_at=timezone.now())
+
+
+def purge(older_than):
+    """Удаляет выполненные задачи старше older_than."""
+    return Job.objects.filter(
+        status=Job.DONE, updated__lt=timezone.now() - older_than,
+    ).delete()[0]
+
+
+def summary():
+    """Число задач по статусам и время ожидания самой старой готовой."""
+    counts = dict(
+        Job.objects.values_list("status").annotate(count=Count("id"))
+        .order_by())
+    oldest = Job.objects.filter(status=Job.PENDING, run_at__lte=timezone.now()) \
+        .aggregate(value=Min("run_at"))["value"]
+    return {
+        "counts": [
+            (label, counts.get(status, 0)) for status, label in Job.STATUSES
+        ],
+        "oldest_wait": timezone.now() - oldest if oldest else None,
+    }
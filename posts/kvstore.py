@@ -0,0 +1,59 @@
+"""
+Хранилище ключей sorl-thumbnail: таблица в базе и LRU в памяти процесса.
+
+Стандартный cached_db_kvstore на каждую миниатюру ходит в общий кэш, а при
+промахе — в базу и к файлам в хранилище. Здесь индекс миниатюр постоянно
+хранится в базе (модель sorl KVStore), а повторные чтения обслуживает LRU
+процесса, так что показ страницы не обращается ни к кэшу, ни к файлам.
+
+    THUMBNAIL_KVSTORE = "posts.kvstore.KVStore"
+"""
+from django.conf import settings
+from sorl.thumbnail.kvstores.base import KVStoreBase
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from yatube.lru import LRUCache
+
+
+# Отметка «ключа нет в базе»: повторные промахи тоже не идут в базу
+MISSING = object()
+
+lru = LRUCache(
+    maxsize=getattr(settings, "THUMBNAIL_LRU_SIZE", 10000),
+    timeout=getattr(settings, "THUMBNAIL_LRU_TIMEOUT", 300),
+)
+
+
+class KVStore(KVStoreBase):
+
+    def _get_raw(self, key):
+        value = lru.get(key)
+        if value is None:
+            value = KVStoreModel.objects.filter(key=key) \
+                .values_list("value", flat=True).first()
+            lru.set(key, MISSING if value is None else value)
+        return None if value is MISSING else value
+
+    def _set_raw(self, key, value):
+        KVStoreModel.objects.update_or_create(key=key, defaults={"value": value})
+        lru.set(key, value)
+
+    def _delete_raw(self, *keys):
+        KVStoreModel.objects.filter(key__in=keys).delete()
+        for key in keys:
+            lru.delete(key)
+
+    def _find_keys_raw(self, prefix):
+        return KVStoreModel.objects.filter(key__startswith=prefix) \
+            .values_list("key", flat=True)
+
+
+def indexed_thumbnails(kvstore):
+    """Имена файлов всех миниатюр, записанных в индексе sorl."""
+    names = set()
+    for key in kvstore._find_keys(identity="thumbnails"):
+        for thumbnail_key in kvstore._get(key, identity="thumbnails") or []:
+            thumbnail = kvstore._get(thumbnail_key)
+            if thumbnail is not None:
+                names.add(thumbnail.name)
+    return names
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from posts import timeline
+from posts.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет ленты подписок (TimelineEntry) по текущим подпискам "
+        "и удаляет записи от авторов, на которых больше никто не подписан."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", action="append", dest="users", default=[],
+            help="Обработать только ленту этого пользователя (можно несколько раз)",
+        )
+        parser.add_argument(
+            "--no-prune", action="store_false", dest="prune",
+            help="Не удалять записи ленты без подписки",
+        )
+
+    def handle(self, *args, **options):
+        follows = Follow.objects.all()
+        entries = TimelineEntry.objects.all()
+        if options["users"]:
+            follows = follows.filter(user__username__in=options["users"])
+            entries = entries.filter(user__username__in=options["users"])
+
+        if options["prune"]:
+            subscribed = Follow.objects.filter(
+                user=OuterRef("user"), author=OuterRef("author"))
+            stale = entries.annotate(subscribed=Exists(subscribed)) \
+                .filter(subscribed=False)
+            stale_ids = list(stale.values_list("pk", flat=True))
+            deleted = 0
+            for start in range(0, len(stale_ids), timeline.BATCH_SIZE):
+                chunk = stale_ids[start:start + timeline.BATCH_SIZE]
+                deleted += TimelineEntry.objects.filter(pk__in=chunk).delete()[0]
+            # Посты «знаменитостей» читаются на лету и в ленте не нужны
+            deleted += entries.filter(
+                author__profile__follower_count__gt=timeline.fanout_limit(),
+            ).delete()[0]
+            self.stdout.write(f"Удалено записей ленты: {deleted}")
+
+        if not options["users"]:
+            added = timeline.backfill_all()
+            self.stdout.write(self.style.SUCCESS(f"Добавлено записей ленты: {added}"))
+            return
+
+        count = 0
+        pairs = follows.values_list("user_id", "author_id")
+        for user_id, author_id in pairs.iterator():
+            timeline.backfill(user_id, author_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Обработано подписок: {count}"))
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает группы, пользователей, посты, комментарии и подписки "
+        "в NDJSON для import_yatube."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "output", nargs="?", default="-",
+            help="Файл для выгрузки; по умолчанию — стандартный вывод",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Сколько строк читать из базы за один запрос",
+        )
+
+    def handle(self, *args, **options):
+        def progress(label, count):
+            # Сообщения не должны смешиваться с выгрузкой в stdout
+            self.stderr.write(f"{label}: {count}")
+
+        if options["output"] == "-":
+            transfer.export(sys.stdout, options["batch_size"], progress)
+            return
+        with open(options["output"], "w", encoding="utf-8") as stream:
+            transfer.export(stream, options["batch_size"], progress)
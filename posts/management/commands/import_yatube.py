@@ -0,0 +1,54 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает NDJSON из export_yatube пачками через bulk_create, затем "
+        "один раз пересчитывает счётчики, ленты подписок и поисковый индекс. "
+        "Прерванную загрузку можно продолжить с --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="Файл, созданный export_yatube")
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Сколько объектов вставлять за одну транзакцию",
+        )
+        parser.add_argument(
+            "--resume", action="store_true",
+            help="Продолжить с места, сохранённого в файле <input>.checkpoint",
+        )
+
+    def handle(self, *args, **options):
+        path = options["input"]
+        checkpoint_path = path + ".checkpoint"
+        offset = 0
+        if options["resume"] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint_file:
+                offset = int(checkpoint_file.read() or 0)
+            self.stdout.write(f"Продолжаем с байта {offset}")
+
+        def checkpoint(position):
+            with open(checkpoint_path, "w") as checkpoint_file:
+                checkpoint_file.write(str(position))
+
+        def progress(label, count):
+            self.stdout.write(f"{label}: {count}")
+
+        try:
+            with open(path, "rb") as stream:
+                counts = transfer.import_stream(
+                    stream, options["batch_size"], offset, checkpoint, progress)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        self.stdout.write("Пересчёт производных данных...")
+        transfer.rebuild_derived(options["batch_size"], stdout=self.stdout)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(
+            "Загружено объектов: %d" % sum(counts.values())))
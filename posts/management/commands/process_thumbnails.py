@@ -0,0 +1,75 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.workers import InlineExecutor, close_connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Нарезает варианты картинок (размеры и форматы для srcset) "
+        "из очереди ThumbnailJob в пуле процессов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Число процессов в пуле; 0 — без пула, в этом процессе",
+        )
+        parser.add_argument(
+            "--batch", type=int, default=20,
+            help="Сколько задач забирать из очереди за раз",
+        )
+        parser.add_argument(
+            "--poll", type=float, default=2.0,
+            help="Пауза в секундах, когда очередь пуста",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Обработать очередь и завершиться",
+        )
+        parser.add_argument(
+            "--enqueue-missing", action="store_true",
+            help="Поставить в очередь картинки всех постов без задачи",
+        )
+
+    def handle(self, *args, **options):
+        if options["enqueue_missing"]:
+            count = thumbnails.enqueue_missing()
+            self.stdout.write(f"Поставлено в очередь: {count}")
+        thumbnails.requeue_stale(timedelta(minutes=10))
+
+        if options["workers"] < 1:
+            self.process(InlineExecutor(), options)
+            return
+        close_connections()
+        with ProcessPoolExecutor(
+                max_workers=options["workers"],
+                initializer=close_connections) as pool:
+            self.process(pool, options)
+
+    def process(self, pool, options):
+        while True:
+            jobs = thumbnails.claim(options["batch"])
+            if not jobs:
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+                continue
+            futures = [
+                (job, pool.submit(thumbnails.generate, job.image))
+                for job in jobs
+            ]
+            for job, future in futures:
+                try:
+                    variants = future.result()
+                except Exception as error:
+                    thumbnails.finish(job, error=repr(error))
+                    self.stderr.write(f"{job.image}: {error!r}")
+                else:
+                    thumbnails.finish(job, variants=variants)
+            self.stdout.write(f"Обработано задач: {len(jobs)}")
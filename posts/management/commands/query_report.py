@@ -0,0 +1,65 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Сводит журнал медленных и повторяющихся запросов (QUERY_LOG_FILE) "
+        "по view, строке кода и строке шаблона."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--log", default=None,
+            help="Файл журнала; по умолчанию QUERY_LOG_FILE",
+        )
+        parser.add_argument(
+            "--kind", choices=("slow", "duplicate", "similar"),
+            help="Показать только находки этого вида",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20,
+            help="Сколько мест показать",
+        )
+
+    def handle(self, *args, **options):
+        path = options["log"] or settings.QUERY_LOG_FILE
+        groups = defaultdict(lambda: {"requests": 0, "queries": 0, "ms": 0.0})
+        try:
+            with open(path, encoding="utf-8") as log:
+                for line in log:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if options["kind"] and entry.get("kind") != options["kind"]:
+                        continue
+                    key = (
+                        entry.get("kind"), entry.get("view"), entry.get("code"),
+                        entry.get("template"),
+                    )
+                    group = groups[key]
+                    group["requests"] += 1
+                    group["queries"] += entry.get("count", 1)
+                    group["ms"] += entry.get("ms", 0.0)
+                    group["sql"] = entry.get("sql", "")
+        except FileNotFoundError:
+            # Файл журнала создаётся при первой находке
+            pass
+
+        if not groups:
+            self.stdout.write("Находок нет")
+            return
+        # Сначала места, где лишние запросы отнимают больше всего времени
+        ranked = sorted(groups.items(), key=lambda item: item[1]["ms"], reverse=True)
+        for (kind, view, code, template), group in ranked[:options["limit"]]:
+            self.stdout.write(
+                f"{kind:<9} {view}  запросов: {group['requests']}, "
+                f"SQL: {group['queries']}, {group['ms']:.1f} мс"
+            )
+            self.stdout.write(f"          {code or '?'}" + (
+                f"  шаблон {template}" if template else ""))
+            self.stdout.write(f"          {group['sql'][:200]}")
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит поисковый индекс постов и комментариев заново. Нужна после "
+        "загрузки данных в обход сигналов или смены SEARCH_BACKEND."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=500,
+            help="Сколько постов индексировать за одну транзакцию",
+        )
+
+    def handle(self, *args, **options):
+        total = search.rebuild(options["batch_size"])
+        self.stdout.write(
+            f"Проиндексировано постов: {total} ({search.get_backend().name})")
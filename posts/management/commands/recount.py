@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from posts import caching
+from posts.models import Comment, Follow, Post
+from users.models import Profile
+
+User = get_user_model()
+
+
+def batches(queryset, batch_size):
+    """Идентификаторы записей пачками по возрастанию pk, без OFFSET."""
+    last_pk = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last_pk).order_by("pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not ids:
+            return
+        yield ids
+        last_pk = ids[-1]
+
+
+def counted(model, field, outer):
+    """
+    Подзапрос: сколько строк model ссылаются через field на outer внешней
+    записи. Считается внутри того же UPDATE, поэтому приращения F() из
+    сигналов не теряются между чтением и записью.
+    """
+    rows = model.objects.filter(**{field: OuterRef(outer)}).order_by() \
+        .values(field).annotate(total=Count("id")).values("total")
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def drifted(queryset, counts):
+    """Записи, у которых сохранённый счётчик расходится с подсчётом."""
+    actual = {"actual_" + name: value for name, value in counts.items()}
+    drift = Q()
+    for name in counts:
+        drift |= ~Q(**{name: F("actual_" + name)})
+    return queryset.annotate(**actual).filter(drift)
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает денормализованные счётчики: число постов и подписок "
+        "в профилях пользователей и число комментариев у постов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Сколько записей обрабатывать за один запрос",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        created = 0
+        for ids in batches(User.objects.filter(profile__isnull=True), batch_size):
+            Profile.objects.bulk_create(
+                [Profile(user_id=pk) for pk in ids], ignore_conflicts=True)
+            created += len(ids)
+
+        profile_counts = {
+            "post_count": counted(Post, "author", "user_id"),
+            "follower_count": counted(Follow, "author", "user_id"),
+            "following_count": counted(Follow, "user", "user_id"),
+        }
+        fixed_profiles = 0
+        for ids in batches(Profile.objects.all(), batch_size):
+            changed = dict(
+                drifted(Profile.objects.filter(pk__in=ids), profile_counts)
+                .values_list("pk", "user__username")
+            )
+            if changed:
+                Profile.objects.filter(pk__in=changed).update(**profile_counts)
+                # закэшированные страницы профилей показывают старые числа
+                caching.bump_feeds(
+                    caching.profile_feed(username) for username in changed.values())
+            fixed_profiles += len(changed)
+
+        post_counts = {"comment_count": counted(Comment, "post", "pk")}
+        fixed_posts = 0
+        for ids in batches(Post.objects.all(), batch_size):
+            changed = list(
+                drifted(Post.objects.filter(pk__in=ids), post_counts)
+                .select_related("author", "group")
+                .only("id", "group_id", "author__username", "group__slug")
+            )
+            if changed:
+                Post.objects.filter(pk__in=[post.pk for post in changed]) \
+                    .update(**post_counts)
+                caching.bump_feeds(
+                    feed for post in changed for feed in caching.post_feeds(post))
+            fixed_posts += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано профилей: {created}, исправлено профилей: "
+            f"{fixed_profiles}, исправлено постов: {fixed_posts}"
+        ))
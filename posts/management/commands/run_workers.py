@@ -0,0 +1,72 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import jobs
+from posts.workers import InlineExecutor, close_connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет задачи очереди Job (раскладка постов по лентам, поисковый "
+        "индекс, письма) в пуле процессов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count() or 1,
+            help="Число процессов в пуле; 0 — без пула, в этом процессе",
+        )
+        parser.add_argument(
+            "--poll", type=float, default=1.0,
+            help="Пауза в секундах, когда очередь пуста",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Выполнить готовые задачи и завершиться",
+        )
+        parser.add_argument(
+            "--keep-days", type=int, default=7,
+            help="Сколько дней хранить выполненные задачи",
+        )
+
+    def handle(self, *args, **options):
+        jobs.requeue_stale(timedelta(minutes=10))
+        jobs.purge(timedelta(days=options["keep_days"]))
+
+        if options["workers"] < 1:
+            self.process(InlineExecutor(), 1, options)
+            return
+        close_connections()
+        with ProcessPoolExecutor(
+                max_workers=options["workers"],
+                initializer=close_connections) as pool:
+            self.process(pool, options["workers"], options)
+
+    def process(self, pool, slots, options):
+        # Новые задачи забираются, как только освобождается процесс, а не
+        # после завершения всей пачки
+        running = {}
+        while True:
+            if len(running) < slots:
+                for job in jobs.claim(slots - len(running)):
+                    running[pool.submit(jobs.run, job.task, job.payload)] = job
+            if not running:
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+                continue
+            done, _ = wait(
+                running, timeout=options["poll"], return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                try:
+                    future.result()
+                except Exception as error:
+                    jobs.finish(job, error=repr(error))
+                    self.stderr.write(f"{job}: {error!r}")
+                else:
+                    jobs.finish(job)
@@ -0,0 +1,197 @@
+import bisect
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from posts import transfer
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+WORDS = (
+    "город река набережная мост утро вечер кофе книга поезд море солнце "
+    "дождь осень весна лето зима музыка кино работа друзья прогулка парк "
+    "фотография дорога дом окно кот собака завтрак ужин проект код "
+    "праздник концерт выставка горы лес озеро снег ветер небо звёзды"
+).split()
+
+
+def zipf_weights(count, alpha):
+    """Накопленные веса закона Ципфа: k-й по популярности встречается в k^alpha раз реже первого."""
+    return list(itertools.accumulate(1.0 / (rank ** alpha) for rank in range(1, count + 1)))
+
+
+def pick(rng, items, cum_weights):
+    return items[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])]
+
+
+def next_pk(model):
+    return (model.objects.aggregate(top=Max("pk"))["top"] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими данными для нагрузочных замеров: "
+        "активность авторов, подписчики и комментарии распределены по "
+        "степенному закону. Вставка идёт пачками через bulk_create, "
+        "производные данные пересчитываются один раз в конце."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100000)
+        parser.add_argument("--posts", type=int, default=1000000)
+        parser.add_argument("--groups", type=int, default=50)
+        parser.add_argument("--comments", type=int, default=500000)
+        parser.add_argument(
+            "--follows", type=int, default=20,
+            help="Среднее число подписок у пользователя",
+        )
+        parser.add_argument(
+            "--alpha", type=float, default=1.1,
+            help="Показатель степенного закона: чем больше, тем сильнее перекос",
+        )
+        parser.add_argument(
+            "--days", type=int, default=365,
+            help="За сколько последних дней раскидать даты постов",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0, help="Зерно генератора")
+        parser.add_argument(
+            "--prefix", default="seed",
+            help="Префикс имён пользователей и адресов групп",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        alpha = options["alpha"]
+
+        with transfer.keep_dates([User, Post, Comment]):
+            groups = self.create_groups(options["groups"], options["prefix"])
+            users = self.create_users(options["users"], options["prefix"])
+            # Популярность — случайная перестановка пользователей,
+            # чтобы самые активные авторы не были подряд по pk
+            authors = users[:]
+            self.rng.shuffle(authors)
+            author_weights = zipf_weights(len(authors), alpha)
+            posts = self.create_posts(
+                options["posts"], options["days"], authors, author_weights, groups)
+            self.create_comments(options["comments"], posts, users, alpha)
+            # Число подписчиков не связано с числом постов: иначе ленты
+            # подписок состояли бы почти целиком из самых активных авторов
+            # и TimelineEntry росла бы на порядки быстрее постов
+            popular = users[:]
+            self.rng.shuffle(popular)
+            self.create_follows(options["follows"], users, popular, author_weights)
+
+        self.stdout.write("Пересчёт производных данных...")
+        transfer.rebuild_derived(self.batch_size, stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Готово"))
+
+    def insert(self, model, objects):
+        with transaction.atomic():
+            # Размер пачки INSERT подбирает Django с учётом ограничений SQLite
+            model.objects.bulk_create(objects)
+
+    def in_batches(self, model, total, build):
+        """Создаёт total объектов build(i) пачками, печатая прогресс."""
+        batch = []
+        for i in range(total):
+            batch.append(build(i))
+            if len(batch) >= self.batch_size:
+                self.insert(model, batch)
+                batch = []
+                self.stdout.write(f"{model._meta.label_lower}: {i + 1}/{total}")
+        if batch:
+            self.insert(model, batch)
+        self.stdout.write(f"{model._meta.label_lower}: {total}/{total}")
+
+    def text(self, low, high):
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(low, high))).capitalize()
+
+    def create_groups(self, total, prefix):
+        start = next_pk(Group)
+        self.in_batches(Group, total, lambda i: Group(
+            pk=start + i, title=f"Группа {start + i}",
+            slug=f"{prefix}-group-{start + i}", description=self.text(5, 20),
+        ))
+        return list(range(start, start + total))
+
+    def create_users(self, total, prefix):
+        start = next_pk(User)
+        # Хэш пароля считается один раз: PBKDF2 на каждого занял бы часы
+        password = make_password("password")
+        joined = timezone.now()
+        self.in_batches(User, total, lambda i: User(
+            pk=start + i, username=f"{prefix}{start + i}", password=password,
+            date_joined=joined,
+        ))
+        return list(range(start, start + total))
+
+    def create_posts(self, total, days, authors, author_weights, groups):
+        start = next_pk(Post)
+        now = timezone.now()
+        step = timedelta(days=days) / max(total, 1)
+        first = now - timedelta(days=days)
+
+        def build(i):
+            # Даты растут вместе с pk, как у настоящих постов
+            group = self.rng.choice(groups) if groups and self.rng.random() < 0.3 else None
+            return Post(
+                pk=start + i, text=self.text(5, 60),
+                pub_date=first + step * i, author_id=pick(self.rng, authors, author_weights),
+                group_id=group,
+            )
+        self.in_batches(Post, total, build)
+        return start, total
+
+    def create_comments(self, total, posts, users, alpha):
+        if not total or not posts[1]:
+            return
+        start, count = posts
+        # Больше всего комментариев у новых постов
+        weights = zipf_weights(count, alpha)
+        newest_first = range(start + count - 1, start - 1, -1)
+        now = timezone.now()
+        self.in_batches(Comment, total, lambda i: Comment(
+            post_id=pick(self.rng, newest_first, weights),
+            author_id=self.rng.choice(users), text=self.text(2, 20), created=now,
+        ))
+
+    def create_follows(self, average, users, authors, author_weights):
+        # Число подписок у пользователя распределено экспоненциально,
+        # а выбор автора пропорционален его популярности
+        def pairs():
+            for user_id in users:
+                count = min(int(self.rng.expovariate(1 / average)) if average else 0,
+                            len(authors) - 1)
+                chosen = set()
+                for _ in range(count * 2):
+                    if len(chosen) >= count:
+                        break
+                    author_id = pick(self.rng, authors, author_weights)
+                    if author_id != user_id:
+                        chosen.add(author_id)
+                for author_id in chosen:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        created = 0
+        batch = []
+        for follow in pairs():
+            batch.append(follow)
+            if len(batch) >= self.batch_size:
+                self.insert(Follow, batch)
+                created += len(batch)
+                batch = []
+                self.stdout.write(f"posts.follow: {created}")
+        if batch:
+            self.insert(Follow, batch)
+            created += len(batch)
+        self.stdout.write(f"posts.follow: {created}")
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Рассылает подписчикам дайджесты новых постов, если с прошлой "
+        "рассылки прошло NOTIFY_DIGEST_INTERVAL. Прерванная рассылка "
+        "продолжается с последнего получателя."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", type=float, default=0,
+            help="Проверять расписание каждые N секунд; 0 — один раз",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            run = notifications.next_run()
+            if run is None:
+                self.stdout.write("Рассылка ещё не нужна")
+            else:
+                count = notifications.send(run, stdout=self.stdout)
+                self.stdout.write(f"Рассылка {run} завершена, писем: {count}")
+            if not options["loop"]:
+                return
+            time.sleep(options["loop"])
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from yatube import db_router
+
+
+class Command(BaseCommand):
+    help = (
+        "Копирует primary в реплики из DATABASE_REPLICAS. Замена настоящей "
+        "репликации для локального запуска: с --interval реплики отстают "
+        "от primary, как по сети."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Повторять каждые N секунд; 0 — скопировать один раз",
+        )
+
+    def handle(self, *args, **options):
+        aliases = db_router.replicas()
+        if not aliases:
+            raise CommandError(
+                "Реплики не настроены: задайте YATUBE_REPLICAS или "
+                "DATABASE_REPLICAS")
+        while True:
+            for alias in aliases:
+                db_router.replicate(alias)
+            self.stdout.write(f"Реплики обновлены: {', '.join(aliases)}")
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,85 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from posts import thumbnails
+from posts.kvstore import indexed_thumbnails
+from posts.models import ImageVariant
+
+
+def prune_empty_directories(storage, path):
+    # Хешированные каталоги остаются пустыми после удаления файлов;
+    # у хранилищ без локальных путей каталогов нет вовсе
+    try:
+        root = storage.path(path)
+    except NotImplementedError:
+        return
+    for directory, subdirectories, files in os.walk(root, topdown=False):
+        if directory != root and not os.listdir(directory):
+            os.rmdir(directory)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет файлы миниатюр с индексами: sorl-thumbnail (media/cache) "
+        "и ImageVariant (media/variants). --rebuild восстанавливает индекс "
+        "вариантов по файлам, --gc удаляет файлы и записи, на которые "
+        "ничто не ссылается."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Восстановить ImageVariant по файлам в хранилище",
+        )
+        parser.add_argument(
+            "--gc", action="store_true",
+            help="Удалить файлы и записи индекса без владельца",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Только показать, что будет удалено",
+        )
+
+    def handle(self, *args, **options):
+        if not (options["rebuild"] or options["gc"]):
+            raise CommandError("Укажите --rebuild и/или --gc")
+        if options["rebuild"]:
+            recorded, queued = thumbnails.rebuild_index()
+            self.stdout.write(
+                f"Записано картинок: {recorded}, поставлено в очередь: {queued}")
+        if options["gc"]:
+            self.collect(options["dry_run"])
+
+    def collect(self, dry_run):
+        storage = default.storage
+        stale = thumbnails.stale_variants()
+        stale_count = stale.count()
+        if not dry_run:
+            stale.delete()
+
+        # Записи sorl, чьих файлов уже нет, убирает его же cleanup()
+        if not dry_run:
+            default.kvstore.cleanup()
+        known = indexed_thumbnails(default.kvstore)
+        known.update(ImageVariant.objects.values_list("name", flat=True))
+
+        roots = (thumbnail_settings.THUMBNAIL_PREFIX.rstrip("/"),
+                 thumbnails.VARIANTS_DIR)
+        orphans = [
+            name for root in roots for name in thumbnails.walk(storage, root)
+            if name not in known
+        ]
+        for name in orphans:
+            if dry_run:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+        if not dry_run:
+            for root in roots:
+                prune_empty_directories(storage, root)
+        self.stdout.write(
+            f"Устаревших вариантов: {stale_count}, файлов без индекса: {len(orphans)}"
+            + (" (пробный запуск)" if dry_run else ""))
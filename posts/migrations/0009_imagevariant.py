@@ -0,0 +1,37 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+def requeue_done(apps, schema_editor):
+    # Для уже обработанных картинок были только миниатюры sorl:
+    # ставим их в очередь ещё раз, чтобы нарезать варианты
+    ThumbnailJob = apps.get_model('posts', 'ThumbnailJob')
+    ThumbnailJob.objects.filter(status='done').update(status='pending', attempts=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_thumbnailjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=255)),
+                ('format', models.CharField(max_length=10)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('size', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('image', 'format', 'width'),
+                'unique_together': {('image', 'format', 'width')},
+            },
+        ),
+        migrations.RunPython(requeue_done, migrations.RunPython.noop),
+    ]
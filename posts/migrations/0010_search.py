@@ -0,0 +1,132 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:17
+
+import re
+from collections import Counter, defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Схема и токенизатор на момент миграции: код posts.search может меняться,
+# а эта миграция должна делать то же, что и при создании
+
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    " text, comments,"
+    " content='posts_searchdocument', content_rowid='post_id',"
+    " tokenize='unicode61')",
+    "CREATE TRIGGER posts_search_insert AFTER INSERT ON posts_searchdocument BEGIN"
+    " INSERT INTO posts_search (rowid, text, comments)"
+    " VALUES (new.post_id, new.text, new.comments);"
+    " END",
+    "CREATE TRIGGER posts_search_delete AFTER DELETE ON posts_searchdocument BEGIN"
+    " INSERT INTO posts_search (posts_search, rowid, text, comments)"
+    " VALUES ('delete', old.post_id, old.text, old.comments);"
+    " END",
+    "CREATE TRIGGER posts_search_update AFTER UPDATE ON posts_searchdocument BEGIN"
+    " INSERT INTO posts_search (posts_search, rowid, text, comments)"
+    " VALUES ('delete', old.post_id, old.text, old.comments);"
+    " INSERT INTO posts_search (rowid, text, comments)"
+    " VALUES (new.post_id, new.text, new.comments);"
+    " END",
+)
+
+FTS_DROP = (
+    "DROP TRIGGER IF EXISTS posts_search_insert",
+    "DROP TRIGGER IF EXISTS posts_search_delete",
+    "DROP TRIGGER IF EXISTS posts_search_update",
+    "DROP TABLE IF EXISTS posts_search",
+)
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+MAX_TERM_LENGTH = 100
+TEXT_WEIGHT = 2
+COMMENTS_WEIGHT = 1
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return any(row[0] == 'ENABLE_FTS5' for row in cursor.fetchall())
+
+
+def weighted_terms(text, comments):
+    counts = Counter()
+    for term in TOKEN_RE.findall(text.lower()):
+        counts[term[:MAX_TERM_LENGTH]] += TEXT_WEIGHT
+    for term in TOKEN_RE.findall(comments.lower()):
+        counts[term[:MAX_TERM_LENGTH]] += COMMENTS_WEIGHT
+    return counts
+
+
+def create_fts(apps, schema_editor):
+    if fts5_available(schema_editor.connection):
+        for statement in FTS_SCHEMA:
+            schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in FTS_DROP:
+            schema_editor.execute(statement)
+
+
+def index_posts(apps, schema_editor):
+    # Документы для уже существующих постов; индекс FTS5 заполнят триггеры,
+    # без FTS5 сразу строится обратный индекс
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    SearchDocument = apps.get_model('posts', 'SearchDocument')
+    SearchPosting = apps.get_model('posts', 'SearchPosting')
+    postings = not fts5_available(schema_editor.connection)
+
+    comments = defaultdict(list)
+    for post_id, text in Comment.objects.order_by('id').values_list('post_id', 'text').iterator():
+        comments[post_id].append(text)
+    documents, rows = [], []
+    for post_id, text in Post.objects.values_list('pk', 'text').iterator():
+        joined = '\n'.join(comments[post_id])
+        counts = weighted_terms(text, joined)
+        documents.append(SearchDocument(
+            post_id=post_id, text=text, comments=joined, length=sum(counts.values())))
+        if postings:
+            rows.extend(
+                SearchPosting(term=term, document_id=post_id, frequency=frequency)
+                for term, frequency in counts.items())
+    SearchDocument.objects.bulk_create(documents, batch_size=500)
+    SearchPosting.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_imagevariant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='posts.Post')),
+                ('text', models.TextField()),
+                ('comments', models.TextField(blank=True)),
+                ('length', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100)),
+                ('frequency', models.PositiveIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='posts.SearchDocument')),
+            ],
+            options={
+                'unique_together': {('term', 'document')},
+            },
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+        migrations.RunPython(index_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:22
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+import django.db.models.deletion
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    # Перед уникальным ограничением оставляем по одной подписке на пару;
+    # счётчики профилей учитывали каждую копию — вычитаем лишние
+    Follow = apps.get_model('posts', 'Follow')
+    Profile = apps.get_model('users', 'Profile')
+    duplicates = Follow.objects.values('user', 'author') \
+        .annotate(first=Min('id'), total=Count('id')).filter(total__gt=1)
+    for row in duplicates:
+        extra = row['total'] - 1
+        Follow.objects.filter(user=row['user'], author=row['author']) \
+            .exclude(id=row['first']).delete()
+        Profile.objects.filter(user_id=row['author'], follower_count__gte=extra) \
+            .update(follower_count=F('follower_count') - extra)
+        Profile.objects.filter(user_id=row['user'], following_count__gte=extra) \
+            .update(following_count=F('following_count') - extra)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_search'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='posts_timel_user_id_b48120_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='posts_timel_user_id_b036fb_idx',
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='comment_post', to='posts.Post'),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='post_author', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='group',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='posts.Group'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created'], name='posts_comme_post_id_944a68_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['pub_date'], name='posts_post_pub_dat_471922_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='posts_post_author__b65dbb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='posts_post_group_i_5ba9fa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'pub_date', 'post'], name='posts_timel_user_id_55febf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author', 'pub_date'], name='posts_timel_user_id_b32dd3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
@@ -13,21 +13,49 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        # Всё, что читает post_item.html, одним запросом: автор и группа;
+        # число комментариев хранится в самом посте
+        return self.select_related("author", "group") \
+            .order_by("-pub_date", "-id")
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField("date published", auto_now_add=True)
+    # Отдельные индексы по author и group не нужны: их заменяют составные
+    # индексы из Meta, которые к тому же отдают посты уже отсортированными
     author = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name="post_author")
+        User, on_delete=models.CASCADE, related_name="post_author",
+        db_index=False)
     group = models.ForeignKey(
-        Group, on_delete=models.CASCADE, blank=True, null=True)
+        Group, on_delete=models.CASCADE, blank=True, null=True,
+        db_index=False)
     # поле для картинки
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # счётчик обновляется сигналами при добавлении и удалении комментариев
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # растёт при каждом изменении того, что показывает post_item.html:
+    # входит в ключ закэшированной карточки поста
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
+    class Meta:
+        # В SQLite к ключу индекса неявно добавляется rowid (id), поэтому
+        # порядок лент (-pub_date, -id) читается обратным проходом по индексу
+        indexes = [
+            models.Index(fields=["pub_date"]),
+            models.Index(fields=["author", "pub_date"]),
+            models.Index(fields=["group", "pub_date"]),
+        ]
 
 
 class Comment(models.Model):
     post = models.ForeignKey(
-        Post, on_delete=models.CASCADE, related_name="comment_post"
+        Post, on_delete=models.CASCADE, related_name="comment_post",
+        db_index=False,
     )
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="comment_author"
@@ -35,14 +63,170 @@ class Comment(models.Model):
     text = models.TextField()
     created = models.DateTimeField("date published comment", auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["post", "created"])]
+
     def __str__(self):
         return self.text
 
 
 class Follow(models.Model):
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name="follower"
+        User, on_delete=models.CASCADE, related_name="follower",
+        db_index=False,
     )
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name="following"
     )
+
+    class Meta:
+        # Уникальный индекс заодно служит индексом по user
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"], name="unique_follow"),
+        ]
+
+
+class TimelineEntry(models.Model):
+    # Материализованная лента подписок: запись на каждый пост автора,
+    # на которого подписан пользователь
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+"
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "post")
+        indexes = [
+            models.Index(fields=["user", "pub_date", "post"]),
+            models.Index(fields=["user", "author", "pub_date"]),
+        ]
+
+
+class ThumbnailJob(models.Model):
+    # Очередь предварительной генерации миниатюр: задачи ставят new_post и
+    # post_edit, выполняет команда process_thumbnails
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    )
+
+    image = models.CharField(max_length=255, unique=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"])]
+
+    def __str__(self):
+        return self.image
+
+
+class ImageVariant(models.Model):
+    # Готовые размеры и форматы картинки поста. Шаблон строит srcset по этой
+    # таблице (через кэш) и не обращается к файловой системе
+    image = models.CharField(max_length=255)
+    format = models.CharField(max_length=10)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    name = models.CharField(max_length=255)
+    size = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("image", "format", "width")
+        ordering = ("image", "format", "width")
+
+    def __str__(self):
+        return self.name
+
+
+class SearchDocument(models.Model):
+    # Текст поста и его комментариев для полнотекстового поиска. На SQLite
+    # с FTS5 по этой таблице триггерами ведётся индекс posts_search,
+    # иначе по ней строятся SearchPosting
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True,
+        related_name="search_document",
+    )
+    text = models.TextField()
+    comments = models.TextField(blank=True)
+    # Длина документа в словах с учётом весов полей (для BM25)
+    length = models.PositiveIntegerField(default=0)
+
+
+class SearchPosting(models.Model):
+    # Обратный индекс запасного поиска: слово -> документы, где оно встречается
+    term = models.CharField(max_length=100)
+    document = models.ForeignKey(
+        SearchDocument, on_delete=models.CASCADE, related_name="postings")
+    # Число вхождений с учётом весов полей
+    frequency = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ("term", "document")
+
+
+class Job(models.Model):
+    # Очередь отложенных действий (см. posts/jobs.py): задачу ставят в той
+    # же транзакции, что и основную запись, выполняет команда run_workers
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    )
+
+    task = models.CharField(max_length=200)
+    # Аргументы задачи в JSON
+    payload = models.TextField(default="{}")
+    # Ключ идемпотентности: пока задача ждёт в очереди, вторая с тем же
+    # ключом не создаётся. При запуске ключ освобождается
+    key = models.CharField(max_length=200, null=True, blank=True, unique=True)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "-priority", "run_at"])]
+
+    def __str__(self):
+        return "%s #%s" % (self.task, self.pk)
+
+
+class DigestRun(models.Model):
+    # Рассылка дайджестов за период (since, until] (см. posts/notifications.py).
+    # last_user_id — последний обработанный получатель: прерванная рассылка
+    # продолжается с него, и никто не получит письмо дважды
+    since = models.DateTimeField()
+    until = models.DateTimeField()
+    last_user_id = models.IntegerField(default=0)
+    recipients = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return "%s — %s" % (self.since, self.until)
@@ -0,0 +1,152 @@
+"""
+Дайджесты новых постов для подписчиков.
+
+Письмо на каждый пост каждому подписчику — это миллионы писем у популярных
+авторов. Вместо этого раз в NOTIFY_DIGEST_INTERVAL команда send_digests
+собирает посты, опубликованные за период, и отправляет каждому подписчику
+их авторов одно письмо со списком.
+
+Событиями служат сами посты: период задаётся по pub_date, отдельная
+таблица событий не нужна. Получатели обходятся пачками по
+NOTIFY_DIGEST_BATCH по возрастанию id: на пачку два запроса к базе и одно
+соединение с почтовым сервером на всю рассылку, а в памяти — только пачка
+и не больше NOTIFY_DIGEST_MAX_POSTS постов каждого автора. После каждой
+пачки в DigestRun сохраняется последний получатель.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone
+
+from yatube.mail import delivery_backend
+
+from .models import DigestRun, Follow, Post
+
+
+User = get_user_model()
+
+
+def interval():
+    return timedelta(seconds=getattr(settings, "NOTIFY_DIGEST_INTERVAL", 24 * 60 * 60))
+
+
+def batch_size():
+    return getattr(settings, "NOTIFY_DIGEST_BATCH", 1000)
+
+
+def max_posts():
+    return getattr(settings, "NOTIFY_DIGEST_MAX_POSTS", 5)
+
+
+def grace():
+    # Пост получает pub_date до коммита: свежие посты ждут следующего периода,
+    # чтобы не пропасть между рассылками
+    return timedelta(seconds=getattr(settings, "NOTIFY_DIGEST_GRACE", 60))
+
+
+def next_run(now=None):
+    """Незаконченная рассылка или новая, если подошло время; иначе None."""
+    now = now or timezone.now()
+    run = DigestRun.objects.filter(finished__isnull=True).order_by("id").first()
+    if run is not None:
+        return run
+    until = now - grace()
+    last = DigestRun.objects.order_by("-until").first()
+    since = last.until if last else until - interval()
+    if until - since < interval():
+        return None
+    return DigestRun.objects.create(since=since, until=until)
+
+
+def window_posts(run):
+    """
+    {id автора: (число постов, последние max_posts постов)} за период.
+    Посты — словари с text, url и username автора.
+    """
+    posts = Post.objects.filter(pub_date__gt=run.since, pub_date__lte=run.until) \
+        .order_by("-pub_date", "-id") \
+        .values_list("id", "text", "author_id", "author__username")
+    authors = {}
+    for post_id, text, author_id, username in posts.iterator():
+        count, latest = authors.get(author_id, (0, []))
+        if len(latest) < max_posts():
+            latest.append({
+                "text": text, "username": username,
+                "url": reverse("post", args=[username, post_id]),
+            })
+        authors[author_id] = (count + 1, latest)
+    return authors
+
+
+def recipient_batches(run, after):
+    """Пачки получателей: подписчики авторов, писавших за период."""
+    authors = Post.objects.filter(pub_date__gt=run.since, pub_date__lte=run.until) \
+        .values("author_id")
+    while True:
+        ids = list(
+            Follow.objects.filter(author_id__in=authors, user_id__gt=after)
+            .order_by("user_id").values_list("user_id", flat=True)
+            .distinct()[:batch_size()]
+        )
+        if not ids:
+            return
+        follows = defaultdict(list)
+        rows = Follow.objects.filter(user_id__in=ids, author_id__in=authors) \
+            .values_list("user_id", "author_id")
+        for user_id, author_id in rows:
+            follows[user_id].append(author_id)
+        users = User.objects.filter(pk__in=ids, is_active=True).exclude(email="") \
+            .values_list("pk", "username", "email")
+        yield ids[-1], [(user, follows[user[0]]) for user in users]
+        after = ids[-1]
+
+
+def message(template, site, user, author_ids, authors):
+    _, username, email = user
+    sections = []
+    total = 0
+    for author_id in sorted(author_ids):
+        count, latest = authors[author_id]
+        total += count
+        sections.append({
+            "username": latest[0]["username"],
+            "posts": latest,
+            "more": count - len(latest),
+        })
+    body = template.render({
+        "username": username, "site": site, "sections": sections, "total": total,
+    })
+    return EmailMessage(
+        "Новые посты на %s: %d" % (site.name, total), body, to=[email])
+
+
+def send(run, stdout=None):
+    """Отправляет дайджесты рассылки run. Возвращает число писем."""
+    authors = window_posts(run)
+    template = get_template("emails/digest.txt")
+    site = Site.objects.get_current()
+    connection = get_connection(delivery_backend())
+    connection.open()
+    try:
+        for last_user_id, recipients in recipient_batches(run, run.last_user_id):
+            messages = [
+                message(template, site, user, author_ids, authors)
+                for user, author_ids in recipients
+            ]
+            connection.send_messages(messages)
+            run.last_user_id = last_user_id
+            run.recipients += len(messages)
+            run.save(update_fields=["last_user_id", "recipients"])
+            if stdout:
+                stdout.write(f"Отправлено писем: {run.recipients}")
+    finally:
+        connection.close()
+    run.finished = timezone.now()
+    run.save(update_fields=["finished"])
+    return run.recipients
@@ -0,0 +1,223 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+FEED_ORDERING = ("-pub_date", "-id")
+# Глубже этой страницы старые ссылки ?page=N не ведут: OFFSET ограничен
+LEGACY_PAGE_LIMIT = 50
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Словарь из курсора; для битого курсора — InvalidCursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(data, dict) or data.get("d") not in ("n", "p"):
+            raise ValueError
+    except Exception:
+        raise InvalidCursor(cursor)
+    return data
+
+
+class CursorPage:
+    """Страница ленты, выбранная по ключу (pub_date, id) без OFFSET и COUNT."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return "<CursorPage of %d items>" % len(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_after(self.object_list[-1])
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_before(self.object_list[0])
+
+
+class CursorPaginator:
+    """
+    Пагинатор по ключу сортировки: вместо ?page=N принимает непрозрачный
+    ?cursor=, в котором закодированы значения полей сортировки крайней записи
+    страницы. Запрос страницы — это диапазонное чтение по индексу, цена не
+    зависит от глубины ленты.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        # Сортировать можно и по аннотациям запроса (лента подписок
+        # сортируется по полям TimelineEntry)
+        annotations = object_list.query.annotations
+        self.names = [name.lstrip("-") for name in self.ordering]
+        self.fields = [
+            annotations[name].output_field if name in annotations
+            else object_list.model._meta.get_field(name)
+            for name in self.names
+        ]
+
+    @cached_property
+    def count(self):
+        # Полный COUNT(*): нужен только там, где шаблон выводит общее число
+        return self.object_list.count()
+
+    def encode(self, obj, direction):
+        values = []
+        for name in self.names:
+            # строки из .values() — словари
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            values.append(value.isoformat() if hasattr(value, "isoformat") else value)
+        return encode_cursor({"d": direction, "v": values})
+
+    def decode(self, cursor):
+        data = decode_cursor(cursor)
+        try:
+            direction, values = data["d"], data["v"]
+            if len(values) != len(self.fields):
+                raise ValueError
+            values = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def cursor_after(self, obj):
+        return self.encode(obj, "n")
+
+    def cursor_before(self, obj):
+        return self.encode(obj, "p")
+
+    def _keyset_filter(self, values, forward):
+        # (a, b) после (x, y) при сортировке по убыванию:
+        # a <= x AND (a < x OR (a = x AND b < y)).
+        # Первое условие избыточно, но по нему SQLite начинает чтение
+        # индекса сразу с нужного места, а не фильтрует его с начала
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, values):
+            descending = name.startswith("-")
+            name = name.lstrip("-")
+            lookup = "lt" if descending == forward else "gt"
+            condition |= Q(**equal, **{"%s__%s" % (name, lookup): value})
+            equal[name] = value
+        first = self.ordering[0]
+        bound = "lte" if first.startswith("-") == forward else "gte"
+        return Q(**{"%s__%s" % (first.lstrip("-"), bound): values[0]}) & condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith("-") else "-" + name
+            for name in self.ordering
+        ]
+
+    def get_page(self, cursor=None):
+        """
+        Возвращает страницу после (или до) записи из курсора.
+        Битый или пустой курсор — первая страница, как у Paginator.get_page().
+        """
+        direction, values = "n", None
+        if cursor:
+            try:
+                direction, values = self.decode(cursor)
+            except InvalidCursor:
+                pass
+
+        forward = direction == "n"
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(values, forward))
+        if forward:
+            queryset = queryset.order_by(*self.ordering)
+        else:
+            queryset = queryset.order_by(*self._reversed_ordering())
+
+        # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+
+        if forward:
+            return CursorPage(items, self, has_more, values is not None)
+        if not items:
+            # перед курсором ничего нет (например, новые посты удалили):
+            # показываем начало ленты
+            return self.get_page()
+        items.reverse()
+        return CursorPage(items, self, True, has_more)
+
+
+def legacy_cursor(paginator, number):
+    """
+    Курсор для старой ссылки ?page=N: граница берётся одной строкой по
+    OFFSET, но не глубже LEGACY_PAGE_LIMIT страниц. Дальние, битые и
+    несуществующие номера ведут на первую страницу.
+    """
+    try:
+        number = int(number)
+    except (TypeError, ValueError):
+        return None
+    if not 1 < number <= LEGACY_PAGE_LIMIT:
+        return None
+    offset = (number - 1) * paginator.per_page - 1
+    queryset = paginator.object_list.order_by(*paginator.ordering)
+    boundary = queryset.values(*paginator.names)[offset:offset + 1]
+    for row in boundary:
+        return paginator.cursor_after(row)
+    return None
+
+
+def paginate(request, queryset, per_page=10, count=None, ordering=FEED_ORDERING):
+    """
+    Общая пагинация лент: страницы всегда читаются по ключу, без COUNT(*)
+    и OFFSET. Старые ссылки ?page=N переводятся в курсор (см. legacy_cursor).
+    Если число записей уже известно (count), оно доступно как paginator.count.
+    """
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    if count is not None:
+        paginator.count = count
+    cursor = request.GET.get("cursor")
+    if not cursor and "page" in request.GET:
+        cursor = legacy_cursor(paginator, request.GET.get("page"))
+    return paginator, paginator.get_page(cursor)
@@ -0,0 +1,330 @@
+"""
+Полнотекстовый поиск по постам и комментариям.
+
+Каждому посту соответствует SearchDocument: текст поста и всех его
+комментариев. Документы обновляются задачами очереди (posts/jobs.py),
+которые ставят сигналы при изменении постов и комментариев. Если SQLite
+собран с FTS5, миграция создаёт виртуальную таблицу posts_search, которую
+триггеры синхронизируют с SearchDocument, и ранжирует сам SQLite (bm25).
+Иначе используется обратный индекс SearchPosting, а BM25 считается в
+Python.
+
+Итоговый вес = BM25 / (1 + возраст поста в днях / SEARCH_RECENCY_DAYS):
+из одинаково подходящих постов выше окажутся новые.
+"""
+import math
+import re
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg
+
+from . import jobs
+from .models import Comment, Post, SearchDocument, SearchPosting
+from .pagination import CursorPage, InvalidCursor, decode_cursor, encode_cursor
+
+
+FTS_TABLE = "posts_search"
+
+# Совпадение в тексте поста весит вдвое больше совпадения в комментарии
+TEXT_WEIGHT = 2
+COMMENTS_WEIGHT = 1
+# Параметры BM25 те же, что у bm25() в FTS5
+K1 = 1.2
+B = 0.75
+
+MAX_TERM_LENGTH = 100
+MAX_QUERY_TERMS = 10
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+FTS_SCHEMA = (
+    "CREATE VIRTUAL TABLE posts_search USING fts5("
+    " text, comments,"
+    " content='posts_searchdocument', content_rowid='post_id',"
+    " tokenize='unicode61')",
+    "CREATE TRIGGER posts_search_insert AFTER INSERT ON posts_searchdocument BEGIN"
+    " INSERT INTO posts_search (rowid, text, comments)"
+    " VALUES (new.post_id, new.text, new.comments);"
+    " END",
+    "CREATE TRIGGER posts_search_delete AFTER DELETE ON posts_searchdocument BEGIN"
+    " INSERT INTO posts_search (posts_search, rowid, text, comments)"
+    " VALUES ('delete', old.post_id, old.text, old.comments);"
+    " END",
+    "CREATE TRIGGER posts_search_update AFTER UPDATE ON posts_searchdocument BEGIN"
+    " INSERT INTO posts_search (posts_search, rowid, text, comments)"
+    " VALUES ('delete', old.post_id, old.text, old.comments);"
+    " INSERT INTO posts_search (rowid, text, comments)"
+    " VALUES (new.post_id, new.text, new.comments);"
+    " END",
+)
+
+FTS_DROP = (
+    "DROP TRIGGER IF EXISTS posts_search_insert",
+    "DROP TRIGGER IF EXISTS posts_search_delete",
+    "DROP TRIGGER IF EXISTS posts_search_update",
+    "DROP TABLE IF EXISTS posts_search",
+)
+
+
+def fts5_available(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        return any(row[0] == "ENABLE_FTS5" for row in cursor.fetchall())
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре; разделители те же, что у unicode61."""
+    return [term[:MAX_TERM_LENGTH] for term in TOKEN_RE.findall(text.lower())]
+
+
+def weighted_terms(text, comments):
+    counts = Counter()
+    for term in tokenize(text):
+        counts[term] += TEXT_WEIGHT
+    for term in tokenize(comments):
+        counts[term] += COMMENTS_WEIGHT
+    return counts
+
+
+def recency_days():
+    return getattr(settings, "SEARCH_RECENCY_DAYS", 30)
+
+
+def julian_day(timestamp):
+    return timestamp / 86400.0 + 2440587.5
+
+
+class FTS5Backend:
+    name = "fts5"
+    postings = False
+
+    def ranked(self, terms, now, key, forward, limit):
+        """[(вес, id поста)] после ключа key = (вес, id) в порядке выдачи."""
+        match = " ".join('"%s"' % term for term in terms)
+        params = [
+            TEXT_WEIGHT, COMMENTS_WEIGHT, julian_day(now), recency_days(), match,
+        ]
+        condition = ""
+        if key is not None:
+            operator = "<" if forward else ">"
+            condition = "WHERE score {0} %s OR (score = %s AND id {0} %s)" \
+                .format(operator)
+            params += [key[0], key[0], key[1]]
+        order = "DESC" if forward else "ASC"
+        sql = (
+            "SELECT score, id FROM ("
+            " SELECT -bm25(posts_search, %s, %s)"
+            "  / (1 + MAX(0, %s - julianday(p.pub_date)) / %s) AS score,"
+            "  p.id AS id"
+            " FROM posts_search JOIN posts_post p ON p.id = posts_search.rowid"
+            " WHERE posts_search MATCH %s"
+            ") " + condition +
+            " ORDER BY score {0}, id {0} LIMIT %s".format(order)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            return [tuple(row) for row in cursor.fetchall()]
+
+
+class PythonBackend:
+    name = "python"
+    postings = True
+
+    def ranked(self, terms, now, key, forward, limit):
+        total = SearchDocument.objects.count()
+        if not total:
+            return []
+        average = SearchDocument.objects.aggregate(value=Avg("length"))["value"] or 1
+
+        frequencies = defaultdict(dict)
+        document_frequency = Counter()
+        rows = SearchPosting.objects.filter(term__in=terms) \
+            .values_list("document_id", "term", "frequency")
+        for document_id, term, frequency in rows.iterator():
+            frequencies[document_id][term] = frequency
+            document_frequency[term] += 1
+        # Все слова запроса должны встретиться в документе, как в FTS5
+        candidates = [
+            document_id for document_id, found in frequencies.items()
+            if len(found) == len(terms)
+        ]
+        idf = {
+            term: max(math.log((total - count + 0.5) / (count + 0.5)), 1e-6)
+            for term, count in document_frequency.items()
+        }
+
+        scored = []
+        documents = SearchDocument.objects.filter(pk__in=candidates) \
+            .values_list("post_id", "length", "post__pub_date")
+        for post_id, length, pub_date in documents.iterator():
+            relevance = sum(
+                idf[term] * frequency * (K1 + 1)
+                / (frequency + K1 * (1 - B + B * length / average))
+                for term, frequency in frequencies[post_id].items()
+            )
+            age = max(now - pub_date.timestamp(), 0) / 86400.0
+            scored.append((relevance / (1 + age / recency_days()), post_id))
+
+        if key is not None:
+            key = tuple(key)
+            scored = [item for item in scored if (item < key) == forward and item != key]
+        scored.sort(reverse=forward)
+        return scored[:limit]
+
+
+_fts_table_exists = None
+
+
+def get_backend():
+    global _fts_table_exists
+    name = getattr(settings, "SEARCH_BACKEND", "auto")
+    if name == "auto":
+        if _fts_table_exists is None:
+            _fts_table_exists = FTS_TABLE in connection.introspection.table_names()
+        name = "fts5" if _fts_table_exists else "python"
+    return FTS5Backend() if name == "fts5" else PythonBackend()
+
+
+def _postings(post_id, counts):
+    return [
+        SearchPosting(term=term, document_id=post_id, frequency=frequency)
+        for term, frequency in counts.items()
+    ]
+
+
+@jobs.task
+def index_post(post_id, create=True):
+    """
+    Пересобирает документ поста. create=False — только обновить уже
+    существующий: так комментарии, удаляемые вместе с постом, не создают
+    документ заново.
+    """
+    text = Post.objects.filter(pk=post_id).values_list("text", flat=True).first()
+    if text is None:
+        return
+    comments = "\n".join(
+        Comment.objects.filter(post_id=post_id).order_by("id")
+        .values_list("text", flat=True)
+    )
+    counts = weighted_terms(text, comments)
+    fields = {"text": text, "comments": comments, "length": sum(counts.values())}
+    with transaction.atomic():
+        if create:
+            SearchDocument.objects.update_or_create(post_id=post_id, defaults=fields)
+        elif not SearchDocument.objects.filter(post_id=post_id).update(**fields):
+            return
+        if get_backend().postings:
+            SearchPosting.objects.filter(document_id=post_id).delete()
+            SearchPosting.objects.bulk_create(_postings(post_id, counts))
+
+
+def rebuild(batch_size=500):
+    """Строит индекс заново по всем постам. Возвращает число документов."""
+    backend = get_backend()
+    SearchDocument.objects.all().delete()
+    total = 0
+    last_pk = 0
+    while True:
+        posts = list(
+            Post.objects.filter(pk__gt=last_pk).order_by("pk")
+            .values_list("pk", "text")[:batch_size]
+        )
+        if not posts:
+            break
+        last_pk = posts[-1][0]
+        comments = defaultdict(list)
+        rows = Comment.objects.filter(post_id__in=[pk for pk, _ in posts]) \
+            .order_by("id").values_list("post_id", "text")
+        for post_id, text in rows:
+            comments[post_id].append(text)
+
+        documents, postings = [], []
+        for post_id, text in posts:
+            joined = "\n".join(comments[post_id])
+            counts = weighted_terms(text, joined)
+            documents.append(SearchDocument(
+                post_id=post_id, text=text, comments=joined,
+                length=sum(counts.values()),
+            ))
+            if backend.postings:
+                postings.extend(_postings(post_id, counts))
+        with transaction.atomic():
+            SearchDocument.objects.bulk_create(documents)
+            SearchPosting.objects.bulk_create(postings, batch_size=batch_size)
+        total += len(documents)
+    if backend.name == "fts5":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_search (posts_search) VALUES ('optimize')")
+    return total
+
+
+class SearchPaginator:
+    """
+    Постраничная выдача поиска по ключу (вес, id) без OFFSET. Вес зависит от
+    текущего времени, поэтому момент первого запроса сохраняется в курсоре:
+    на всех страницах одной выдачи веса считаются одинаково.
+    """
+
+    def __init__(self, query, per_page=10):
+        self.query = query
+        self.terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+        self.per_page = int(per_page)
+        self.backend = get_backend()
+        self.now = time.time()
+
+    def encode(self, obj, direction):
+        return encode_cursor({
+            "d": direction, "v": [obj.search_score, obj.pk], "t": self.now,
+        })
+
+    def decode(self, cursor):
+        data = decode_cursor(cursor)
+        try:
+            score, pk = data["v"]
+            return data["d"], (float(score), int(pk)), float(data["t"])
+        except Exception:
+            raise InvalidCursor(cursor)
+
+    def cursor_after(self, obj):
+        return self.encode(obj, "n")
+
+    def cursor_before(self, obj):
+        return self.encode(obj, "p")
+
+    def get_page(self, cursor=None):
+        direction, key = "n", None
+        if cursor:
+            try:
+                direction, key, self.now = self.decode(cursor)
+            except InvalidCursor:
+                pass
+        forward = direction == "n"
+        if not self.terms:
+            return CursorPage([], self, False, False)
+
+        rows = self.backend.ranked(
+            self.terms, self.now, key, forward, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        posts = Post.objects.for_feed().in_bulk([post_id for _, post_id in rows])
+        items = []
+        for score, post_id in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_score = score
+                items.append(post)
+        if forward:
+            return CursorPage(items, self, has_more, key is not None)
+        if not items:
+            # перед курсором ничего нет: показываем начало выдачи
+            return self.get_page()
+        return CursorPage(items, self, True, has_more)
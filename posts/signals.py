@@ -0,0 +1,229 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Profile
+
+from . import caching, jobs, search, timeline
+from .models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    # Новый пост попадает в ленты подписчиков задачей очереди: у автора их
+    # может быть много. При удалении поста записи ленты удалятся каскадом
+    if created and not kwargs.get("raw"):
+        jobs.enqueue(
+            timeline.fan_out_post, priority=jobs.HIGH,
+            key="fan-out:%s" % instance.pk, post_id=instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created and not kwargs.get("raw"):
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_remove(sender, instance, **kwargs):
+    timeline.remove(instance.user_id, instance.author_id)
+
+
+# Денормализованные счётчики: атомарно через F(), без чтения строки.
+# Расхождения (например, после загрузки данных в обход сигналов)
+# исправляет команда recount.
+
+@receiver(post_save, sender=Post)
+def post_count_increment(sender, instance, created, **kwargs):
+    if created and not kwargs.get("raw"):
+        Profile.objects.filter(user_id=instance.author_id) \
+            .update(post_count=F("post_count") + 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_count_decrement(sender, instance, **kwargs):
+    Profile.objects.filter(user_id=instance.author_id, post_count__gt=0) \
+        .update(post_count=F("post_count") - 1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count_increment(sender, instance, created, **kwargs):
+    if created and not kwargs.get("raw"):
+        Post.objects.filter(pk=instance.post_id) \
+            .update(comment_count=F("comment_count") + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_count_decrement(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0) \
+        .update(comment_count=F("comment_count") - 1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_count_increment(sender, instance, created, **kwargs):
+    if created and not kwargs.get("raw"):
+        Profile.objects.filter(user_id=instance.author_id) \
+            .update(follower_count=F("follower_count") + 1)
+        Profile.objects.filter(user_id=instance.user_id) \
+            .update(following_count=F("following_count") + 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_count_decrement(sender, instance, **kwargs):
+    Profile.objects.filter(user_id=instance.author_id, follower_count__gt=0) \
+        .update(follower_count=F("follower_count") - 1)
+    Profile.objects.filter(user_id=instance.user_id, following_count__gt=0) \
+        .update(following_count=F("following_count") - 1)
+
+
+# Кэш лент: изменение поста или его комментариев меняет версии его лент
+
+@receiver(pre_save, sender=Post)
+def post_remember_feeds(sender, instance, **kwargs):
+    # При редактировании пост мог сменить группу: старую ленту тоже сбросим
+    instance._previous_feeds = []
+    if instance.pk and not kwargs.get("raw"):
+        previous = Post.objects.filter(pk=instance.pk) \
+            .select_related("author", "group").first()
+        if previous is not None:
+            instance._previous_feeds = caching.post_feeds(previous)
+            # закэшированная карточка поста перестанет читаться
+            instance.version = previous.version + 1
+
+
+@receiver(post_save, sender=Post)
+def post_bump_feeds(sender, instance, **kwargs):
+    if not kwargs.get("raw"):
+        caching.bump_feeds(
+            caching.post_feeds(instance)
+            + getattr(instance, "_previous_feeds", []))
+
+
+@receiver(post_delete, sender=Post)
+def post_delete_bump_feeds(sender, instance, **kwargs):
+    caching.bump_feeds(caching.post_feeds(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_bump_feeds(sender, instance, created, **kwargs):
+    if created and not kwargs.get("raw"):
+        caching.bump_feeds(caching.post_feeds(instance.post))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_delete_bump_feeds(sender, instance, **kwargs):
+    try:
+        post = instance.post
+    except Post.DoesNotExist:
+        return
+    caching.bump_feeds(caching.post_feeds(post))
+
+
+@receiver(post_save, sender=Follow)
+def follow_bump_feeds(sender, instance, created, **kwargs):
+    # Страницы профилей показывают счётчики подписок
+    if created and not kwargs.get("raw"):
+        caching.bump_feeds([
+            caching.profile_feed(instance.user.username),
+            caching.profile_feed(instance.author.username),
+        ])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_delete_bump_feeds(sender, instance, **kwargs):
+    caching.bump_feeds([
+        caching.profile_feed(instance.user.username),
+        caching.profile_feed(instance.author.username),
+    ])
+
+
+# Поисковый индекс: документ поста включает тексты его комментариев.
+# Документ пересобирается задачей очереди; пока она ждёт, новые изменения
+# того же поста второй задачи не создают
+
+def enqueue_index(post_id, create):
+    jobs.enqueue(
+        search.index_post, key="search-index:%s:%d" % (post_id, create),
+        post_id=post_id, create=create)
+
+
+@receiver(post_save, sender=Post)
+def post_index(sender, instance, **kwargs):
+    if not kwargs.get("raw"):
+        enqueue_index(instance.pk, True)
+
+
+@receiver(post_save, sender=Comment)
+def comment_index(sender, instance, created, **kwargs):
+    if created and not kwargs.get("raw"):
+        enqueue_index(instance.post_id, False)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_delete_index(sender, instance, **kwargs):
+    enqueue_index(instance.post_id, False)
+
+
+# Переименование автора или группы меняет карточки их постов во всех лентах
+
+GROUP_NAMES = ("slug", "title")
+USER_NAMES = ("username", "first_name", "last_name")
+
+
+def _names_may_change(names, update_fields):
+    # save(update_fields=...) без имён (например, last_login при входе)
+    # не переименовывает и лишнего запроса не делает
+    return update_fields is None or not set(names).isdisjoint(update_fields)
+
+
+def _names(instance, names):
+    return tuple(getattr(instance, name) for name in names)
+
+
+@receiver(pre_save, sender=Group)
+def group_remember_names(sender, instance, **kwargs):
+    instance._previous_names = None
+    if instance.pk and not kwargs.get("raw") \
+            and _names_may_change(GROUP_NAMES, kwargs.get("update_fields")):
+        instance._previous_names = Group.objects.filter(pk=instance.pk) \
+            .values_list(*GROUP_NAMES).first()
+
+
+@receiver(post_save, sender=Group)
+def group_rename_bump_feeds(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_names", None)
+    if previous is None or previous == _names(instance, GROUP_NAMES):
+        return
+    authors = Post.objects.filter(group=instance) \
+        .values_list("author__username", flat=True).distinct()
+    caching.bump_feeds(
+        [caching.INDEX_FEED, caching.group_feed(previous[0]),
+         caching.group_feed(instance.slug)]
+        + [caching.profile_feed(username) for username in authors])
+
+
+@receiver(pre_save, sender=User)
+def user_remember_names(sender, instance, **kwargs):
+    instance._previous_names = None
+    if instance.pk and not kwargs.get("raw") \
+            and _names_may_change(USER_NAMES, kwargs.get("update_fields")):
+        instance._previous_names = User.objects.filter(pk=instance.pk) \
+            .values_list(*USER_NAMES).first()
+
+
+@receiver(post_save, sender=User)
+def user_rename_bump_feeds(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_names", None)
+    if previous is None or previous == _names(instance, USER_NAMES):
+        return
+    # Полное имя есть только на странице профиля, username — во всех лентах
+    feeds = [caching.profile_feed(previous[0]), caching.profile_feed(instance.username)]
+    if previous[0] != instance.username:
+        groups = Post.objects.filter(author=instance, group__isnull=False) \
+            .values_list("group__slug", flat=True).distinct()
+        feeds += [caching.INDEX_FEED] + [caching.group_feed(slug) for slug in groups]
+    caching.bump_feeds(feeds)
@@ -0,0 +1,118 @@
+from django import template
+from django.template.base import token_kwargs
+from django.core.cache import cache
+from django.utils.safestring import mark_safe
+
+from posts import caching
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, feed, vary_on):
+        self.nodelist = nodelist
+        self.feed = feed
+        self.vary_on = vary_on
+
+    def render(self, context):
+        feed = self.feed.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        if caching.rendering_skeleton(context.get("request")):
+            # в скелете вместо дыр метки: такой фрагмент не годится для
+            # обычной страницы, и наоборот
+            vary_on.append("skeleton")
+        key = caching.make_key("feed-fragment", feed, *vary_on)
+        value = cache.get(key)
+        caching.record("fragment", value is not None)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(key, value, caching.feed_timeout(feed))
+        return value
+
+
+@register.tag
+def feedcache(parser, token):
+    """
+    {% feedcache feed [vary_on ...] %} ... {% endfeedcache %}
+
+    Как {% cache %}, но ключ включает версию ленты feed, поэтому фрагмент
+    сбрасывается сразу после изменения постов этой ленты.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            "'%s' tag requires at least 1 argument." % bits[0])
+    nodelist = parser.parse(("endfeedcache",))
+    parser.delete_first_token()
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
+
+
+class HoleNode(template.Node):
+    def __init__(self, name, kwargs):
+        self.name = name
+        self.kwargs = kwargs
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        kwargs = {key: value.resolve(context) for key, value in self.kwargs.items()}
+        if caching.punching_holes(context):
+            return caching.hole_marker(name, kwargs)
+        return caching.render_hole(context.get("request"), name, kwargs, context)
+
+
+@register.tag
+def hole(parser, token):
+    """
+    {% hole "name" [key=value ...] %}
+
+    Часть страницы, зависящая от пользователя (см. posts/holes.py). В
+    закэшированном скелете страницы на её месте метка, которая заполняется
+    при каждом запросе; значения аргументов должны сериализоваться в JSON.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            "'%s' tag requires at least 1 argument." % bits[0])
+    kwargs = token_kwargs(bits[2:], parser)
+    if len(kwargs) != len(bits) - 2:
+        raise template.TemplateSyntaxError(
+            "'%s' tag accepts only keyword arguments." % bits[0])
+    return HoleNode(parser.compile_filter(bits[1]), kwargs)
+
+
+@register.simple_tag(takes_context=True)
+def post_items(context, posts):
+    """
+    {% post_items page %}
+
+    Карточки постов (post_item.html) из кэша, одним запросом к нему.
+    Карточка кэшируется с метками на месте дыр и ключом caching.post_key;
+    дыры заполняются для текущего пользователя после склейки, а в скелете
+    страницы остаются для её собственного заполнения.
+    """
+    posts = list(posts)
+    keys = [caching.post_key(post) for post in posts]
+    cached = cache.get_many(keys)
+    caching.record("post", True, len(cached))
+    caching.record("post", False, len(set(keys)) - len(cached))
+    template = context.template.engine.get_template("post_item.html")
+    rendered = {}
+    parts = []
+    for key, post in zip(keys, posts):
+        value = cached.get(key)
+        if value is None:
+            with context.push(post=post, punch_holes=True):
+                value = template.render(context)
+            cached[key] = rendered[key] = value
+        parts.append(value)
+    if rendered:
+        cache.set_many(rendered, caching.feed_timeout())
+    content = "".join(parts)
+    request = context.get("request")
+    if not caching.rendering_skeleton(request):
+        content = caching.fill_holes(request, content)
+    return mark_safe(content)
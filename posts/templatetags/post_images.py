@@ -0,0 +1,52 @@
+from django import template
+from django.core.files.storage import default_storage
+
+from posts import thumbnails
+
+register = template.Library()
+
+# Ширина карточки поста: во всю ширину экрана на телефонах, 960px на десктопе
+SIZES = "(max-width: 960px) 100vw, 960px"
+
+
+def _srcset(variants):
+    return ", ".join(
+        "%s %dw" % (default_storage.url(variant["name"]), variant["width"])
+        for variant in variants
+    )
+
+
+@register.inclusion_tag("picture.html")
+def responsive_image(image, css_class="card-img"):
+    """
+    {% responsive_image post.image %}
+
+    <picture> с srcset по готовым вариантам картинки из ImageVariant.
+    Варианты нарезает process_thumbnails; пока их нет — заглушка.
+    """
+    by_format = {}
+    for variant in thumbnails.variants_for(image):
+        by_format.setdefault(variant["format"], []).append(variant)
+    fallback = sorted(
+        by_format.pop(thumbnails.FALLBACK_FORMAT, []),
+        key=lambda variant: variant["width"],
+    )
+    sources = [
+        {
+            "type": thumbnails.FORMATS[format][0],
+            "srcset": _srcset(sorted(variants, key=lambda v: v["width"])),
+        }
+        for format, variants in sorted(
+            by_format.items(),
+            key=lambda item: list(thumbnails.FORMATS).index(item[0]),
+        )
+    ]
+    return {
+        "image": image,
+        "css_class": css_class,
+        "sizes": SIZES,
+        "sources": sources,
+        "fallback": fallback[-1] if fallback else None,
+        "fallback_url": default_storage.url(fallback[-1]["name"]) if fallback else "",
+        "fallback_srcset": _srcset(fallback),
+    }
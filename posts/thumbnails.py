@@ -0,0 +1,240 @@
+"""
+Предварительная генерация картинок постов.
+
+Раньше sorl-thumbnail уменьшал картинку при первом показе ленты, прямо
+в запросе, и всем клиентам отдавался один JPEG 960x339. Теперь new_post
+и post_edit ставят картинку в очередь (ThumbnailJob), а команда
+process_thumbnails в пуле процессов нарезает её в несколько ширин (WIDTHS)
+и форматов: AVIF и WebP, если их умеет сохранять установленный Pillow,
+и JPEG для остальных браузеров. Готовые варианты записываются в таблицу
+ImageVariant, по ней шаблон строит srcset. Пока вариантов нет, шаблон
+показывает заглушку.
+"""
+import hashlib
+import posixpath
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F, Q
+from PIL import Image, ImageOps
+
+from yatube.lru import LRUCache
+
+from . import caching, workers
+from .models import ImageVariant, Post, ThumbnailJob
+
+
+# Пропорции картинки в карточке поста
+RATIO = (960, 339)
+WIDTHS = (320, 640, 960)
+
+# Формат Pillow -> (MIME-тип, расширение, параметры сохранения).
+# Порядок важен: браузер берёт первый подходящий <source>
+FORMATS = {
+    "AVIF": ("image/avif", "avif", {"quality": 50}),
+    "WEBP": ("image/webp", "webp", {"quality": 75, "method": 4}),
+    "JPEG": ("image/jpeg", "jpg", {
+        "quality": 80, "optimize": True, "progressive": True,
+    }),
+}
+FALLBACK_FORMAT = "JPEG"
+VARIANTS_DIR = "variants"
+
+MAX_ATTEMPTS = 3
+
+# Варианты картинок, уже прочитанные этим процессом. Пустые списки сюда не
+# попадают: картинка в очереди должна появиться сразу после генерации
+variants_lru = LRUCache(maxsize=5000)
+
+
+def supported_formats():
+    """Форматы из FORMATS, которые может сохранить установленный Pillow."""
+    Image.init()
+    return [name for name in FORMATS if name in Image.SAVE]
+
+
+def _image_name(image):
+    return getattr(image, "name", image) or ""
+
+
+def _variants_key(name):
+    return "image-variants:%s" % hashlib.md5(name.encode()).hexdigest()
+
+
+def variant_path(name, width, format):
+    digest = hashlib.md5(name.encode()).hexdigest()
+    return "%s/%s/%s/%d.%s" % (
+        VARIANTS_DIR, digest[:2], digest, width, FORMATS[format][1])
+
+
+def variants_for(image):
+    """
+    Варианты картинки: список словарей format/width/height/name.
+    Читаются из LRU процесса, затем из кэша, при промахе — одним запросом
+    из ImageVariant.
+    """
+    name = _image_name(image)
+    if not name:
+        return []
+    variants = variants_lru.get(name)
+    if variants is not None:
+        return variants
+    key = _variants_key(name)
+    variants = cache.get(key)
+    if variants is None:
+        variants = list(
+            ImageVariant.objects.filter(image=name)
+            .values("format", "width", "height", "name")
+        )
+        cache.set(key, variants, caching.feed_timeout())
+    if variants:
+        variants_lru.set(name, variants)
+    return variants
+
+
+def enqueue(image):
+    """Ставит картинку в очередь генерации вариантов."""
+    if not image:
+        return
+    ThumbnailJob.objects.update_or_create(
+        image=_image_name(image),
+        defaults={"status": ThumbnailJob.PENDING, "attempts": 0, "error": ""},
+    )
+
+
+def enqueue_missing():
+    """Ставит в очередь картинки постов, для которых ещё нет задачи."""
+    images = Post.objects.exclude(Q(image="") | Q(image__isnull=True)) \
+        .exclude(image__in=ThumbnailJob.objects.values("image")) \
+        .values_list("image", flat=True).distinct()
+    jobs = [ThumbnailJob(image=name) for name in images.iterator()]
+    ThumbnailJob.objects.bulk_create(jobs, batch_size=500, ignore_conflicts=True)
+    return len(jobs)
+
+
+def claim(limit):
+    """Забирает из очереди до limit задач, помечая их выполняемыми."""
+    return workers.claim(ThumbnailJob.objects.all(), limit)
+
+
+def requeue_stale(older_than):
+    """Возвращает в очередь задачи, зависшие после падения воркера."""
+    return workers.requeue_stale(ThumbnailJob, older_than)
+
+
+def generate(image):
+    """
+    Нарезает варианты картинки и сохраняет их в хранилище.
+    Выполняется в процессе пула и в базу не пишет: возвращает список
+    вариантов, который записывает finish().
+    """
+    with default_storage.open(image) as source_file:
+        source = ImageOps.exif_transpose(Image.open(source_file))
+        source.load()
+    if source.mode not in ("RGB", "RGBA"):
+        source = source.convert("RGBA" if "A" in source.getbands() else "RGB")
+
+    # Больше исходника не увеличиваем, но хотя бы один размер нужен всегда
+    widths = [width for width in WIDTHS if width <= source.width] or WIDTHS[:1]
+    variants = []
+    for width in widths:
+        height = round(width * RATIO[1] / RATIO[0])
+        resized = ImageOps.fit(source, (width, height), Image.LANCZOS)
+        for format in supported_formats():
+            frame = resized.convert("RGB") if format == "JPEG" else resized
+            buffer = BytesIO()
+            frame.save(buffer, format, **FORMATS[format][2])
+            name = variant_path(image, width, format)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.append({
+                "format": format, "width": width, "height": height,
+                "name": name, "size": buffer.tell(),
+            })
+    return variants
+
+
+def _metadata(variants):
+    return [
+        {key: variant[key] for key in ("format", "width", "height", "name")}
+        for variant in variants
+    ]
+
+
+def record_variants(image, variants):
+    with transaction.atomic():
+        ImageVariant.objects.filter(image=image).delete()
+        ImageVariant.objects.bulk_create(
+            ImageVariant(image=image, **variant) for variant in variants)
+    cache.set(_variants_key(image), _metadata(variants), caching.feed_timeout())
+    variants_lru.delete(image)
+
+
+def finish(job, variants=None, error=None):
+    job.attempts += 1
+    if error is None:
+        record_variants(job.image, variants or [])
+        job.status, job.error = ThumbnailJob.DONE, ""
+    else:
+        job.error = error
+        job.status = (ThumbnailJob.FAILED if job.attempts >= MAX_ATTEMPTS
+                      else ThumbnailJob.PENDING)
+    job.save(update_fields=["status", "attempts", "error", "updated"])
+    if job.status == ThumbnailJob.DONE:
+        # В закэшированных лентах вместо картинки ещё стоит заглушка
+        posts = Post.objects.filter(image=job.image).select_related("author", "group")
+        posts.update(version=F("version") + 1)
+        for post in posts:
+            caching.bump_feeds(caching.post_feeds(post))
+
+
+def walk(storage, path):
+    """Все файлы в каталоге хранилища, рекурсивно."""
+    try:
+        directories, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(path, directory))
+
+
+def rebuild_index(storage=default_storage):
+    """
+    Восстанавливает ImageVariant по файлам в хранилище: пути вариантов
+    вычисляются из имени картинки, поэтому заново нарезать ничего не нужно.
+    Картинки без единого готового файла ставятся в очередь.
+    Возвращает (число записанных картинок, число поставленных в очередь).
+    """
+    images = Post.objects.exclude(Q(image="") | Q(image__isnull=True)) \
+        .values_list("image", flat=True).distinct()
+    recorded = queued = 0
+    for image in images.iterator():
+        variants = []
+        for width in WIDTHS:
+            for format in supported_formats():
+                name = variant_path(image, width, format)
+                if storage.exists(name):
+                    variants.append({
+                        "format": format, "width": width,
+                        "height": round(width * RATIO[1] / RATIO[0]),
+                        "name": name, "size": storage.size(name),
+                    })
+        if variants:
+            record_variants(image, variants)
+            recorded += 1
+        else:
+            enqueue(image)
+            queued += 1
+    return recorded, queued
+
+
+def stale_variants():
+    """Записи ImageVariant для картинок, которых больше нет ни у одного поста."""
+    return ImageVariant.objects.exclude(
+        image__in=Post.objects.exclude(image__isnull=True).values("image"))
@@ -0,0 +1,186 @@
+"""
+Выгрузка и загрузка данных в NDJSON: одна строка — один объект,
+в том же виде, что у сериализатора Django:
+
+    {"model": "posts.post", "pk": 1, "fields": {"text": "...", "author": 2, ...}}
+
+loaddata сохраняет объекты по одному и на большой базе работает минутами.
+Здесь выгрузка читает таблицы пачками по первичному ключу, а загрузка
+вставляет их через bulk_create: сигналы при этом не срабатывают, и всё,
+что они поддерживают (профили и счётчики, ленты подписок, поисковый
+индекс, очередь картинок, версии кэша лент), пересчитывается один раз
+в конце — см. rebuild_derived(). Память не зависит от объёма файла.
+"""
+import json
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils.dateparse import parse_datetime
+
+from . import caching, search, thumbnails
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def specs():
+    """(модель, поля) в порядке выгрузки: сначала те, на кого ссылаются."""
+    return (
+        (Group, ("title", "slug", "description")),
+        (User, (
+            "username", "password", "email", "first_name", "last_name",
+            "is_active", "is_staff", "is_superuser", "date_joined", "last_login",
+        )),
+        (Post, ("text", "pub_date", "author", "group", "image")),
+        (Comment, ("post", "author", "text", "created")),
+        (Follow, ("user", "author")),
+    )
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def _rows(model, fields, batch_size):
+    last_pk = 0
+    while True:
+        rows = list(
+            model._default_manager.filter(pk__gt=last_pk).order_by("pk")
+            .values("pk", *fields)[:batch_size]
+        )
+        if not rows:
+            return
+        last_pk = rows[-1]["pk"]
+        yield from rows
+
+
+def _dump(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def export(stream, batch_size=1000, progress=None):
+    """Пишет все объекты в поток построчно. Возвращает {модель: число}."""
+    counts = {}
+    for model, fields in specs():
+        label = _label(model)
+        counts[label] = 0
+        for row in _rows(model, fields, batch_size):
+            stream.write(json.dumps({
+                "model": label,
+                "pk": row.pop("pk"),
+                "fields": {name: _dump(value) for name, value in row.items()},
+            }, ensure_ascii=False) + "\n")
+            counts[label] += 1
+        if progress:
+            progress(label, counts[label])
+    return counts
+
+
+@contextmanager
+def keep_dates(models_list):
+    """
+    bulk_create вызывает pre_save полей, и auto_now_add заменил бы даты
+    из файла текущим временем. На время загрузки он отключается.
+    """
+    changed = []
+    for model in models_list:
+        for field in model._meta.concrete_fields:
+            for flag in ("auto_now", "auto_now_add"):
+                if getattr(field, flag, False):
+                    setattr(field, flag, False)
+                    changed.append((field, flag))
+    try:
+        yield
+    finally:
+        for field, flag in changed:
+            setattr(field, flag, True)
+
+
+def _build(model, record):
+    values = {"pk": record["pk"]}
+    for name, value in record["fields"].items():
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            values[field.attname] = value
+        elif isinstance(field, models.DateTimeField) and value is not None:
+            values[name] = parse_datetime(value)
+        else:
+            values[name] = value
+    return model(**values)
+
+
+def _flush(model, objects):
+    # Повторно загруженные строки (после прерванного импорта) пропускаются
+    model._default_manager.bulk_create(objects, ignore_conflicts=True)
+
+
+def import_stream(stream, batch_size=1000, offset=0, checkpoint=None, progress=None):
+    """
+    Загружает объекты из бинарного потока, начиная с байта offset.
+    После каждой сохранённой пачки вызывается checkpoint(offset) — с этого
+    места загрузку можно продолжить. Если процесс упадёт между вставкой и
+    checkpoint, пачка загрузится повторно и её строки будут пропущены.
+    Возвращает {модель: число прочитанных объектов}.
+    """
+    registry = {_label(model): model for model, _ in specs()}
+    counts = {}
+    model, batch = None, []
+
+    def flush(position):
+        if batch:
+            with transaction.atomic():
+                _flush(model, batch)
+            if checkpoint:
+                checkpoint(position)
+            if progress:
+                progress(_label(model), counts[_label(model)])
+            batch.clear()
+
+    stream.seek(offset)
+    with keep_dates(registry.values()):
+        while True:
+            position = stream.tell()
+            line = stream.readline()
+            if not line:
+                flush(position)
+                break
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            current = registry.get(record["model"])
+            if current is None:
+                raise ValueError("Неизвестная модель: %s" % record["model"])
+            if current is not model or len(batch) >= batch_size:
+                flush(position)
+                model = current
+            batch.append(_build(model, record))
+            counts[record["model"]] = counts.get(record["model"], 0) + 1
+    return counts
+
+
+def reset_sequences():
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [model for model, _ in specs()])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def rebuild_derived(batch_size=1000, stdout=None):
+    """То, что при обычном сохранении делают сигналы, — одним проходом."""
+    reset_sequences()
+    # Профили и счётчики постов, подписок и комментариев
+    call_command("recount", batch_size=batch_size, stdout=stdout)
+    call_command("backfill_timeline", stdout=stdout)
+    search.rebuild(batch_size)
+    thumbnails.enqueue_missing()
+
+    caching.bump_feeds([caching.INDEX_FEED])
+    for slug in Group.objects.values_list("slug", flat=True).iterator():
+        caching.bump_feeds([caching.group_feed(slug)])
+    for username in User.objects.values_list("username", flat=True).iterator():
+        caching.bump_feeds([caching.profile_feed(username)])
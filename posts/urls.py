@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
 
@@ -8,12 +8,18 @@ urlpatterns = [
     path("follow/", views.follow_index, name="follow_index"),
     path("group/<slug:slug>/", views.group_posts, name="group"),
     path("new/", views.new_post, name="new_post"),
+    path("search/", views.search_posts, name="search"),
+    # JSON API лент
+    path("api/posts/", api.index, name="api_index"),
+    path("api/follow/", api.follow_index, name="api_follow_index"),
+    path("api/<username>/posts/", api.profile, name="api_profile"),
     # Профайл пользователя
     path("<username>/", views.profile, name="profile"),
     # Просмотр записи
     path("<username>/<int:post_id>/", views.post_view, name="post"),
     path("<username>/<int:post_id>/edit/", views.post_edit, name="post_edit"),
     path("<username>/<int:post_id>/comment/", views.add_comment, name="add_comment"),
+    path("<username>/<int:post_id>/comments/", views.post_comments, name="post_comments"),
     
     path("<username>/follow/", views.profile_follow, name="profile_follow"),
     path("<username>/unfollow/", views.profile_unfollow, name="profile_unfollow"),
@@ -3,57 +3,78 @@ from django.http import HttpResponse, request
 from .models import Group, Post, User, Comment, Follow
 from .forms import PostForm, Group, CommentForm
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
-from django.views.decorators.cache import cache_page
+from django.db import IntegrityError, transaction
+from django.conf import settings
+from .pagination import CursorPaginator, paginate
+from .search import SearchPaginator
+from . import caching, thumbnails, timeline
+from yatube.db_router import replica_reads
+from yatube.ratelimit import ratelimit
 
+# Комментарии идут от старых к новым, по индексу (post, created)
+COMMENT_ORDERING = ("created", "id")
 
 
+@replica_reads
+@caching.cache_feed_page(lambda request: caching.INDEX_FEED)
 def index(request):
-    post_list = Post.objects.order_by("-pub_date").all()
-    paginator = Paginator(post_list, 10) # показывать по 10 записей на странице.
-    page_number = request.GET.get('page') # переменная в URL с номером запрошенной страницы
-    page = paginator.get_page(page_number) # получить записи с нужным смещением
-    return render(request, 'index.html', {'page': page, 'paginator': paginator})
+    post_list = Post.objects.for_feed()
+    # показывать по 10 записей на странице, дальше листаем по курсору
+    paginator, page = paginate(request, post_list)
+    return render(request, 'index.html', {'page': page, 'paginator': paginator, 'feed': caching.INDEX_FEED})
 
 
+@replica_reads
+@caching.cache_feed_page(lambda request, slug: caching.group_feed(slug))
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
 
-    post_list = Post.objects.filter(group=group).order_by("-pub_date").all()
-    paginator = Paginator(post_list, 10)
+    post_list = Post.objects.for_feed().filter(group=group)
+    paginator, page = paginate(request, post_list)
+    return render(request, "group.html", {"group": group, "page": page, "paginator": paginator, "feed": caching.group_feed(slug)})
 
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, "group.html", {"group": group, "page": page, "paginator": paginator})
+
+@replica_reads
+def search_posts(request):
+    query = request.GET.get("q", "").strip()
+    paginator = page = None
+    if query:
+        # выдача ранжирована по BM25 и свежести, листаем по курсору
+        paginator = SearchPaginator(query, per_page=10)
+        page = paginator.get_page(request.GET.get("cursor"))
+    return render(request, "search.html", {"query": query, "page": page, "paginator": paginator})
 
 
 @login_required
+@ratelimit("post")
 def new_post(request):
     if request.method == 'POST':
         form = PostForm(request.POST or None, files=request.FILES or None)
         if form.is_valid():
-            Post.objects.create(
-                text=form.cleaned_data['text'],
-                author=request.user,
-                group=form.cleaned_data['group'],
-                image=form.cleaned_data['image']
-            )
+            # пост, счётчики и задачи очереди (раскладка по лентам, поиск)
+            # записываются вместе или не записываются вовсе
+            with transaction.atomic():
+                post = Post.objects.create(
+                    text=form.cleaned_data['text'],
+                    author=request.user,
+                    group=form.cleaned_data['group'],
+                    image=form.cleaned_data['image']
+                )
+                # миниатюры создаст process_thumbnails, а не первый показ ленты
+                thumbnails.enqueue(post.image)
             return redirect('/')
     form = PostForm(request.POST or None, files=request.FILES or None)
     return render(request, "new.html", {"form" : form})
 
 
 #@login_required
+@replica_reads
+@caching.cache_feed_page(lambda request, username: caching.profile_feed(username))
 def profile(request, username):
-    author = get_object_or_404(User,username=username)
-    post_list = Post.objects.filter(author=author).order_by("-pub_date").all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(user=request.user, author=author).exists()
-    else:
-        following = False
+    author = get_object_or_404(User.objects.select_related("profile"), username=username)
+    post_list = Post.objects.for_feed().filter(author=author)
+    paginator, page = paginate(request, post_list, count=author.profile.post_count)
+    # кнопку подписки рендерит дыра follow_button: страница общая для всех
     return render(request, "profile.html", 
             {
             "page": page, 
@@ -61,40 +82,69 @@ def profile(request, username):
             "author": author, 
             "post_list": post_list, 
             "username": username, 
-            "following": following,
+            "feed": caching.profile_feed(username),
             }
         )
 
 
+@replica_reads
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    author = get_object_or_404(User, username=username)
-    post_count = Post.objects.filter(author=author).count()
-    comment_count = Comment.objects.filter(post=post).count()
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related("author__profile"), pk=post_id)
+    # Обычно страница открыта по адресу автора поста: он уже загружен
+    if post.author.username == username:
+        author = post.author
+    else:
+        author = get_object_or_404(User.objects.select_related("profile"), username=username)
+    post_count = author.profile.post_count
     form = CommentForm()
-    items = Comment.objects.filter(post=post)
+    # первая страница комментариев, остальные подгружает post_comments;
+    # сам comments шаблон не перебирает
+    comments = post_comment_list(post.pk)
+    items = CursorPaginator(comments, settings.COMMENTS_FIRST_PAGE, COMMENT_ORDERING) \
+        .get_page(request.GET.get("cursor"))
     return render(request, "post.html",
             {
             "post" : post, 
             "author" : author, 
             "post_count": post_count, 
             "form":form, 
+            "comments": comments,
             "items":items
             }
         )
 
 
+def post_comment_list(post_id):
+    return Comment.objects.filter(post_id=post_id).select_related("author")
+
+
+@replica_reads
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев: фрагмент HTML для «Показать ещё»."""
+    post = get_object_or_404(Post.objects.select_related("author"), pk=post_id)
+    items = CursorPaginator(
+        post_comment_list(post.pk), settings.COMMENTS_PAGE_SIZE, COMMENT_ORDERING,
+    ).get_page(request.GET.get("cursor"))
+    return render(request, "comments_page.html", {"post": post, "items": items})
+
+
 @login_required
 def post_edit(request, username, post_id):
     profile = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, pk=post_id, author=profile)
+    # автор и группа понадобятся сигналам сброса кэша лент
+    post = get_object_or_404(
+        Post.objects.select_related("author", "group"), pk=post_id, author=profile)
     if request.user != profile:
         return redirect("post", username=request.user.username, post_id=post_id)
     form = PostForm(request.POST or None, files=request.FILES or None, instance=post)
 
     if request.method == "POST":
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                post = form.save()
+                if "image" in form.changed_data:
+                    thumbnails.enqueue(post.image)
             return redirect("post", username=request.user.username, post_id=post_id)
     return render(request, "post_edit.html", {"form": form, "post":post})
 
@@ -108,43 +158,55 @@ def server_error(request):
 
 
 @login_required
+@ratelimit("comment")
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.select_related("author", "group"), id=post_id)
     if request.method == "POST":
         form = CommentForm(request.POST)
         if form.is_valid():
             comment = form.save(commit=False)
             comment.post = post
             comment.author = request.user
-            comment.save()
+            with transaction.atomic():
+                comment.save()
             return redirect("post", username=request.user, post_id=post_id)
+    # GET и пустая форма раньше возвращали None и падали с ошибкой 500
+    return redirect("post", username=username, post_id=post_id)
 
 
+# Без replica_reads: лента подписок дописывает посты «знаменитостей» в
+# primary и должна сразу их прочитать
 @login_required
 def follow_index(request):
-    post_list = Post.objects.select_related("author") \
-        .filter(author__following__in=Follow.objects.filter(user=request.user)).order_by('-pub_date').all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    # лента читается из материализованной таблицы TimelineEntry
+    post_list = timeline.feed_for(request.user).for_feed() \
+        .order_by(*timeline.FEED_ORDERING)
+    paginator, page = paginate(
+        request, post_list, count=timeline.feed_count(request.user),
+        ordering=timeline.FEED_ORDERING)
     return render(request, "follow.html", {"page": page, "paginator": paginator})
 
 
 @login_required
+@ratelimit("follow", methods=("GET", "POST"))
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if Follow.objects.filter(user=request.user, author=author).exists():
-        return redirect("profile", username=username)
-    else:
-        if request.user != author:
-            Follow.objects.create(user=request.user, author=author)
+    if request.user != author:
+        try:
+            with transaction.atomic():
+                Follow.objects.create(user=request.user, author=author)
+        except IntegrityError:
+            # уже подписан: повтор отсекает уникальный индекс (user, author)
+            pass
     return redirect("profile", username=username)
 
 
 @login_required
+@ratelimit("follow", methods=("GET", "POST"))
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    one = Follow.objects.filter(user=request.user, author=author).first()
+    one = Follow.objects.filter(user=request.user, author=author) \
+        .select_related("user", "author").first()
     if one:
         one.delete()
     return redirect("profile", username=username)
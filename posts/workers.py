@@ -0,0 +1,54 @@
+"""
+Общее для воркеров очередей в базе: команд run_workers (Job) и
+process_thumbnails (ThumbnailJob).
+
+Обе очереди — таблицы со статусами PENDING/RUNNING и полем updated.
+Воркер забирает задачи claim(), обновляя строку с условием на статус, а
+задачи, зависшие после падения воркера, возвращает requeue_stale().
+"""
+from concurrent.futures import Future
+
+from django.db import connections
+from django.utils import timezone
+
+
+def close_connections():
+    # Соединения с базой, унаследованные при fork(), в дочернем процессе
+    # использовать нельзя: Django откроет новые
+    connections.close_all()
+
+
+class InlineExecutor:
+    """Выполняет задачи сразу в текущем процессе (--workers 0)."""
+
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+def claim(queryset, limit, ordering=("id",), **changes):
+    """
+    Забирает до limit ожидающих задач из queryset, помечая их
+    выполняемыми; changes дописываются в ту же строку.
+    """
+    model = queryset.model
+    ids = queryset.filter(status=model.PENDING) \
+        .order_by(*ordering).values_list("id", flat=True)[:limit]
+    claimed = []
+    for job_id in ids:
+        # Обновление с условием на статус: задачу заберёт только один воркер
+        if model.objects.filter(id=job_id, status=model.PENDING).update(
+                status=model.RUNNING, updated=timezone.now(), **changes):
+            claimed.append(job_id)
+    return list(model.objects.filter(id__in=claimed).order_by(*ordering))
+
+
+def requeue_stale(model, older_than):
+    """Возвращает в очередь задачи, зависшие после падения воркера."""
+    return model.objects.filter(
+        status=model.RUNNING, updated__lt=timezone.now() - older_than,
+    ).update(status=model.PENDING)
@@ -1,4 +1,29 @@
+import pytest
+from django.test.utils import override_settings
+
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def test_settings(tmp_path_factory):
+    from django.conf import settings
+    from yatube.testing import redirect_query_log, test_settings
+    override = override_settings(**test_settings(str(tmp_path_factory.mktemp('yatube'))))
+    override.enable()
+    restore_query_log = redirect_query_log(settings.QUERY_LOG_FILE)
+    yield
+    restore_query_log()
+    override.disable()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Кэш живёт между тестами, а база — нет
+    from django.core.cache import cache
+    from posts import kvstore, thumbnails
+    cache.clear()
+    kvstore.lru.clear()
+    thumbnails.variants_lru.clear()
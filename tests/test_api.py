@@ -0,0 +1,120 @@
+import json
+
+import pytest
+from django.test import Client
+from django.utils.http import http_date
+
+from posts.models import Follow, Post
+
+
+def read(response):
+    return json.loads(b''.join(response.streaming_content))
+
+
+@pytest.fixture
+def many_posts(user):
+    return [
+        Post.objects.create(text=f'Пост {i}', author=user)
+        for i in range(15)
+    ]
+
+
+class TestFeedAPI:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_walk(self, many_posts, post_with_group):
+        client = Client()
+        response = client.get('/api/posts/')
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('application/json')
+        assert not response.templates, \
+            'Проверьте, что API отдаёт JSON без рендеринга шаблонов'
+        data = read(response)
+        assert len(data['results']) == 10
+        assert data['previous'] is None
+        first = data['results'][0]
+        assert first['id'] == post_with_group.id
+        assert first['author'] == post_with_group.author.username
+        assert first['group'] == {
+            'slug': post_with_group.group.slug, 'title': post_with_group.group.title,
+        }
+        assert first['url'] == f'/{post_with_group.author.username}/{post_with_group.id}/'
+
+        data = read(client.get(data['next']))
+        assert len(data['results']) == 6 and data['next'] is None, \
+            'Проверьте, что ссылка next ведёт на следующую страницу ленты'
+        assert data['results'][-1]['id'] == many_posts[0].id
+        assert data['previous'] is not None
+
+        data = read(client.get('/api/posts/?limit=1000'))
+        assert len(data['results']) == 16
+
+    @pytest.mark.django_db(transaction=True)
+    def test_conditional_get(self, many_posts, django_assert_max_num_queries):
+        client = Client()
+        response = client.get('/api/posts/')
+        etag = response['ETag']
+        assert etag.startswith('"'), 'Проверьте, что ETag сильный'
+        assert response['Last-Modified'] == http_date(many_posts[-1].pub_date.timestamp())
+
+        with django_assert_max_num_queries(0):
+            response = client.get('/api/posts/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, \
+            'Проверьте, что неизменившаяся лента отдаёт 304 без запросов к базе'
+        response = client.get(
+            '/api/posts/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        assert response.status_code == 304
+
+        other = client.get('/api/posts/?limit=5')
+        assert other['ETag'] != etag, 'Проверьте, что ETag зависит от параметров запроса'
+
+        Post.objects.create(text='Новый пост', author=many_posts[0].author)
+        response = client.get('/api/posts/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Проверьте, что после нового поста ETag ленты меняется'
+        assert response['ETag'] != etag
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile(self, many_posts, user, django_user_model):
+        other = django_user_model.objects.create_user(username='other', password='1234567')
+        Post.objects.create(text='Чужой пост', author=other)
+        data = read(Client().get(f'/api/{user.username}/posts/?limit=20'))
+        ids = [item['id'] for item in data['results']]
+        assert ids == [post.id for post in reversed(many_posts)]
+
+        etag = Client().get(f'/api/{user.username}/posts/')['ETag']
+        response = Client().get(f'/api/{user.username}/posts/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        response = Client().get('/api/nobody/posts/')
+        assert response.status_code == 404, \
+            'Проверьте, что для неизвестного автора API возвращает 404, как и страница профиля'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow(self, client, user, post, django_user_model):
+        assert Client().get('/api/follow/').status_code == 401, \
+            'Проверьте, что лента подписок в API доступна только после входа'
+
+        reader = django_user_model.objects.create_user(username='reader', password='1234567')
+        reader_client = Client()
+        reader_client.force_login(reader)
+        Follow.objects.create(user=reader, author=user)
+        response = reader_client.get('/api/follow/')
+        assert [item['id'] for item in read(response)['results']] == [post.id]
+        etag = response['ETag']
+        assert reader_client.get('/api/follow/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        Follow.objects.filter(user=reader, author=user).delete()
+        response = reader_client.get('/api/follow/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200, \
+            'Проверьте, что после отписки ETag ленты подписок меняется'
+        assert read(response)['results'] == []
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reserved_username(self):
+        data = {'username': 'api', 'password1': 'Xq7!secret-pass', 'password2': 'Xq7!secret-pass'}
+        response = Client().post('/auth/signup/', data)
+        assert response.status_code == 200 and 'username' in response.context['form'].errors, \
+            'Проверьте, что нельзя зарегистрировать имя, занятое адресом api/'
+        data['username'] = 'apiary'
+        assert Client().post('/auth/signup/', data).status_code == 302
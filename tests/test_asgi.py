@@ -0,0 +1,112 @@
+import asyncio
+import threading
+
+import pytest
+from django.test import Client
+from django.urls import resolve
+
+from posts import async_views
+from posts.models import Comment
+from yatube import aio
+from yatube.asgi import ASGIHandler, application
+
+
+def asgi_get(path, query=b'', cookies=None):
+    headers = [(b'host', b'localhost')]
+    if cookies:
+        headers.append((b'cookie', '; '.join(
+            f'{name}={morsel.value}' for name, morsel in cookies.items()).encode()))
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': query,
+        'headers': headers, 'server': ('localhost', 80), 'client': ('10.0.0.1', 1),
+        'scheme': 'http', 'http_version': '1.1',
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start, body = messages
+    return start['status'], dict(start['headers']), body['body'].decode()
+
+
+class TestASGI:
+
+    def test_async_routes(self):
+        for path, view in [
+            ('/', async_views.index),
+            ('/group/slug/', async_views.group_posts),
+            ('/someone/', async_views.profile),
+            ('/someone/1/', async_views.post_view),
+            ('/follow/', async_views.follow_index),
+        ]:
+            assert resolve(path, 'yatube.asgi_urls').func is view, \
+                f'Проверьте, что под ASGI {path} обслуживает асинхронная view'
+        assert resolve('/new/', 'yatube.asgi_urls').url_name == 'new_post'
+        assert resolve('/admin/', 'yatube.asgi_urls').app_name == 'admin'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pages(self, post_with_group, user):
+        Comment.objects.create(post=post_with_group, author=user, text='Комментарий ASGI')
+        group = post_with_group.group
+        for path in ['/', f'/group/{group.slug}/', f'/{user.username}/']:
+            status, headers, html = asgi_get(path)
+            assert status == 200, path
+            assert post_with_group.text in html, \
+                f'Проверьте, что асинхронная страница {path} показывает посты'
+            assert headers[b'content-type'].startswith(b'text/html')
+
+        status, _, html = asgi_get(f'/{user.username}/{post_with_group.id}/')
+        assert status == 200 and 'Комментарий ASGI' in html
+        assert asgi_get(f'/{user.username}/999/')[0] == 404
+        assert asgi_get('/group/missing/')[0] == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_needs_login(self, user, post):
+        status, headers, _ = asgi_get('/follow/')
+        assert status == 302 and b'/auth/login/' in headers[b'location']
+
+        client = Client()
+        client.force_login(user)
+        status, _, html = asgi_get('/follow/', cookies=client.cookies)
+        assert status == 200
+        status, _, html = asgi_get(f'/{user.username}/', cookies=client.cookies)
+        assert status == 200 and post.text in html
+
+    @pytest.mark.django_db(transaction=True)
+    def test_run_db_queries_are_instrumented(self, settings, monkeypatch, post):
+        settings.PERF_SAMPLE_RATE = 1
+        monkeypatch.setattr('yatube.instrumentation.show_timing', lambda request: True)
+        status, headers, _ = asgi_get('/')
+        assert status == 200
+        timing = headers[b'server-timing'].decode()
+        assert '"0 queries"' not in timing and 'queries' in timing, \
+            'Проверьте, что запросы из run_db попадают в счётчики запроса'
+
+    def test_run_db_concurrent(self):
+        # Оба вызова дождутся друг друга, только если выполняются одновременно
+        barrier = threading.Barrier(2, timeout=5)
+
+        async def both():
+            return await asyncio.gather(
+                aio.run_db(barrier.wait), aio.run_db(barrier.wait))
+
+        assert sorted(asyncio.run(both())) == [0, 1]
+
+    def test_lifespan(self):
+        handler = ASGIHandler()
+        messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+        sent = []
+
+        async def receive():
+            return next(messages)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(handler({'type': 'lifespan'}, receive, send))
+        assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
@@ -0,0 +1,62 @@
+import re
+
+import pytest
+from django.test import Client
+
+from posts.models import Comment
+
+
+@pytest.fixture
+def comments(post, user, settings):
+    settings.COMMENTS_FIRST_PAGE = 3
+    settings.COMMENTS_PAGE_SIZE = 4
+    return [
+        Comment.objects.create(post=post, author=user, text=f'Комментарий номер {i}')
+        for i in range(10)
+    ]
+
+
+def shown(html):
+    return [int(number) for number in re.findall(r'Комментарий номер (\d+)', html)]
+
+
+class TestCommentPages:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_first_page(self, comments, post, user, django_assert_max_num_queries):
+        client = Client()
+        url = f'/{user.username}/{post.id}/'
+        with django_assert_max_num_queries(4):
+            response = client.get(url)
+        html = response.content.decode()
+        assert shown(html) == [0, 1, 2], \
+            'Проверьте, что на странице поста показывается только первая страница комментариев'
+        assert 'js-more-comments' in html, 'Проверьте, что есть кнопка «Показать ещё»'
+        assert response.context['items'].has_next()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_load_more(self, comments, post, user):
+        client = Client()
+        url = f'/{user.username}/{post.id}/'
+        cursor = client.get(url).context['items'].next_cursor
+
+        numbers = []
+        while cursor:
+            response = client.get(url + 'comments/', {'cursor': cursor})
+            assert response.status_code == 200
+            html = response.content.decode()
+            assert '<html' not in html, 'Проверьте, что «Показать ещё» отдаёт фрагмент HTML'
+            numbers += shown(html)
+            items = response.context['items']
+            cursor = items.next_cursor
+            assert ('js-more-comments' in html) == items.has_next()
+        assert numbers == list(range(3, 10)), \
+            'Проверьте, что подгрузка комментариев не теряет и не повторяет их'
+
+        # Без JavaScript кнопка ведёт на страницу поста со следующими комментариями
+        response = client.get(url, {'cursor': client.get(url).context['items'].next_cursor})
+        assert shown(response.content.decode()) == [3, 4, 5]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_missing_post(self, user):
+        assert Client().get(f'/{user.username}/999/comments/').status_code == 404
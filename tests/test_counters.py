@@ -0,0 +1,82 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts import caching
+from posts.models import Comment, Follow, Post
+from users.models import Profile
+
+
+@pytest.fixture
+def author():
+    return get_user_model().objects.create_user(username='CounterAuthor')
+
+
+class TestCounters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_counters_follow_signals(self, user, author):
+        post = Post.objects.create(text='Тестовый пост', author=author)
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        Follow.objects.create(user=user, author=author)
+
+        author.profile.refresh_from_db()
+        user.profile.refresh_from_db()
+        post.refresh_from_db()
+        assert author.profile.post_count == 1, 'Проверьте счётчик постов автора'
+        assert author.profile.follower_count == 1, 'Проверьте счётчик подписчиков'
+        assert user.profile.following_count == 1, 'Проверьте счётчик подписок'
+        assert post.comment_count == 1, 'Проверьте счётчик комментариев поста'
+
+        Follow.objects.all().delete()
+        Comment.objects.all().delete()
+        post.delete()
+        author.profile.refresh_from_db()
+        user.profile.refresh_from_db()
+        assert (author.profile.post_count, author.profile.follower_count) == (0, 0)
+        assert user.profile.following_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_recount_repairs_drift(self, user, author):
+        post = Post.objects.create(text='Тестовый пост', author=author)
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        Profile.objects.filter(user=author).update(post_count=42)
+        Post.objects.update(comment_count=7)
+        Profile.objects.filter(user=user).delete()
+
+        call_command('recount', batch_size=1)
+
+        assert Profile.objects.get(user=author).post_count == 1, \
+            'Проверьте, что команда recount исправляет счётчик постов'
+        assert Profile.objects.filter(user=user).exists(), \
+            'Проверьте, что команда recount создаёт недостающие профили'
+        assert Post.objects.get().comment_count == 1, \
+            'Проверьте, что команда recount исправляет счётчик комментариев'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_recount_writes_in_one_update(self, author):
+        Post.objects.create(text='Тестовый пост', author=author)
+        Profile.objects.filter(user=author).update(post_count=42)
+        feed = caching.profile_feed(author.username)
+        version = caching.feed_version(feed)
+
+        with CaptureQueriesContext(connection) as context:
+            call_command('recount')
+        updates = [query['sql'] for query in context.captured_queries
+                   if query['sql'].startswith('UPDATE "users_profile"')]
+        assert len(updates) == 1 and 'COUNT(' in updates[0], \
+            'Проверьте, что recount считает счётчики в самом UPDATE, а не пишет прочитанные числа'
+        assert Profile.objects.get(user=author).post_count == 1
+        assert caching.feed_version(feed) != version, \
+            'Проверьте, что recount сбрасывает кэш страниц исправленных профилей'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile_page_uses_counters(self, client, author):
+        Post.objects.create(text='Тестовый пост', author=author)
+        Profile.objects.filter(user=author).update(post_count=5, follower_count=3)
+        response = client.get(f'/{author.username}/')
+        content = response.content.decode()
+        assert 'Записей: 5' in content and 'Подписчиков: 3' in content, \
+            'Проверьте, что страница профиля выводит сохранённые счётчики'
@@ -0,0 +1,91 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Post
+from posts.pagination import CursorPaginator, CursorPage, encode_cursor
+
+
+@pytest.fixture
+def many_posts(user):
+    return [
+        Post.objects.create(text=f'Пост {i}', author=user)
+        for i in range(25)
+    ]
+
+
+class TestCursorPaginator:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_walk_forward_and_back(self, many_posts):
+        queryset = Post.objects.order_by('-pub_date', '-id')
+        expected = list(queryset.values_list('id', flat=True))
+        paginator = CursorPaginator(queryset, 10)
+
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+
+        assert [len(page) for page in pages] == [10, 10, 5], \
+            'Проверьте, что курсор листает ленту страницами по 10 записей'
+        assert [post.id for page in pages for post in page] == expected, \
+            'Проверьте, что при листании по курсору записи не теряются и не повторяются'
+        assert not pages[0].has_previous()
+
+        back = paginator.get_page(pages[2].previous_cursor)
+        assert [post.id for post in back] == [post.id for post in pages[1]], \
+            'Проверьте, что ссылка «Предыдущая» возвращает предыдущую страницу'
+        first = paginator.get_page(pages[1].previous_cursor)
+        assert [post.id for post in first] == expected[:10]
+        assert not first.has_previous()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_broken_cursor_is_first_page(self, many_posts):
+        queryset = Post.objects.order_by('-pub_date', '-id')
+        page = CursorPaginator(queryset, 10).get_page('не-курсор')
+        assert [post.id for post in page] == list(queryset.values_list('id', flat=True)[:10])
+
+    @pytest.mark.django_db(transaction=True)
+    def test_empty_previous_page_is_first_page(self, client, many_posts):
+        cursor = encode_cursor({'d': 'p', 'v': ['2100-01-01T00:00:00+00:00', 1]})
+        response = client.get(f'/?cursor={cursor}')
+        assert response.status_code == 200, \
+            'Проверьте, что курсор «Предыдущая» без записей перед ним не ломает страницу'
+        page = response.context['page']
+        assert [post.id for post in page] == \
+            list(Post.objects.order_by('-pub_date', '-id').values_list('id', flat=True)[:10])
+        assert page.has_next() and not page.has_previous()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_cursor_view(self, client, many_posts):
+        response = client.get('/')
+        next_cursor = response.context['page'].next_cursor
+        assert next_cursor and f'?cursor={next_cursor}' in response.content.decode(), \
+            'Проверьте, что на главной странице есть ссылка на следующую страницу по курсору'
+
+        response = client.get(f'/?cursor={next_cursor}')
+        assert response.status_code == 200
+        assert type(response.context['page']) == CursorPage
+        assert len(response.context['page']) == 10
+
+    @pytest.mark.django_db(transaction=True)
+    def test_first_page_without_count(self, client, many_posts):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/')
+        assert type(response.context['page']) == CursorPage
+        sql = ' '.join(query['sql'] for query in context.captured_queries).upper()
+        assert 'COUNT(' not in sql and 'OFFSET' not in sql, \
+            'Проверьте, что первая страница ленты читается без COUNT(*) и OFFSET'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_legacy_page_number(self, client, many_posts):
+        expected = list(Post.objects.order_by('-pub_date', '-id').values_list('id', flat=True))
+        response = client.get('/?page=2')
+        assert [post.id for post in response.context['page']] == expected[10:20], \
+            'Проверьте, что старая ссылка ?page=N ведёт на ту же страницу'
+        assert response.context['page'].has_previous()
+
+        for number in (999999, 'abc', 0):
+            response = client.get(f'/?page={number}')
+            assert [post.id for post in response.context['page']] == expected[:10], \
+                'Проверьте, что дальние и битые номера страниц ведут на первую страницу'
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.utils import timezone
+
+from posts import notifications
+from posts.models import DigestRun, Follow, Post
+
+
+@pytest.fixture
+def digest(settings, django_user_model):
+    settings.JOBS_EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    settings.NOTIFY_DIGEST_MAX_POSTS = 2
+    settings.NOTIFY_DIGEST_BATCH = 1
+    make = django_user_model.objects.create_user
+    authors = [make(username='writer'), make(username='poet')]
+    readers = [
+        make(username='both', email='both@example.com'),
+        make(username='poetry', email='poetry@example.com'),
+        make(username='silent'),
+    ]
+    for reader, author in [
+        (readers[0], authors[0]), (readers[0], authors[1]),
+        (readers[1], authors[1]), (readers[2], authors[0]),
+    ]:
+        Follow.objects.create(user=reader, author=author)
+    hour_ago = timezone.now() - timedelta(hours=1)
+    for number in range(3):
+        Post.objects.create(text=f'Рассказ {number}', author=authors[0])
+    Post.objects.create(text='Стихи', author=authors[1])
+    Post.objects.create(text='Старый пост', author=authors[1])
+    Post.objects.update(pub_date=hour_ago)
+    Post.objects.filter(text='Старый пост').update(pub_date=hour_ago - timedelta(days=2))
+    return readers
+
+
+def send_digests():
+    output = StringIO()
+    call_command('send_digests', stdout=output)
+    return output.getvalue()
+
+
+class TestDigests:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_digest_per_recipient(self, digest):
+        send_digests()
+        messages = {message.to[0]: message for message in mail.outbox}
+        assert set(messages) == {'both@example.com', 'poetry@example.com'}, \
+            'Проверьте, что каждый подписчик с почтой получает одно письмо'
+
+        body = messages['both@example.com'].body
+        assert 'Рассказ 2' in body and 'Рассказ 1' in body and 'Рассказ 0' not in body
+        assert '…и ещё 1' in body and 'Стихи' in body
+        assert '/writer/' in body
+        assert messages['both@example.com'].subject.endswith(': 4')
+
+        body = messages['poetry@example.com'].body
+        assert 'Стихи' in body and 'Рассказ' not in body
+        assert 'Старый пост' not in body, \
+            'Проверьте, что в дайджест попадают только посты за период'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_schedule(self, digest, settings):
+        send_digests()
+        sent = len(mail.outbox)
+        assert 'ещё не нужна' in send_digests(), \
+            'Проверьте, что рассылка не повторяется раньше NOTIFY_DIGEST_INTERVAL'
+        assert len(mail.outbox) == sent
+
+        run = DigestRun.objects.get()
+        assert run.finished is not None and run.recipients == 2
+        settings.NOTIFY_DIGEST_INTERVAL = 60
+        DigestRun.objects.update(until=run.until - timedelta(minutes=5))
+        send_digests()
+        assert DigestRun.objects.count() == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_resume(self, digest):
+        now = timezone.now()
+        run = DigestRun.objects.create(
+            since=now - timedelta(days=1), until=now, last_user_id=digest[0].pk)
+        send_digests()
+        assert [message.to for message in mail.outbox] == [['poetry@example.com']], \
+            'Проверьте, что прерванная рассылка продолжается с последнего получателя'
+        run.refresh_from_db()
+        assert run.finished is not None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_one_connection(self, digest, monkeypatch):
+        opened = []
+        backend = mail.get_connection
+        monkeypatch.setattr(
+            notifications, 'get_connection',
+            lambda *args, **kwargs: opened.append(args) or backend(*args, **kwargs))
+        send_digests()
+        assert len(opened) == 1 and len(mail.outbox) == 2
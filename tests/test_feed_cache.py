@@ -0,0 +1,190 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from posts import caching
+from posts.models import Comment, Follow, Group, Post
+
+
+class TestFeedCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_post_invalidates_cached_pages(self, client, user):
+        group = Group.objects.create(title='Группа', slug='cached', description='Описание')
+        Post.objects.create(text='Первый пост', author=user, group=group)
+        urls = ['/', '/group/cached/', f'/{user.username}/']
+        for url in urls:
+            client.get(url)
+
+        Post.objects.create(text='Второй пост', author=user, group=group)
+        for url in urls:
+            assert 'Второй пост' in client.get(url).content.decode(), \
+                f'Проверьте, что кэш страницы `{url}` сбрасывается после публикации поста'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_edit_and_comment_invalidate(self, client, user):
+        old_group = Group.objects.create(title='Старая', slug='old', description='Описание')
+        new_group = Group.objects.create(title='Новая', slug='new', description='Описание')
+        post = Post.objects.create(text='Пост', author=user, group=old_group)
+        client.get('/group/old/')
+        versions = {feed: caching.feed_version(feed) for feed in ('index', 'group:old', 'group:new')}
+
+        post.group = new_group
+        post.save()
+        for feed, version in versions.items():
+            assert caching.feed_version(feed) != version, \
+                'Проверьте, что при смене группы сбрасываются ленты обеих групп'
+        assert 'Пост' not in client.get('/group/old/').content.decode()
+
+        client.get('/')
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+        assert 'Комментариев 1' in client.get('/').content.decode(), \
+            'Проверьте, что новый комментарий сбрасывает кэш ленты'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_hit_miss_counters(self, user_client, post):
+        anonymous = Client()
+        anonymous.get('/')
+        anonymous.get('/')
+        user_client.get('/')
+        user_client.get('/')
+        stats = caching.stats()
+        assert stats['page'] == {'hit': 1, 'miss': 1}, \
+            'Проверьте счётчики попаданий в кэш страниц'
+        # пользователь получает скелет, собранный для анонимного посетителя
+        assert stats['skeleton'] == {'hit': 2, 'miss': 1}, \
+            'Проверьте счётчики попаданий в кэш скелетов страниц'
+        assert stats['fragment'] == {'hit': 0, 'miss': 1}, \
+            'Проверьте счётчики попаданий в кэш фрагментов'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_skeleton_holes_are_personal(self, user, user_client, post):
+        other = get_user_model().objects.create_user(username='other', password='1234567')
+        other_client = Client()
+        other_client.force_login(other)
+        edit_url = f'/{user.username}/{post.id}/edit/'
+
+        anonymous = Client().get('/').content.decode()
+        own = user_client.get('/').content.decode()
+        foreign = other_client.get('/').content.decode()
+        assert '<!--hole:' not in anonymous + own + foreign, \
+            'Проверьте, что метки дыр не попадают в ответ'
+        assert 'Войти' in anonymous and edit_url not in anonymous, \
+            'Проверьте, что анонимный посетитель видит страницу без личных ссылок'
+        assert f'Пользователь: {user.username}.' in own and edit_url in own, \
+            'Проверьте, что автор видит своё меню и ссылку на редактирование'
+        assert 'Пользователь: other.' in foreign and edit_url not in foreign, \
+            'Проверьте, что чужой пост нельзя редактировать по ссылке из ленты'
+        assert 'Избранные авторы' in foreign and 'Избранные авторы' not in anonymous, \
+            'Проверьте, что меню лент видно только вошедшим пользователям'
+        assert caching.stats()['skeleton'] == {'hit': 2, 'miss': 1}, \
+            'Проверьте, что скелет страницы общий для всех пользователей'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_button_is_not_cached(self, user, user_client):
+        author = get_user_model().objects.create_user(username='author', password='1234567')
+        Post.objects.create(text='Пост автора', author=author)
+        url = f'/{author.username}/'
+        Client().get(url)
+        assert 'Подписаться' in user_client.get(url).content.decode()
+        user_client.get(f'/{author.username}/follow/')
+        content = user_client.get(url).content.decode()
+        assert 'Отписаться' in content and 'Подписчиков: 1' in content, \
+            'Проверьте, что кнопка подписки и счётчики обновляются сразу после подписки'
+        assert 'Подписаться' not in user_client.get(f'/{user.username}/').content.decode(), \
+            'Проверьте, что на своей странице нет кнопки подписки'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_vary_and_cache_control(self, user_client, post):
+        anonymous = Client()
+        for response in (anonymous.get('/'), anonymous.get('/')):
+            assert 'Cookie' in response['Vary']
+            assert 'private' not in response.get('Cache-Control', '')
+        for response in (user_client.get('/'), user_client.get('/')):
+            assert 'Cookie' in response['Vary'], \
+                'Проверьте, что страницы ленты зависят от Cookie'
+            assert 'private' in response['Cache-Control'], \
+                'Проверьте, что страница с личными частями не кэшируется общими кэшами'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fragment_of_skeleton_is_separate(self, user_client, post):
+        # POST не кэшируется и рендерит ленту с дырами на месте
+        Client().post('/')
+        edit_url = f'/{post.author.username}/{post.id}/edit/'
+        assert edit_url in user_client.get('/').content.decode(), \
+            'Проверьте, что фрагменты скелета не смешиваются с обычными'
+
+
+class TestPostItemCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_cards_are_shared_between_feeds(self, user_client, user):
+        group = Group.objects.create(title='Группа', slug='cards', description='Описание')
+        for i in range(3):
+            Post.objects.create(text=f'Пост {i}', author=user, group=group)
+        user_client.get('/')
+        assert caching.stats()['post'] == {'hit': 0, 'miss': 3}
+        user_client.get('/group/cards/')
+        user_client.get(f'/{user.username}/')
+        assert caching.stats()['post'] == {'hit': 6, 'miss': 3}, \
+            'Проверьте, что карточка поста рендерится один раз для всех лент'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_edit_link_is_personal(self, user, user_client, post):
+        other = get_user_model().objects.create_user(username='other', password='1234567')
+        Follow.objects.create(user=user, author=other)
+        Post.objects.create(text='Чужой пост', author=other)
+        Follow.objects.create(user=other, author=user)
+        other_client = Client()
+        other_client.force_login(other)
+        edit_url = f'/{user.username}/{post.id}/edit/'
+
+        foreign = other_client.get('/follow/').content.decode()
+        own = user_client.get(f'/{user.username}/').content.decode()
+        assert edit_url not in foreign and '<!--hole:' not in foreign, \
+            'Проверьте, что ссылка на редактирование в карточке видна только автору'
+        assert edit_url in own, \
+            'Проверьте, что автор видит ссылку на редактирование своего поста'
+        assert caching.stats()['post']['hit'] == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_edit_invalidates_card(self, user, user_client, post):
+        other = get_user_model().objects.create_user(username='other', password='1234567')
+        Follow.objects.create(user=other, author=user)
+        other_client = Client()
+        other_client.force_login(other)
+        other_client.get('/follow/')
+
+        user_client.post(f'/{user.username}/{post.id}/edit/', {'text': 'Новый текст'})
+        post.refresh_from_db()
+        assert post.version == 1, 'Проверьте, что редактирование меняет версию поста'
+        assert 'Новый текст' in other_client.get('/follow/').content.decode(), \
+            'Проверьте, что карточка поста сбрасывается после редактирования'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rename_invalidates_cards(self, user, post_with_group):
+        group = post_with_group.group
+        anonymous = Client()
+        for url in ('/', f'/group/{group.slug}/', f'/{user.username}/'):
+            anonymous.get(url)
+
+        group.title = 'Новое название'
+        group.save()
+        for url in ('/', f'/group/{group.slug}/', f'/{user.username}/'):
+            assert '#Новое название' in anonymous.get(url).content.decode(), \
+                f'Проверьте, что переименование группы сбрасывает кэш `{url}`'
+
+        user.username = 'renamed'
+        user.save()
+        for url in ('/', f'/group/{group.slug}/', '/renamed/'):
+            assert '@renamed' in anonymous.get(url).content.decode(), \
+                f'Проверьте, что переименование автора сбрасывает кэш `{url}`'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_login_does_not_look_up_names(self, user):
+        with CaptureQueriesContext(connection) as queries:
+            user.save(update_fields=['last_login'])
+        assert len(queries) == 1, \
+            'Проверьте, что сохранение без имён не читает прежние имена пользователя'
@@ -0,0 +1,46 @@
+import pytest
+
+from posts.models import Follow, Group, Post
+
+
+@pytest.fixture
+def feed(user, django_user_model):
+    # 12 постов разных авторов, половина в группе: больше одной страницы
+    group = Group.objects.create(title='Группа ленты', slug='feed', description='Описание')
+    authors = []
+    for i in range(12):
+        author = django_user_model.objects.create_user(username=f'feed_author_{i}')
+        Post.objects.create(text=f'Пост {i}', author=author, group=group if i % 2 else None)
+        Follow.objects.create(user=user, author=author)
+        authors.append(author)
+    return authors
+
+
+class TestFeedQueries:
+
+    @pytest.mark.parametrize('url, queries', [
+        # только страница постов: без COUNT и OFFSET
+        ('/', 1),
+        # + группа
+        ('/group/feed/', 2),
+        # автор вместе с профилем и счётчиками + страница постов, без COUNT
+        ('/feed_author_1/', 2),
+    ])
+    @pytest.mark.django_db(transaction=True)
+    def test_anonymous_feed_queries(self, client, feed, django_assert_num_queries, url, queries):
+        with django_assert_num_queries(queries):
+            response = client.get(url)
+        assert response.status_code == 200
+        # повторный показ берётся из кэша страниц целиком
+        with django_assert_num_queries(0):
+            client.get(url)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed_queries(self, user_client, feed, django_assert_num_queries):
+        user_client.get('/follow/')
+        # сессия + пользователь + подписки на «знаменитостей» + COUNT + страница постов
+        with django_assert_num_queries(5):
+            response = user_client.get('/follow/')
+        assert len(response.context['page']) == 10
+        for post in response.context['page']:
+            assert post.comment_count == 0
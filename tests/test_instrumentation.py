@@ -0,0 +1,76 @@
+import pytest
+from django.test import Client
+
+from yatube import instrumentation
+
+
+@pytest.fixture
+def sampled(settings):
+    settings.PERF_SAMPLE_RATE = 1
+    instrumentation.buffer().clear()
+    yield
+    instrumentation.buffer().clear()
+
+
+class TestInstrumentation:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_samples(self, sampled, post):
+        client = Client()
+        client.get('/')
+
+        sample = instrumentation.buffer()[-1]
+        assert sample.view == 'index' and sample.status == 200
+        assert sample.queries > 0 and sample.template_time > 0
+        assert sample.cache_misses > 0
+
+        client.get('/')
+        assert instrumentation.buffer()[-1].cache_hits > 0, \
+            'Проверьте, что замер учитывает попадания в кэш'
+        assert instrumentation.buffer()[-1].template_time == 0
+
+        row = {row['view']: row for row in instrumentation.summary()}['index']
+        assert row['count'] == 2 and row['queries'] > 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_timing_header_for_staff_only(self, sampled, user_client, post, django_user_model):
+        assert not Client().get('/').has_header('Server-Timing'), \
+            'Проверьте, что посетители не видят внутренние замеры в Server-Timing'
+        assert not user_client.get('/').has_header('Server-Timing')
+        assert len(instrumentation.buffer()) == 2, \
+            'Проверьте, что запросы без заголовка всё равно замеряются'
+
+        staff = django_user_model.objects.create_user(username='staff', is_staff=True)
+        client = Client()
+        client.force_login(staff)
+        timing = client.get('/').get('Server-Timing', '')
+        assert 'db;dur=' in timing and 'tpl;dur=' in timing and 'total;dur=' in timing, \
+            'Проверьте, что персонал получает заголовок Server-Timing'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_not_sampled(self, settings, post):
+        settings.PERF_SAMPLE_RATE = 0
+        instrumentation.buffer().clear()
+        response = Client().get('/')
+        assert not response.has_header('Server-Timing')
+        assert not instrumentation.buffer()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_admin_page(self, sampled, user, user_client, django_user_model):
+        Client().get('/')
+        assert user_client.get('/admin/performance/').status_code == 302, \
+            'Проверьте, что страница замеров доступна только персоналу'
+
+        admin = django_user_model.objects.create_superuser(
+            username='admin', email='admin@example.com', password='1234567')
+        client = Client()
+        client.force_login(admin)
+        response = client.get('/admin/performance/')
+        assert response.status_code == 200
+        assert 'index' in response.content.decode()
+
+    def test_buffer_size(self, settings):
+        settings.PERF_BUFFER_SIZE = 3
+        for _ in range(5):
+            instrumentation.buffer().append(instrumentation.Sample())
+        assert len(instrumentation.buffer()) == 3
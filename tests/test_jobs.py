@@ -0,0 +1,160 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.test import Client
+from django.utils import timezone
+
+from posts import jobs
+from posts.models import Follow, Job, Post, SearchDocument, TimelineEntry
+
+
+calls = []
+
+
+@jobs.task
+def record(value):
+    calls.append(value)
+
+
+@jobs.task
+def fail(value):
+    raise RuntimeError(value)
+
+
+@pytest.fixture
+def queue(settings):
+    settings.JOBS_EAGER = False
+    calls.clear()
+
+
+def run_workers():
+    call_command('run_workers', workers=0, once=True, stdout=StringIO(), stderr=StringIO())
+
+
+class TestJobQueue:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_enqueue_and_run(self, queue):
+        job = jobs.enqueue(record, value='первая')
+        assert job.task == 'tests.test_jobs.record' and job.status == Job.PENDING
+        run_workers()
+        job.refresh_from_db()
+        assert calls == ['первая'] and job.status == Job.DONE and job.attempts == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_idempotency_key(self, queue):
+        first = jobs.enqueue(record, key='k', value=1)
+        assert jobs.enqueue(record, key='k', value=2).pk == first.pk, \
+            'Проверьте, что задача с тем же ключом не ставится дважды, пока ждёт'
+        assert jobs.claim(10) == [first]
+        second = jobs.enqueue(record, key='k', value=3)
+        assert second.pk != first.pk, \
+            'Проверьте, что после запуска задачи ключ освобождается'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_priority_and_delay(self, queue):
+        low = jobs.enqueue(record, priority=jobs.LOW, value='low')
+        jobs.enqueue(record, delay=60, value='later')
+        high = jobs.enqueue(record, priority=jobs.HIGH, value='high')
+        normal = jobs.enqueue(record, value='normal')
+        assert jobs.claim(10) == [high, normal, low], \
+            'Проверьте порядок по приоритету и отложенный запуск'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_retry_with_backoff(self, queue, settings):
+        settings.JOBS_RETRY_DELAY = 10
+        job = jobs.enqueue(fail, max_attempts=2, value='ошибка')
+        run_workers()
+        job.refresh_from_db()
+        assert job.status == Job.PENDING and job.attempts == 1
+        assert 'ошибка' in job.error
+        delay = job.run_at - timezone.now()
+        assert timedelta(seconds=7) < delay <= timedelta(seconds=12), \
+            'Проверьте паузу перед повтором'
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        run_workers()
+        job.refresh_from_db()
+        assert job.status == Job.FAILED and job.attempts == 2
+
+        assert jobs.retry(Job.objects.filter(pk=job.pk)) == 1
+        job.refresh_from_db()
+        assert job.status == Job.PENDING and job.attempts == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rollback_drops_job(self, queue):
+        from django.db import transaction
+        with pytest.raises(ValueError):
+            with transaction.atomic():
+                jobs.enqueue(record, value=1)
+                raise ValueError
+        assert not Job.objects.exists()
+
+
+class TestDeferredSideEffects:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_post(self, queue, user, user_client, django_user_model):
+        follower = django_user_model.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=user)
+        response = user_client.post('/new/', {'text': 'Отложенный пост'})
+        assert response.status_code == 302
+        post = Post.objects.get(text='Отложенный пост')
+        assert not TimelineEntry.objects.filter(post=post).exists(), \
+            'Проверьте, что раскладка по лентам не выполняется в запросе'
+        assert set(Job.objects.values_list('task', flat=True)) == {
+            'posts.timeline.fan_out_post', 'posts.search.index_post'}
+
+        run_workers()
+        assert TimelineEntry.objects.filter(user=follower, post=post).exists()
+        assert SearchDocument.objects.filter(post=post).exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_failed_enqueue_rolls_back_post(self, queue, user, user_client, monkeypatch):
+        def broken(*args, **kwargs):
+            raise RuntimeError('очередь недоступна')
+        monkeypatch.setattr('posts.jobs.enqueue', broken)
+        with pytest.raises(RuntimeError):
+            user_client.post('/new/', {'text': 'Пост без задач'})
+        assert not Post.objects.filter(text='Пост без задач').exists(), \
+            'Проверьте, что пост и задачи очереди записываются в одной транзакции'
+        user.profile.refresh_from_db()
+        assert user.profile.post_count == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comments_share_index_job(self, queue, post, user_client, user):
+        run_workers()
+        url = f'/{user.username}/{post.id}/comment/'
+        user_client.post(url, {'text': 'Первый'})
+        user_client.post(url, {'text': 'Второй'})
+        assert Job.objects.filter(status=Job.PENDING).count() == 1
+        run_workers()
+        assert SearchDocument.objects.get(post=post).comments == 'Первый\nВторой'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_queued_email(self, queue, settings):
+        settings.EMAIL_BACKEND = 'yatube.mail.QueuedEmailBackend'
+        settings.JOBS_EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+        mail.send_mail('Тема', 'Текст', 'from@example.com', ['to@example.com'],
+                       html_message='<b>Текст</b>')
+        assert mail.outbox == []
+        run_workers()
+        assert len(mail.outbox) == 1
+        message = mail.outbox[0]
+        assert message.subject == 'Тема' and message.to == ['to@example.com']
+        assert message.alternatives == [('<b>Текст</b>', 'text/html')]
+
+    @pytest.mark.django_db(transaction=True)
+    def test_admin(self, queue, django_user_model):
+        jobs.enqueue(record, value=1)
+        admin = django_user_model.objects.create_superuser(
+            username='admin', email='admin@example.com', password='1234567')
+        client = Client()
+        client.force_login(admin)
+        response = client.get('/admin/posts/job/')
+        assert response.status_code == 200
+        assert 'В очереди: <b>1</b>' in response.content.decode(), \
+            'Проверьте сводку по статусам на странице очереди'
@@ -0,0 +1,127 @@
+"""
+Регрессия планов запросов: каждый запрос лент прогоняется через
+EXPLAIN QUERY PLAN. Тест падает, если SQLite читает таблицу целиком
+(SCAN без индекса) или сортирует результат во временном B-дереве.
+"""
+import re
+from contextlib import contextmanager
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+
+from posts.models import Comment, Follow, Group, Post
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$')
+TEMP_BTREE = 'USE TEMP B-TREE'
+
+
+@contextmanager
+def capture_selects():
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield queries
+
+
+def plan(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def problems(queries):
+    found = []
+    for sql, params in queries:
+        for line in plan(sql, params):
+            if TEMP_BTREE in line or FULL_SCAN.match(line.strip()):
+                found.append(f'{line}\n    {sql}')
+    return found
+
+
+@pytest.fixture
+def feed_data(user):
+    author = get_user_model().objects.create_user(username='plan_author')
+    group = Group.objects.create(title='Планы', slug='plans', description='-')
+    posts = [
+        Post.objects.create(text=f'Пост {number}', author=author, group=group if number % 2 else None)
+        for number in range(25)
+    ]
+    Comment.objects.create(post=posts[0], author=user, text='Комментарий')
+    Follow.objects.create(user=user, author=author)
+    return author, group, posts
+
+
+FEED_URLS = [
+    '/',
+    '/group/plans/',
+    '/plan_author/',
+]
+
+
+class TestQueryPlans:
+
+    def requests(self, client, urls):
+        with capture_selects() as queries:
+            for url in urls:
+                response = client.get(url)
+                assert response.status_code == 200, url
+                # вторая страница по курсору и возврат с неё назад
+                page = response.context['page']
+                assert page.has_next(), url
+                response = client.get(url, {'cursor': page.next_cursor})
+                assert response.status_code == 200
+                previous = response.context['page'].previous_cursor
+                assert client.get(url, {'cursor': previous}).status_code == 200
+        return queries
+
+    @pytest.mark.django_db(transaction=True)
+    def test_anonymous_feeds(self, feed_data):
+        queries = self.requests(Client(), FEED_URLS)
+        assert queries
+        assert not problems(queries), \
+            'Запросы лент без индекса:\n' + '\n'.join(problems(queries))
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed(self, feed_data, user_client):
+        queries = self.requests(user_client, ['/follow/'])
+        assert not problems(queries), \
+            'Запросы ленты подписок без индекса:\n' + '\n'.join(problems(queries))
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed_with_celebrity(self, feed_data, user_client, settings):
+        settings.TIMELINE_FANOUT_LIMIT = 0
+        author, _, _ = feed_data
+        Post.objects.create(text='Пост знаменитости', author=author)
+        queries = self.requests(user_client, ['/follow/'])
+        assert not problems(queries), \
+            'Запросы ленты подписок без индекса:\n' + '\n'.join(problems(queries))
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_page(self, feed_data, user_client):
+        author, _, posts = feed_data
+        with capture_selects() as queries:
+            assert user_client.get(f'/{author.username}/{posts[0].id}/').status_code == 200
+        assert not problems(queries), \
+            'Запросы страницы поста без индекса:\n' + '\n'.join(problems(queries))
+
+    @pytest.mark.django_db(transaction=True)
+    def test_comment_pages(self, feed_data, user, settings):
+        settings.COMMENTS_FIRST_PAGE = 2
+        settings.COMMENTS_PAGE_SIZE = 2
+        author, _, posts = feed_data
+        for number in range(5):
+            Comment.objects.create(post=posts[0], author=user, text=f'Ещё {number}')
+        client = Client()
+        url = f'/{author.username}/{posts[0].id}/'
+        with capture_selects() as queries:
+            cursor = client.get(url).context['items'].next_cursor
+            assert client.get(url + 'comments/', {'cursor': cursor}).status_code == 200
+        assert not problems(queries), \
+            'Запросы страниц комментариев без индекса:\n' + '\n'.join(problems(queries))
@@ -0,0 +1,78 @@
+import io
+import json
+import logging
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from posts.models import Comment
+from yatube.querylog import QueryLog
+
+
+def run(log, func):
+    with connection.execute_wrapper(log):
+        func()
+    return {kind: (count, location) for kind, _, count, _, location in log.findings()}
+
+
+class TestQueryLog:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_duplicates(self, user, django_user_model, settings):
+        settings.QUERY_LOG_SIMILAR = 3
+        users = [user] + [
+            django_user_model.objects.create_user(username=f'user{i}') for i in range(3)
+        ]
+
+        findings = run(QueryLog(), lambda: [
+            django_user_model.objects.get(pk=user.pk) for _ in range(2)])
+        assert findings['duplicate'][0] == 2, \
+            'Проверьте, что повтор одного и того же запроса попадает в журнал'
+        assert findings['duplicate'][1][0].startswith('tests/test_querylog.py:'), \
+            'Проверьте, что для находки указывается строка кода проекта'
+        assert 'similar' not in findings
+
+        findings = run(QueryLog(), lambda: [
+            django_user_model.objects.get(pk=other.pk) for other in users])
+        assert findings == {'similar': (4, findings['similar'][1])}, \
+            'Проверьте, что один запрос с разными параметрами в цикле отмечается как similar'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_slow(self, user, settings):
+        settings.QUERY_LOG_SLOW_MS = 0
+        findings = run(QueryLog(), lambda: list(Comment.objects.all()))
+        assert 'slow' in findings
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_view_has_no_repeats(self, client, user, post, django_user_model, caplog):
+        for i in range(6):
+            author = django_user_model.objects.create_user(username=f'reader{i}')
+            Comment.objects.create(post=post, author=author, text=f'Комментарий {i}')
+        with caplog.at_level(logging.WARNING, logger='yatube.querylog'):
+            response = client.get(f'/{user.username}/{post.id}/')
+        assert response.status_code == 200
+        found = [record.querylog for record in caplog.records
+                 if record.name == 'yatube.querylog']
+        assert not found, \
+            'Проверьте, что страница поста не выполняет повторяющихся запросов: %s' % found
+
+    def test_report(self, tmp_path):
+        path = tmp_path / 'querylog.jsonl'
+        entry = {
+            'kind': 'similar', 'view': 'post', 'sql': 'SELECT 1', 'count': 10,
+            'ms': 5.0, 'code': 'posts/views.py:90', 'template': 'comments.html:29',
+        }
+        path.write_text('\n'.join(json.dumps(entry) for _ in range(3)) + '\n')
+        out = io.StringIO()
+        call_command('query_report', '--log', str(path), stdout=out)
+        report = out.getvalue()
+        assert 'similar   post  запросов: 3, SQL: 30, 15.0 мс' in report, \
+            'Проверьте, что query_report сводит находки по view и месту'
+        assert 'comments.html:29' in report
+
+    def test_tests_do_not_write_project_log(self, settings):
+        handlers = logging.getLogger('yatube.querylog').handlers
+        assert [handler.baseFilename for handler in handlers] == [settings.QUERY_LOG_FILE]
+        assert not settings.QUERY_LOG_FILE.startswith(str(settings.BASE_DIR) + '/'), \
+            'Проверьте, что во время тестов журнал запросов пишется во временный каталог'
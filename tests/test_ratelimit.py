@@ -0,0 +1,121 @@
+import statistics
+import time
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.test import Client, RequestFactory
+
+from posts.models import Follow, Post
+from yatube import ratelimit
+
+
+@pytest.fixture
+def limits(settings):
+    settings.RATELIMIT_ENABLED = True
+    settings.RATE_LIMITS = {
+        'post': {'user': ('2/m', 2), 'ip': ('100/m', 100)},
+        'comment': {'user': ('100/m', 100), 'ip': ('3/m', 3)},
+        'follow': {'user': ('1/m', 1)},
+    }
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(ratelimit.time, 'time', lambda: now[0])
+    return now
+
+
+class TestRateLimit:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_user_bucket(self, limits, clock, user_client, django_user_model):
+        for number in range(2):
+            assert user_client.post('/new/', {'text': f'Пост {number}'}).status_code == 302
+        response = user_client.post('/new/', {'text': 'Лишний пост'})
+        assert response.status_code == 429, \
+            'Проверьте, что после исчерпания запаса запрос получает 429'
+        assert response['Retry-After'] == '30'
+        assert Post.objects.count() == 2
+        assert user_client.get('/new/').status_code == 200, \
+            'Проверьте, что форма (GET) не ограничивается'
+
+        other = Client()
+        other.force_login(django_user_model.objects.create_user(username='other'))
+        assert other.post('/new/', {'text': 'Чужой пост'}).status_code == 302, \
+            'Проверьте, что корзины у пользователей разные'
+
+        clock[0] += 30
+        assert user_client.post('/new/', {'text': 'Через полминуты'}).status_code == 302
+        assert user_client.post('/new/', {'text': 'Снова рано'}).status_code == 429
+
+    @pytest.mark.django_db(transaction=True)
+    def test_ip_bucket(self, limits, clock, post, user, django_user_model):
+        url = f'/{user.username}/{post.id}/comment/'
+        statuses = []
+        for number in range(4):
+            client = Client()
+            client.force_login(
+                django_user_model.objects.create_user(username=f'reader{number}'))
+            statuses.append(client.post(url, {'text': 'Комментарий'}).status_code)
+        assert statuses == [302, 302, 302, 429], \
+            'Проверьте ограничение по IP-адресу для разных пользователей'
+
+    def test_client_ip_behind_proxies(self, settings):
+        request = RequestFactory().post(
+            '/new/', REMOTE_ADDR='10.0.0.2',
+            HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7, 10.0.0.1')
+        assert ratelimit.client_ip(request) == '10.0.0.2', \
+            'Проверьте, что без доверенных прокси X-Forwarded-For не читается'
+        settings.RATELIMIT_PROXY_COUNT = 2
+        assert ratelimit.client_ip(request) == '203.0.113.7', \
+            'Проверьте, что адрес клиента берётся из X-Forwarded-For за доверенными прокси'
+        settings.RATELIMIT_PROXY_COUNT = 4
+        assert ratelimit.client_ip(request) == '10.0.0.2'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_ip_bucket_behind_proxy(self, limits, clock, settings, post, user, django_user_model):
+        settings.RATELIMIT_PROXY_COUNT = 1
+        url = f'/{user.username}/{post.id}/comment/'
+        statuses = []
+        for number in range(4):
+            client = Client(HTTP_X_FORWARDED_FOR=f'203.0.113.{number}')
+            client.force_login(
+                django_user_model.objects.create_user(username=f'reader{number}'))
+            statuses.append(client.post(url, {'text': 'Комментарий'}).status_code)
+        assert statuses == [302] * 4, \
+            'Проверьте, что клиенты за прокси не делят одну корзину'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow(self, limits, clock, user_client, django_user_model):
+        authors = [
+            django_user_model.objects.create_user(username=f'author{number}')
+            for number in range(2)
+        ]
+        assert user_client.get(f'/{authors[0].username}/follow/').status_code == 302
+        assert user_client.get(f'/{authors[1].username}/follow/').status_code == 429
+        assert Follow.objects.count() == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rejected_request_keeps_tokens(self, limits, clock):
+        interval = ratelimit.parse_rate('1/s')
+        now = int(clock[0] * 1000)
+        assert ratelimit.acquire('bucket', interval, 2, now) == 0
+        assert ratelimit.acquire('bucket', interval, 2, now) == 0
+        for _ in range(5):
+            assert ratelimit.acquire('bucket', interval, 2, now) == 1000
+        assert ratelimit.acquire('bucket', interval, 2, now + 1000) == 0, \
+            'Проверьте, что отказ не расходует токены'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_overhead(self, limits, settings):
+        settings.RATE_LIMITS = {'post': {'user': ('1000/s', 1000), 'ip': ('1000/s', 1000)}}
+        request = RequestFactory().post('/new/')
+        request.user = AnonymousUser()
+        samples = []
+        for _ in range(500):
+            started = time.perf_counter()
+            ratelimit.check('post', request)
+            samples.append(time.perf_counter() - started)
+        assert statistics.median(samples) < 0.0002, \
+            'Проверьте, что проверка лимита занимает меньше 0,2 мс'
@@ -0,0 +1,132 @@
+import json
+import time
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, RequestFactory
+
+from posts import async_views, caching
+from posts.models import Comment, Follow, Post
+from yatube import db_router
+
+
+@pytest.fixture
+def replica(settings, tmp_path):
+    alias = 'replica1'
+    connections.databases[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(tmp_path / 'replica.sqlite3'),
+    }
+    settings.DATABASE_REPLICAS = [alias]
+    yield alias
+    connections[alias].close()
+    del connections.databases[alias]
+    if hasattr(connections._connections, alias):
+        delattr(connections._connections, alias)
+
+
+def api_texts(url):
+    response = Client().get(url)
+    return [row['text'] for row in json.loads(b''.join(response.streaming_content))['results']]
+
+
+class TestReplicaRouting:
+
+    def test_router(self, settings):
+        settings.DATABASE_REPLICAS = ['replica1']
+        router = db_router.ReplicaRouter()
+        assert router.db_for_read(Post) is None, \
+            'Проверьте, что вне читающих view чтение идёт в primary'
+        assert router.db_for_write(Post) == 'default'
+        assert router.allow_migrate('replica1', 'posts') is False
+        assert router.allow_migrate('default', 'posts') is None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_feeds_read_replica(self, replica, post, user, settings):
+        settings.REPLICA_MAX_LAG = 1
+        db_router.replicate(replica)
+        late = Post.objects.create(text='Ещё не на реплике', author=user)
+
+        html = Client().get('/').content.decode()
+        assert post.text in html and late.text not in html, \
+            'Проверьте, что лента читается с реплики'
+        call_command('sync_replicas', stdout=StringIO())
+        time.sleep(1.1)
+        html = Client().get('/').content.decode()
+        assert late.text in html, \
+            'Проверьте, что страница, собранная с отстающей реплики, недолго живёт в кэше'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_read_your_writes(self, replica, post, user, user_client, settings):
+        db_router.replicate(replica)
+        url = f'/{user.username}/{post.id}/'
+        user_client.post(url + 'comment/', {'text': 'Мой свежий комментарий'})
+        assert Comment.objects.filter(text='Мой свежий комментарий').exists()
+
+        assert 'Мой свежий комментарий' in user_client.get(url).content.decode(), \
+            'Проверьте, что после записи сессия читает primary'
+        assert 'Мой свежий комментарий' not in Client().get(url).content.decode(), \
+            'Проверьте, что другие посетители читают реплику'
+
+        settings.REPLICA_PIN_SECONDS = 0
+        user_client.post(url + 'comment/', {'text': 'Ещё комментарий'})
+        assert 'Ещё комментарий' not in user_client.get(url).content.decode()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_feed_does_not_pin_session(self, replica, post, user, user_client, settings):
+        settings.TIMELINE_FANOUT_LIMIT = 0
+        author = get_user_model().objects.create_user(username='Celebrity')
+        Follow.objects.create(user=user, author=author)
+        Post.objects.create(text='Пост знаменитости', author=author)
+        db_router.replicate(replica)
+
+        # первый просмотр дописывает пост в ленту и закрепляет сессию
+        assert 'Пост знаменитости' in user_client.get('/follow/').content.decode()
+        session = user_client.session
+        del session[db_router.PIN_SESSION_KEY]
+        session.save()
+        user_client.get('/follow/')
+        assert db_router.PIN_SESSION_KEY not in user_client.session, \
+            'Проверьте, что просмотр ленты подписок без новых постов не закрепляет сессию за primary'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_api_reads_primary_after_change(self, replica, post, user, settings):
+        settings.REPLICA_MAX_LAG = 1
+        db_router.replicate(replica)
+        late = Post.objects.create(text='Ещё не на реплике', author=user)
+
+        for url in ('/api/posts/', f'/api/{user.username}/posts/'):
+            texts = api_texts(url)
+            assert late.text in texts, \
+                'Проверьте, что API не отдаёт ответ с отстающей реплики под новым ETag'
+        time.sleep(1.1)
+        texts = api_texts('/api/posts/')
+        assert late.text not in texts, \
+            'Проверьте, что позже API снова читает реплику'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_async_views_read_replica(self, replica, post, user):
+        db_router.replicate(replica)
+        late = Post.objects.create(text='Ещё не на реплике', author=user)
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        html = async_views.index(request).content.decode()
+        assert post.text in html and late.text not in html, \
+            'Проверьте, что асинхронные view тоже читают реплику'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_lagging_page_timeout(self, replica, settings):
+        settings.REPLICA_MAX_LAG = 3
+        caching.bump_feeds([caching.INDEX_FEED])
+        assert caching.feed_timeout(caching.INDEX_FEED) == caching.feed_timeout(), \
+            'Проверьте, что страницы с primary кэшируются на обычный срок'
+
+        @db_router.replica_reads
+        def view(request):
+            return caching.feed_timeout(caching.INDEX_FEED), caching.feed_timeout('other')
+
+        assert view(None) == (3, caching.feed_timeout())
@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from django.utils import timezone
+
+from posts import search
+from posts.models import Comment, Post, SearchPosting
+from users.forms import CreationForm
+
+
+@pytest.fixture(params=['fts5', 'python'])
+def backend(request, settings):
+    settings.SEARCH_BACKEND = request.param
+    return request.param
+
+
+def found(query, cursor=None):
+    page = search.SearchPaginator(query, per_page=10).get_page(cursor)
+    return [post.text for post in page]
+
+
+class TestSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_posts_and_comments_are_indexed_incrementally(self, backend, user):
+        post = Post.objects.create(text='Прогулка по набережной', author=user)
+        Post.objects.create(text='Другой пост', author=user)
+        assert found('НАБЕРЕЖНОЙ') == ['Прогулка по набережной'], \
+            'Проверьте, что поиск находит пост по слову из текста'
+
+        comment = Comment.objects.create(post=post, author=user, text='Отличная погода')
+        assert found('погода') == ['Прогулка по набережной'], \
+            'Проверьте, что поиск находит пост по тексту комментария'
+        comment.delete()
+        assert found('погода') == []
+
+        post.text = 'Прогулка по парку'
+        post.save()
+        assert found('набережной') == [] and found('парку') == ['Прогулка по парку'], \
+            'Проверьте, что индекс обновляется при редактировании поста'
+
+        post.delete()
+        assert found('парку') == []
+
+    @pytest.mark.django_db(transaction=True)
+    def test_all_terms_required_and_ranked_by_relevance(self, backend, user):
+        Post.objects.create(text='кот', author=user)
+        Post.objects.create(text='кот и ещё много разных слов про собаку', author=user)
+        Post.objects.create(text='кот кот собака', author=user)
+        assert found('кот собака') == ['кот кот собака'], \
+            'Проверьте, что в выдачу попадают посты со всеми словами запроса'
+        assert found('кот')[0] != 'кот и ещё много разных слов про собаку', \
+            'Проверьте, что посты ранжируются по BM25'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_newer_post_ranks_higher(self, backend, user):
+        old = Post.objects.create(text='новости города', author=user)
+        Post.objects.filter(pk=old.pk).update(pub_date=timezone.now() - timedelta(days=90))
+        Post.objects.create(text='новости района', author=user)
+        assert found('новости') == ['новости района', 'новости города'], \
+            'Проверьте, что при равной релевантности выше свежие посты'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_keyset_pagination(self, backend, user):
+        for number in range(25):
+            Post.objects.create(text=f'осень {number}', author=user)
+        paginator = search.SearchPaginator('осень', per_page=10)
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        third = paginator.get_page(second.next_cursor)
+        texts = [post.text for page in (first, second, third) for post in page]
+        assert len(texts) == 25 and len(set(texts)) == 25, \
+            'Проверьте, что страницы выдачи не повторяются и не теряют посты'
+        assert not third.has_next() and second.has_previous()
+        back = paginator.get_page(third.previous_cursor)
+        assert [post.pk for post in back] == [post.pk for post in second]
+
+        # «Предыдущая» от первой записи выдачи: перед ней ничего нет
+        empty = paginator.get_page(paginator.cursor_before(first[0]))
+        assert [post.pk for post in empty] == [post.pk for post in first], \
+            'Проверьте, что пустая предыдущая страница выдачи заменяется первой'
+        assert empty.next_cursor
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_command(self, backend, user):
+        Post.objects.create(text='снег', author=user)
+        call_command('rebuild_search_index')
+        assert found('снег') == ['снег']
+        assert SearchPosting.objects.exists() == (backend == 'python')
+
+
+class TestSearchView:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_search_page(self, user):
+        for number in range(12):
+            Post.objects.create(text=f'зима {number}', author=user)
+        response = Client().get('/search/', {'q': 'зима'})
+        assert response.status_code == 200, 'Проверьте, что страница /search/ доступна'
+        assert len(response.context['page']) == 10
+        content = response.content.decode()
+        assert '?q=%D0%B7%D0%B8%D0%BC%D0%B0&amp;cursor=' in content, \
+            'Проверьте, что ссылки паджинатора сохраняют запрос'
+
+        response = Client().get('/search/', {'q': 'зима', 'cursor': response.context['page'].next_cursor})
+        assert len(response.context['page']) == 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_empty_query(self, client):
+        response = client.get('/search/')
+        assert response.status_code == 200 and response.context['page'] is None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reserved_username(self):
+        form = CreationForm({'username': 'search', 'password1': 'Xq7!secret-pass', 'password2': 'Xq7!secret-pass'})
+        assert not form.is_valid() and 'username' in form.errors, \
+            'Проверьте, что нельзя зарегистрировать имя, занятое адресом search/'
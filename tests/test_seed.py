@@ -0,0 +1,36 @@
+import io
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count
+
+from posts.models import Comment, Follow, Post, TimelineEntry
+from users.models import Profile
+
+
+class TestSeed:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_seed(self):
+        call_command(
+            'seed_yatube', '--users', '50', '--posts', '500', '--groups', '3',
+            '--comments', '100', '--follows', '5', stdout=io.StringIO())
+
+        assert get_user_model().objects.count() == 50
+        assert Post.objects.count() == 500 and Comment.objects.count() == 100
+        counts = sorted(
+            Post.objects.values('author').annotate(total=Count('id'))
+            .values_list('total', flat=True), reverse=True)
+        assert counts[0] > 5 * counts[len(counts) // 2], \
+            'Проверьте, что число постов у авторов распределено со степенным перекосом'
+
+        dates = list(Post.objects.order_by('pk').values_list('pub_date', flat=True))
+        assert dates == sorted(dates) and len(set(dates)) == len(dates), \
+            'Проверьте, что seed_yatube сохраняет сгенерированные даты постов'
+        assert Profile.objects.get(user_id=Post.objects.first().author_id).post_count > 0, \
+            'Проверьте, что после генерации пересчитываются счётчики профилей'
+        assert TimelineEntry.objects.count() == Post.objects.filter(
+            author__following__isnull=False).count(), \
+            'Проверьте, что после генерации заполняются ленты подписок'
+        assert Follow.objects.exists()
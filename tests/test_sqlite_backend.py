@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from django.db import OperationalError, connections, transaction
+
+
+@pytest.fixture
+def database(tmp_path):
+    aliases = []
+
+    def make(**options):
+        alias = 'tuned%d' % len(aliases)
+        connections.databases[alias] = {
+            'ENGINE': 'yatube.sqlite_backend',
+            'NAME': str(tmp_path / 'tuned.sqlite3'),
+            'OPTIONS': options,
+        }
+        aliases.append(alias)
+        return connections[alias]
+
+    yield make
+    for alias in aliases:
+        if hasattr(connections._connections, alias):
+            connections[alias].close()
+            delattr(connections._connections, alias)
+        del connections.databases[alias]
+
+
+def hold_lock(path, seconds):
+    """Держит блокировку записи в отдельном потоке seconds секунд."""
+    locked = threading.Event()
+
+    def run():
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('INSERT INTO items VALUES (0)')
+        locked.set()
+        time.sleep(seconds)
+        conn.execute('COMMIT')
+        conn.close()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    locked.wait()
+    return thread
+
+
+class TestSQLiteBackend:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_pragmas(self, database):
+        connection = database(synchronous='FULL', busy_timeout=1234)
+        with connection.cursor() as cursor:
+            values = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size'):
+                cursor.execute('PRAGMA %s' % name)
+                values[name] = cursor.fetchone()[0]
+        assert values == {
+            'journal_mode': 'wal', 'synchronous': 2,
+            'busy_timeout': 1234, 'cache_size': -64000,
+        }, 'Проверьте, что бэкенд включает WAL и настраивает PRAGMA'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_retry_when_locked(self, database):
+        connection = database(busy_timeout=20, lock_retries=8, lock_backoff=0.02)
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE items (id integer)')
+        thread = hold_lock(connection.settings_dict['NAME'], 0.3)
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO items VALUES (%s)', [1])
+            cursor.execute('SELECT COUNT(*) FROM items')
+            assert cursor.fetchone()[0] == 2, \
+                'Проверьте, что запрос повторяется, пока база занята'
+        thread.join()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_no_retry(self, database):
+        connection = database(busy_timeout=20, lock_retries=0)
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE items (id integer)')
+        thread = hold_lock(connection.settings_dict['NAME'], 0.3)
+        with pytest.raises(OperationalError):
+            with connection.cursor() as cursor:
+                cursor.execute('INSERT INTO items VALUES (%s)', [1])
+        thread.join()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_atomic_begins_immediate(self, database):
+        connection = database()
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE items (id integer)')
+        other = sqlite3.connect(
+            connection.settings_dict['NAME'], timeout=0, isolation_level=None)
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT COUNT(*) FROM items')
+            with pytest.raises(sqlite3.OperationalError):
+                other.execute('BEGIN IMMEDIATE')
+            # Читатели писателя не ждут
+            assert other.execute('SELECT COUNT(*) FROM items').fetchone() == (0,)
+        other.close()
+
+    def test_bad_transaction_mode(self, database):
+        with pytest.raises(ValueError):
+            database(transaction_mode='LAZY')
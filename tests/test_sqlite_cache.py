@@ -0,0 +1,91 @@
+import multiprocessing
+import sqlite3
+import time
+
+import pytest
+
+from yatube.sqlite_cache import SQLiteCache
+
+
+@pytest.fixture
+def sqlite_cache(tmp_path):
+    return SQLiteCache(str(tmp_path / 'cache.sqlite3'), {
+        'OPTIONS': {'MAX_ENTRIES': 10, 'MAX_BYTES': 4096, 'CULL_FREQUENCY': 5},
+    })
+
+
+def incr_many(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class TestSQLiteCache:
+
+    def test_basic_operations(self, sqlite_cache):
+        sqlite_cache.set('key', {'value': 1})
+        assert sqlite_cache.get('key') == {'value': 1}
+        assert not sqlite_cache.add('key', 2), 'Проверьте, что add() не перезаписывает живой ключ'
+        assert sqlite_cache.add('counter', 1)
+        assert sqlite_cache.incr('counter') == 2
+        assert sqlite_cache.get('counter') == 2
+        sqlite_cache.set('expired', 1, timeout=0)
+        assert sqlite_cache.get('expired', 'нет') == 'нет', 'Проверьте, что истёкшие записи не читаются'
+        with pytest.raises(ValueError):
+            sqlite_cache.incr('missing')
+
+    def test_lru_eviction_by_entries_and_bytes(self, sqlite_cache, monkeypatch):
+        clock = iter(range(1000))
+        monkeypatch.setattr('yatube.sqlite_cache.time.time', lambda: float(next(clock)))
+        for i in range(10):
+            sqlite_cache.set(f'key:{i}', i)
+        # чтение обновляет отметку LRU: key:0 переживёт вытеснение
+        assert sqlite_cache.get('key:0') == 0
+        sqlite_cache.set('key:10', 10)
+        assert sqlite_cache.get('key:0') == 0, 'Проверьте, что вытесняются давно не читанные записи'
+        assert sqlite_cache.get('key:1') is None
+
+        sqlite_cache.set('big', 'x' * 3000)
+        sqlite_cache.set('big2', 'x' * 3000)
+        assert sqlite_cache.get('big') is None, 'Проверьте, что соблюдается ограничение MAX_BYTES'
+        assert sqlite_cache.get('big2') is not None
+
+    def test_get_many_marks_access(self, sqlite_cache, monkeypatch):
+        clock = iter(range(1000))
+        monkeypatch.setattr('yatube.sqlite_cache.time.time', lambda: float(next(clock)))
+        for i in range(10):
+            sqlite_cache.set(f'key:{i}', i)
+        assert sqlite_cache.get_many(['key:0', 'key:1']) == {'key:0': 0, 'key:1': 1}
+        sqlite_cache.set('key:10', 10)
+        assert sqlite_cache.get_many(['key:0', 'key:1', 'key:2']) == {'key:0': 0, 'key:1': 1}, \
+            'Проверьте, что чтение через get_many обновляет отметку LRU'
+
+    def test_read_does_not_wait_for_write_lock(self, tmp_path):
+        path = str(tmp_path / 'busy.sqlite3')
+        cache = SQLiteCache(path, {'OPTIONS': {'BUSY_TIMEOUT': 5}})
+        cache.set('key', 'value')
+        writer = sqlite3.connect(path, isolation_level=None)
+        # отметка давно устарела: чтение попробует обновить её
+        writer.execute('UPDATE cache SET accessed = 0')
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            started = time.monotonic()
+            assert cache.get('key') == 'value'
+            assert time.monotonic() - started < 1, \
+                'Проверьте, что чтение из кэша не ждёт блокировку записи'
+        finally:
+            writer.execute('ROLLBACK')
+            writer.close()
+        cache.set('other', 1)
+
+    def test_incr_is_atomic_between_processes(self, tmp_path):
+        path = str(tmp_path / 'shared.sqlite3')
+        SQLiteCache(path, {}).set('counter', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [context.Process(target=incr_many, args=(path, 50)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert SQLiteCache(path, {}).get('counter') == 200, \
+            'Проверьте, что incr() атомарен между процессами'
@@ -0,0 +1,117 @@
+import os
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from posts import kvstore, thumbnails
+from posts.models import ImageVariant, Post, ThumbnailJob
+from yatube.lru import LRUCache
+
+
+def image_file(name='index.png', size=(700, 300)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(0, 120, 0)).save(buffer, 'png')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+def processed_post(user):
+    post = Post.objects.create(text='Пост', author=user, image=image_file())
+    thumbnails.enqueue(post.image)
+    call_command('process_thumbnails', workers=0, once=True)
+    return post
+
+
+class TestLRUCache:
+
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(maxsize=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        assert lru.get('a') == 1 and lru.get('c') == 3
+        assert lru.get('b') is None, 'Проверьте, что вытесняется давно не читанная запись'
+
+    def test_entries_expire(self):
+        lru = LRUCache(timeout=0)
+        lru.set('a', 1)
+        assert lru.get('a') is None
+
+
+class TestThumbnailKVStore:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_is_persistent_and_read_from_lru(self, settings, tmp_path, user, django_assert_num_queries):
+        settings.MEDIA_ROOT = str(tmp_path)
+        assert isinstance(default.kvstore, kvstore.KVStore), \
+            'Проверьте, что sorl-thumbnail использует posts.kvstore.KVStore'
+        post = Post.objects.create(text='Пост', author=user, image=image_file())
+        thumbnail = get_thumbnail(post.image, '100x50', crop='center')
+        assert KVStoreModel.objects.filter(key__contains=thumbnail.key).exists(), \
+            'Проверьте, что индекс миниатюр хранится в базе'
+
+        with django_assert_num_queries(0):
+            again = get_thumbnail(post.image, '100x50', crop='center')
+        assert again.name == thumbnail.name
+
+        # Новый процесс: LRU пуст, индекс читается из базы без обращения к файлам
+        kvstore.lru.clear()
+        os.remove(tmp_path / thumbnail.name)
+        assert get_thumbnail(post.image, '100x50', crop='center').name == thumbnail.name
+
+
+class TestThumbnailIndexCommand:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_gc_removes_orphans_and_keeps_indexed_files(self, settings, tmp_path, user):
+        settings.MEDIA_ROOT = str(tmp_path)
+        post = processed_post(user)
+        sorl_thumbnail = get_thumbnail(post.image, '100x50')
+        orphans = [tmp_path / 'cache' / 'ab' / 'cd' / 'orphan.jpg', tmp_path / 'variants' / 'ff' / 'old' / '320.jpg']
+        for orphan in orphans:
+            orphan.parent.mkdir(parents=True)
+            orphan.write_bytes(b'x')
+
+        call_command('thumbnail_index', gc=True, dry_run=True)
+        assert all(orphan.exists() for orphan in orphans)
+
+        call_command('thumbnail_index', gc=True)
+        assert not any(orphan.exists() for orphan in orphans), \
+            'Проверьте, что --gc удаляет файлы, которых нет в индексе'
+        assert not (tmp_path / 'cache' / 'ab').exists(), 'Проверьте, что пустые каталоги удаляются'
+        assert (tmp_path / sorl_thumbnail.name).exists()
+        for name in ImageVariant.objects.values_list('name', flat=True):
+            assert (tmp_path / name).exists(), 'Проверьте, что проиндексированные варианты остаются'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_gc_drops_variants_of_replaced_images(self, settings, tmp_path, user):
+        settings.MEDIA_ROOT = str(tmp_path)
+        post = processed_post(user)
+        old_names = list(ImageVariant.objects.values_list('name', flat=True))
+        post.image = image_file('new.png')
+        post.save()
+
+        call_command('thumbnail_index', gc=True)
+        assert not ImageVariant.objects.exists()
+        assert not any((tmp_path / name).exists() for name in old_names)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rebuild_restores_index_from_files(self, settings, tmp_path, user):
+        settings.MEDIA_ROOT = str(tmp_path)
+        post = processed_post(user)
+        expected = set(ImageVariant.objects.values_list('name', 'width', 'format'))
+        ImageVariant.objects.all().delete()
+        ThumbnailJob.objects.all().delete()
+        lonely = Post.objects.create(text='Без вариантов', author=user, image=image_file('lonely.png'))
+
+        call_command('thumbnail_index', rebuild=True)
+        assert set(ImageVariant.objects.values_list('name', 'width', 'format')) == expected, \
+            'Проверьте, что --rebuild восстанавливает индекс по файлам'
+        assert list(ThumbnailJob.objects.values_list('image', flat=True)) == [lonely.image.name], \
+            'Проверьте, что картинки без файлов ставятся в очередь'
+        assert thumbnails.variants_for(post.image)
@@ -0,0 +1,99 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import ImageVariant, Post, ThumbnailJob
+
+
+def image_file(name='thumb.png', size=(100, 50)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(200, 0, 0)).save(buffer, 'png')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class TestThumbnailPipeline:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_new_post_enqueues_and_worker_generates(self, settings, tmp_path, user_client):
+        settings.MEDIA_ROOT = str(tmp_path)
+        user_client.post('/new/', {'text': 'Пост с картинкой', 'image': image_file()})
+        post = Post.objects.get()
+        job = ThumbnailJob.objects.get()
+        assert job.image == post.image.name and job.status == ThumbnailJob.PENDING, \
+            'Проверьте, что new_post ставит картинку в очередь генерации миниатюр'
+
+        content = user_client.get('/').content.decode()
+        assert 'img/placeholder.svg' in content, \
+            'Проверьте, что до генерации миниатюры показывается заглушка'
+
+        call_command('process_thumbnails', workers=0, once=True)
+        job.refresh_from_db()
+        assert job.status == ThumbnailJob.DONE
+        content = user_client.get('/').content.decode()
+        assert 'placeholder.svg' not in content and 'srcset="/media/variants/' in content, \
+            'Проверьте, что после генерации показывается картинка с srcset'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_edit_enqueues_new_image(self, settings, tmp_path, user_client, user):
+        settings.MEDIA_ROOT = str(tmp_path)
+        post = Post.objects.create(text='Пост', author=user)
+        user_client.post(f'/{user.username}/{post.id}/edit/', {'text': 'Пост', 'image': image_file('edit.png')})
+        post.refresh_from_db()
+        assert ThumbnailJob.objects.filter(image=post.image.name).exists(), \
+            'Проверьте, что post_edit ставит новую картинку в очередь'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_failed_job_is_retried(self, user):
+        ThumbnailJob.objects.create(image='posts/missing.png')
+        job, = thumbnails.claim(10)
+        thumbnails.finish(job, error='FileNotFoundError')
+        job.refresh_from_db()
+        assert job.status == ThumbnailJob.PENDING and job.attempts == 1, \
+            'Проверьте, что упавшая задача возвращается в очередь'
+
+        call_command('process_thumbnails', workers=0, once=True)
+        job.refresh_from_db()
+        assert job.attempts == thumbnails.MAX_ATTEMPTS, \
+            'Проверьте, что задача повторяется до MAX_ATTEMPTS попыток'
+        assert job.status == ThumbnailJob.FAILED and job.error, \
+            'Проверьте, что после MAX_ATTEMPTS попыток задача помечается ошибкой'
+        call_command('process_thumbnails', workers=0, once=True)
+        job.refresh_from_db()
+        assert job.attempts == thumbnails.MAX_ATTEMPTS, \
+            'Проверьте, что задача с ошибкой больше не выполняется'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_variants_recorded_per_width_and_format(self, settings, tmp_path, user_client, django_assert_num_queries):
+        settings.MEDIA_ROOT = str(tmp_path)
+        user_client.post('/new/', {'text': 'Пост', 'image': image_file(size=(1200, 600))})
+        call_command('process_thumbnails', workers=0, once=True)
+        post = Post.objects.get()
+        formats = thumbnails.supported_formats()
+        variants = ImageVariant.objects.filter(image=post.image.name)
+        assert variants.count() == len(thumbnails.WIDTHS) * len(formats), \
+            'Проверьте, что картинка нарезается во все ширины и форматы'
+        assert formats[-1] == 'JPEG'
+        for variant in variants:
+            assert (tmp_path / variant.name).exists()
+            assert variant.height == round(variant.width * 339 / 960)
+
+        content = user_client.get('/').content.decode()
+        for format in formats[:-1]:
+            assert f'type="{thumbnails.FORMATS[format][0]}"' in content, \
+                'Проверьте, что для современных форматов выводится <source>'
+        assert ' 320w, ' in content and ' 960w"' in content
+
+        # Метаданные вариантов читаются из кэша, без запросов к базе
+        with django_assert_num_queries(0):
+            thumbnails.variants_for(post.image)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_small_image_is_not_upscaled(self, settings, tmp_path, user):
+        settings.MEDIA_ROOT = str(tmp_path)
+        post = Post.objects.create(text='Пост', author=user, image=image_file(size=(700, 300)))
+        variants = thumbnails.generate(post.image.name)
+        assert sorted({variant['width'] for variant in variants}) == [320, 640]
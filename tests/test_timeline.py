@@ -0,0 +1,85 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry
+
+
+@pytest.fixture
+def author():
+    return get_user_model().objects.create_user(username='TimelineAuthor')
+
+
+class TestTimeline:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_fan_out_on_write(self, user, author):
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(text='Тестовый пост ленты', author=author)
+        assert TimelineEntry.objects.filter(user=user, post=post).exists(), \
+            'Проверьте, что новый пост попадает в ленту подписчика'
+
+        Follow.objects.filter(user=user, author=author).delete()
+        assert not TimelineEntry.objects.filter(user=user).exists(), \
+            'Проверьте, что после отписки посты автора пропадают из ленты'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_backfill_on_follow(self, user, author):
+        Post.objects.create(text='Старый пост', author=author)
+        Follow.objects.create(user=user, author=author)
+        assert TimelineEntry.objects.filter(user=user).count() == 1, \
+            'Проверьте, что при подписке в ленту добавляются уже опубликованные посты'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_celebrity_read_fallback(self, settings, user_client, user, author):
+        settings.TIMELINE_FANOUT_LIMIT = 0
+        Follow.objects.create(user=user, author=author)
+        Post.objects.create(text='Пост знаменитости', author=author)
+        assert not TimelineEntry.objects.exists(), \
+            'Проверьте, что посты авторов с большим числом подписчиков не раскладываются по лентам'
+
+        response = user_client.get('/follow/')
+        assert 'Пост знаменитости' in response.content.decode(), \
+            'Проверьте, что посты таких авторов подтягиваются в ленту при чтении'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_celebrity_pull_reads_once(self, settings, user):
+        settings.TIMELINE_FANOUT_LIMIT = 0
+        authors = [
+            get_user_model().objects.create_user(username=f'Celebrity{i}')
+            for i in range(3)
+        ]
+        for author in authors:
+            Follow.objects.create(user=user, author=author)
+            Post.objects.create(text='Пост знаменитости', author=author)
+        timeline.pull_celebrities(user)
+        assert TimelineEntry.objects.filter(user=user).count() == 3
+
+        with CaptureQueriesContext(connection) as queries:
+            timeline.pull_celebrities(user)
+        assert len(queries) == 2, \
+            'Проверьте, что даты последних постов авторов читаются группирующими запросами'
+        assert not any('INSERT' in query['sql'] for query in queries.captured_queries), \
+            'Проверьте, что без новых постов чтение ленты ничего не записывает'
+
+        Post.objects.create(text='Новый пост', author=authors[1])
+        timeline.pull_celebrities(user)
+        assert TimelineEntry.objects.filter(user=user).count() == 4, \
+            'Проверьте, что новый пост знаменитости попадает в ленту'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_backfill_command(self, user, author):
+        Follow.objects.create(user=user, author=author)
+        Post.objects.create(text='Тестовый пост ленты', author=author)
+        TimelineEntry.objects.all().delete()
+        stranger = get_user_model().objects.create_user(username='Stranger')
+        TimelineEntry.objects.create(
+            user=stranger, post=Post.objects.get(), author=author,
+            pub_date=Post.objects.get().pub_date)
+
+        call_command('backfill_timeline')
+        assert list(TimelineEntry.objects.values_list('user', flat=True)) == [user.id], \
+            'Проверьте, что команда восстанавливает ленты и удаляет записи без подписки'
@@ -0,0 +1,84 @@
+import io
+import json
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from posts import search
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+@pytest.fixture
+def data(user, group, django_user_model):
+    reader = django_user_model.objects.create_user(username='reader', password='1234567')
+    posts = [
+        Post.objects.create(text=f'Пост {i} про набережную', author=user, group=group)
+        for i in range(5)
+    ]
+    Comment.objects.create(post=posts[0], author=reader, text='Отличный пост')
+    Follow.objects.create(user=reader, author=user)
+    return posts
+
+
+def wipe():
+    Follow.objects.all().delete()
+    Post.objects.all().delete()
+    Group.objects.all().delete()
+    User.objects.all().delete()
+
+
+class TestTransfer:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_roundtrip(self, data, tmp_path):
+        path = tmp_path / 'dump.ndjson'
+        call_command('export_yatube', str(path), stderr=io.StringIO())
+        lines = path.read_text(encoding='utf-8').splitlines()
+        assert [json.loads(line)['model'] for line in lines][:2] == \
+            ['posts.group', 'auth.user']
+        dates = {post.pk: post.pub_date for post in data}
+
+        wipe()
+        call_command('import_yatube', str(path), '--batch-size', '2', stdout=io.StringIO())
+
+        assert {post.pk: post.pub_date for post in Post.objects.all()} == dates, \
+            'Проверьте, что импорт сохраняет первичные ключи и даты публикации'
+        reader = User.objects.get(username='reader')
+        assert reader.check_password('1234567')
+        author = data[0].author
+        assert User.objects.get(pk=author.pk).profile.post_count == 5, \
+            'Проверьте, что после импорта пересчитываются счётчики профилей'
+        assert Post.objects.get(pk=data[0].pk).comment_count == 1
+        assert TimelineEntry.objects.filter(user=reader).count() == 5, \
+            'Проверьте, что после импорта заполняются ленты подписок'
+        assert len(search.SearchPaginator('набережную').get_page()) == 5, \
+            'Проверьте, что после импорта перестраивается поисковый индекс'
+        assert not (tmp_path / 'dump.ndjson.checkpoint').exists()
+
+        # новые объекты получают ключи после загруженных
+        post = Post.objects.create(text='Новый', author=reader)
+        assert post.pk > max(dates)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_resume(self, data, tmp_path):
+        path = tmp_path / 'dump.ndjson'
+        call_command('export_yatube', str(path), stderr=io.StringIO())
+        lines = path.read_bytes().splitlines(keepends=True)
+        wipe()
+
+        # Загрузка прервалась после групп и пользователей
+        head = sum(len(line) for line in lines[:3])
+        partial = tmp_path / 'partial.ndjson'
+        partial.write_bytes(b''.join(lines[:3]))
+        call_command('import_yatube', str(partial), stdout=io.StringIO())
+        assert User.objects.count() == 2 and not Post.objects.exists()
+
+        (tmp_path / 'dump.ndjson.checkpoint').write_text(str(head))
+        out = io.StringIO()
+        call_command('import_yatube', str(path), '--resume', stdout=out)
+        assert f'Продолжаем с байта {head}' in out.getvalue()
+        assert Post.objects.count() == 5 and Follow.objects.count() == 1, \
+            'Проверьте, что import_yatube --resume продолжает загрузку с сохранённого места'
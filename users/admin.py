@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Profile
+
+
+class ProfileAdmin(admin.ModelAdmin):
+    list_display = ("user", "post_count", "follower_count", "following_count")
+    search_fields = ("user__username",)
+    readonly_fields = ("post_count", "follower_count", "following_count")
+
+
+admin.site.register(Profile, ProfileAdmin)
@@ -1,9 +1,14 @@
+from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
 
 
 User = get_user_model()
 
+# Адреса <username>/ перекрыты маршрутами с тем же первым сегментом
+# (posts/urls.py): профиль с таким именем был бы недоступен
+RESERVED_USERNAMES = frozenset({"api", "search"})
+
 
 # создадим собственный класс для формы регистрации
 # сделаем его наследником предустановленного класса UserCreationForm
@@ -12,4 +17,10 @@ class CreationForm(UserCreationForm):
         # модуль уже существует, сошлемся на нее
         model = User
         # укажем, какие поля должны быть видны в форме и в каком порядке
-        fields = ("first_name", "last_name", "username", "email")
\ No newline at end of file
+        fields = ("first_name", "last_name", "username", "email")
+
+    def clean_username(self):
+        username = self.cleaned_data["username"]
+        if username.lower() in RESERVED_USERNAMES:
+            raise forms.ValidationError("Это имя занято адресом сайта")
+        return username
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def counter(model, field, ref="user"):
+    rows = model.objects.filter(**{field: OuterRef(ref)}).values(field) \
+        .annotate(total=Count("id")).values("total")
+    return Coalesce(Subquery(rows, output_field=models.IntegerField()), 0)
+
+
+def create_profiles(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model("users", "Profile")
+    Post = apps.get_model("posts", "Post")
+    Follow = apps.get_model("posts", "Follow")
+    Profile.objects.bulk_create(
+        [Profile(user_id=pk) for pk in User.objects.values_list("pk", flat=True)],
+        batch_size=500,
+    )
+    Profile.objects.update(
+        post_count=counter(Post, "author"),
+        follower_count=counter(Follow, "author"),
+        following_count=counter(Follow, "user"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('follower_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(create_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+"""
+Вспомогательные функции для асинхронных view (см. yatube/asgi.py).
+
+Django 2.2 вызывает view синхронно и не умеет работать с корутинами,
+а ORM нельзя вызывать из цикла событий. Поэтому:
+
+* async-view оборачивается в sync_view: обработчик Django вызывает
+  обычную функцию, а она выполняет корутину в цикле событий ASGI-сервера
+  и ждёт результата;
+* каждый вызов ORM внутри корутины — await run_db(...): он выполняется в
+  отдельном ограниченном пуле потоков (ASGI_DB_THREADS), и независимые
+  запросы можно запускать одновременно через asyncio.gather. У потоков
+  пула свои соединения: обёртки execute_wrapper, которые middleware
+  поставили на соединения потока запроса (InstrumentationMiddleware,
+  QueryLogMiddleware), run_db ставит и на них, чтобы запросы не выпадали
+  из счётчиков и журнала.
+
+Под WSGI (и в тестах через Client) цикла ASGI нет, и корутина выполняется
+в собственном цикле через asyncio.run.
+"""
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+
+_loop = None
+_executor = None
+_lock = threading.Lock()
+
+# {alias: обёртки execute_wrapper} соединений потока запроса
+_execute_wrappers = contextvars.ContextVar("execute_wrappers", default=None)
+
+
+def db_threads():
+    return getattr(settings, "ASGI_DB_THREADS", 8)
+
+
+def db_executor():
+    # Соединения с базой у потоков пула живут всё время работы процесса,
+    # как при CONN_MAX_AGE=None
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=db_threads(), thread_name_prefix="db")
+    return _executor
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполняет func(*args, **kwargs) с доступом к базе в пуле потоков."""
+    # Контекст (например, выбранная для запроса реплика, см. db_router)
+    # переходит в поток пула вместе с вызовом
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        db_executor(), lambda: context.run(_wrapped, func, args, kwargs))
+
+
+def _wrapped(func, args, kwargs):
+    wrappers = _execute_wrappers.get()
+    if not wrappers:
+        return func(*args, **kwargs)
+    with ExitStack() as stack:
+        for alias, items in wrappers.items():
+            for wrapper in items:
+                stack.enter_context(connections[alias].execute_wrapper(wrapper))
+        return func(*args, **kwargs)
+
+
+def set_loop(loop):
+    global _loop
+    _loop = loop
+
+
+async def _in_context(context, coroutine):
+    # Задача в цикле ASGI-сервера получает копию контекста цикла, а не
+    # потока запроса: переносим значения переменных в неё
+    for variable, value in context.items():
+        variable.set(value)
+    return await coroutine
+
+
+def sync_view(view):
+    """Обычная view, которая выполняет корутину view в цикле событий."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _execute_wrappers.set({
+            alias: list(connections[alias].execute_wrappers)
+            for alias in connections
+        })
+        try:
+            coroutine = _in_context(
+                contextvars.copy_context(), view(request, *args, **kwargs))
+        finally:
+            _execute_wrappers.reset(token)
+        loop = _loop
+        if loop is not None and loop.is_running():
+            return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+        return asyncio.run(coroutine)
+    return wrapper
@@ -0,0 +1,146 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``:
+
+    uvicorn yatube.asgi:application --workers 4
+
+Django 2.2 не поддерживает ASGI, поэтому здесь собственный адаптер.
+Запрос обрабатывается обычным обработчиком Django со всеми middleware в
+ограниченном пуле потоков (ASGI_REQUEST_THREADS), так что цикл событий не
+блокируется. Для читающих view (лента, группа, профиль, пост, подписки)
+используется yatube.asgi_urls с асинхронными версиями из
+posts.async_views: их запросы к базе идут в отдельный пул
+(ASGI_DB_THREADS, см. yatube.aio), независимые — одновременно.
+"""
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+django.setup(set_prefix=False)
+
+from django.conf import settings  # noqa: E402
+from django.core.handlers.wsgi import WSGIHandler  # noqa: E402
+
+from yatube import aio  # noqa: E402
+
+
+ASYNC_URLCONF = "yatube.asgi_urls"
+
+
+class Handler(WSGIHandler):
+
+    def get_response(self, request):
+        request.urlconf = ASYNC_URLCONF
+        return super().get_response(request)
+
+
+def build_environ(scope, body):
+    """WSGI environ для HTTP-запроса ASGI."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    path = scope.get("raw_path") or scope["path"].encode()
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": path.split(b"?", 1)[0].decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/%s" % scope.get("http_version", "1.1"),
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE" or name == "CONTENT_LENGTH":
+            key = name
+        else:
+            key = "HTTP_" + name
+        if key in environ:
+            separator = "; " if key == "HTTP_COOKIE" else ","
+            value = environ[key] + separator + value
+        environ[key] = value
+    return environ
+
+
+class ASGIHandler:
+
+    def __init__(self):
+        self.handler = Handler()
+        self.executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "ASGI_REQUEST_THREADS", 32),
+            thread_name_prefix="request")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] != "http":
+            raise ValueError("Unsupported ASGI scope type: %s" % scope["type"])
+
+        loop = asyncio.get_running_loop()
+        aio.set_loop(loop)
+        body = await self.read_body(receive)
+        status, headers, content = await loop.run_in_executor(
+            self.executor, self.run, build_environ(scope, body))
+        await send({
+            "type": "http.response.start", "status": status, "headers": headers,
+        })
+        await send({"type": "http.response.body", "body": content})
+
+    @staticmethod
+    async def read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        return b"".join(chunks)
+
+    def run(self, environ):
+        """Обрабатывает запрос в потоке пула, как WSGI-сервер."""
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ]
+
+        response = self.handler(environ, start_response)
+        try:
+            content = b"".join(response)
+        finally:
+            # close() отправляет request_finished: Django закроет соединения
+            response.close()
+        return started["status"], started["headers"], content
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                aio.set_loop(asyncio.get_running_loop())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+application = ASGIHandler()
@@ -0,0 +1,16 @@
+"""URLconf для ASGI: как yatube.urls, но приложение posts — из posts.async_urls."""
+from django.urls import include, path
+
+from yatube.urls import handler404, handler500  # noqa: F401
+from yatube.urls import urlpatterns as sync_urlpatterns
+
+
+def _is_posts(pattern):
+    urlconf = getattr(pattern, "urlconf_name", None)
+    return getattr(urlconf, "__name__", urlconf) == "posts.urls"
+
+
+urlpatterns = [
+    path("", include("posts.async_urls")) if _is_posts(pattern) else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,135 @@
+"""
+Чтение лент с реплик базы.
+
+Запись всегда идёт в default (primary). На реплики из DATABASE_REPLICAS
+уходит только чтение внутри view, помеченных replica_reads: это читающие
+ленты posts.views и API (API — кроме REPLICA_MAX_LAG после изменения
+ленты, см. posts.api.feed_reads). Сессии, авторизация и view, которые пишут
+(new_post, add_comment, подписки и лента подписок, дописывающая посты
+«знаменитостей»), читают primary.
+
+Реплика отстаёт от primary. Чтобы автор сразу видел свой пост или
+комментарий (read-your-writes), ReplicaPinningMiddleware после запроса с
+записью в базу запоминает в сессии время: ещё REPLICA_PIN_SECONDS все
+запросы этой сессии читают primary.
+
+Локально реплики — копии файла SQLite, их обновляет replicate() (команда
+manage.py sync_replicas), см. настройку DATABASE_REPLICAS.
+"""
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+PIN_SESSION_KEY = "_replica_pinned_until"
+
+# Реплика текущего запроса; None — читать primary
+_replica = ContextVar("replica", default=None)
+# Состояние запроса, которое ведёт ReplicaPinningMiddleware
+_state = ContextVar("replica_state", default=None)
+
+
+class RequestState:
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def pin_seconds():
+    return getattr(settings, "REPLICA_PIN_SECONDS", 10)
+
+
+def current_replica():
+    """Реплика, с которой сейчас читает view, или None."""
+    return _replica.get()
+
+
+def replica_reads(view):
+    """
+    Чтение во view идёт на одну реплику, выбранную на весь запрос:
+    страница и счётчики под ней будут согласованы между собой.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        aliases = replicas()
+        if not aliases or (state is not None and state.pinned):
+            return view(request, *args, **kwargs)
+        token = _replica.set(random.choice(aliases))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что в primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему реплики получают вместе с данными от primary
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes: после записи сессия читает primary ещё
+    REPLICA_PIN_SECONDS. Должен стоять после SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replicas():
+            return self.get_response(request)
+        session = getattr(request, "session", None)
+        pinned = session is not None \
+            and session.get(PIN_SESSION_KEY, 0) > time.time()
+        state = RequestState(pinned)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and session is not None:
+            session[PIN_SESSION_KEY] = time.time() + pin_seconds()
+        return response
+
+
+def replicate(alias, source=DEFAULT_DB_ALIAS):
+    """
+    Копирует базу source в реплику alias через backup API SQLite.
+    Замена настоящей репликации для локального запуска и тестов.
+    """
+    connection = connections[source]
+    connection.ensure_connection()
+    target = sqlite3.connect(connections[alias].settings_dict["NAME"])
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
@@ -0,0 +1,218 @@
+"""
+Лёгкая замена debug_toolbar для продакшена.
+
+InstrumentationMiddleware замеряет долю PERF_SAMPLE_RATE запросов:
+число и время SQL-запросов, время рендеринга шаблонов, попадания и
+промахи кэша и общее время ответа. Замер пишется в кольцевой буфер
+процесса (последние PERF_BUFFER_SIZE запросов). Персонал (и все при
+DEBUG) получает в ответе заголовок Server-Timing — его показывают
+инструменты разработчика браузера; остальным внутренние замеры не видны.
+Сводка по view — на странице /admin/performance/.
+
+Незамеренные запросы почти ничего не стоят: одна проверка random().
+Буфер у каждого процесса свой, страница показывает замеры того воркера,
+который её отдал.
+"""
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.db import connections
+from django.shortcuts import render
+from django.template.backends import django as django_backend
+
+
+_current = ContextVar("perf_sample", default=None)
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def sample_rate():
+    return getattr(settings, "PERF_SAMPLE_RATE", 0.01)
+
+
+def buffer():
+    global _buffer
+    size = getattr(settings, "PERF_BUFFER_SIZE", 1000)
+    if _buffer is None or _buffer.maxlen != size:
+        with _buffer_lock:
+            if _buffer is None or _buffer.maxlen != size:
+                _buffer = deque(_buffer or (), maxlen=size)
+    return _buffer
+
+
+class Sample:
+    __slots__ = (
+        "view", "status", "started", "total", "queries", "db_time",
+        "template_time", "cache_hits", "cache_misses",
+    )
+
+    def __init__(self):
+        self.view = "-"
+        self.status = None
+        self.started = time.time()
+        self.total = self.db_time = self.template_time = 0.0
+        self.queries = self.cache_hits = self.cache_misses = 0
+
+    def server_timing(self):
+        return ", ".join((
+            'db;dur=%.1f;desc="%d queries"' % (self.db_time * 1000, self.queries),
+            "tpl;dur=%.1f" % (self.template_time * 1000),
+            'cache;desc="%d hits, %d misses"' % (self.cache_hits, self.cache_misses),
+            "total;dur=%.1f" % (self.total * 1000),
+        ))
+
+
+def _execute(execute, sql, params, many, context):
+    sample = _current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if sample is not None:
+            sample.queries += 1
+            sample.db_time += time.perf_counter() - started
+
+
+def _install_template_timer():
+    # Замеряется только Template.render бэкенда, то есть render() во view:
+    # {% include %} и теги рендерятся внутри него и второй раз не считаются
+    render = django_backend.Template.render
+    if getattr(render, "instrumented", False):
+        return
+
+    def timed_render(self, *args, **kwargs):
+        sample = _current.get()
+        if sample is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            sample.template_time += time.perf_counter() - started
+
+    timed_render.instrumented = True
+    django_backend.Template.render = timed_render
+
+
+class _CacheCounter:
+    """
+    Считает попадания в кэш по умолчанию на время запроса. Экземпляр
+    бэкенда у каждого потока свой, поэтому методы подменяются на нём самом.
+    """
+
+    def __init__(self, sample):
+        self.sample = sample
+        self.backend = caches[DEFAULT_CACHE_ALIAS]
+
+    def __enter__(self):
+        backend, sample = self.backend, self.sample
+        get, get_many = backend.get, backend.get_many
+
+        def counted_get(key, default=None, version=None):
+            value = get(key, default=default, version=version)
+            if value is default:
+                sample.cache_misses += 1
+            else:
+                sample.cache_hits += 1
+            return value
+
+        def counted_get_many(keys, version=None):
+            keys = list(keys)
+            found = get_many(keys, version=version)
+            sample.cache_hits += len(found)
+            sample.cache_misses += len(keys) - len(found)
+            return found
+
+        backend.get, backend.get_many = counted_get, counted_get_many
+
+    def __exit__(self, *exc_info):
+        del self.backend.get, self.backend.get_many
+
+
+def show_timing(request):
+    """Замеры видны тем же, кому и страница /admin/performance/."""
+    if settings.DEBUG:
+        return True
+    user = getattr(request, "user", None)
+    return user is not None and user.is_active and user.is_staff
+
+
+class InstrumentationMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_template_timer()
+
+    def __call__(self, request):
+        if random.random() >= sample_rate():
+            return self.get_response(request)
+
+        sample = Sample()
+        token = _current.set(sample)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(_execute))
+                stack.enter_context(_CacheCounter(sample))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        sample.total = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            sample.view = match.view_name
+        sample.status = response.status_code
+        buffer().append(sample)
+        if show_timing(request):
+            response["Server-Timing"] = sample.server_timing()
+        return response
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+
+def summary(samples=None):
+    """Сводка по view: число замеров, перцентили времени и средние значения."""
+    by_view = defaultdict(list)
+    for sample in list(buffer()) if samples is None else samples:
+        by_view[sample.view].append(sample)
+    rows = []
+    for view, items in by_view.items():
+        totals = [item.total * 1000 for item in items]
+        hits = sum(item.cache_hits for item in items)
+        lookups = hits + sum(item.cache_misses for item in items)
+        rows.append({
+            "view": view,
+            "count": len(items),
+            "p50_ms": percentile(totals, 0.50),
+            "p95_ms": percentile(totals, 0.95),
+            "p99_ms": percentile(totals, 0.99),
+            "queries": sum(item.queries for item in items) / len(items),
+            "db_ms": sum(item.db_time for item in items) * 1000 / len(items),
+            "template_ms": sum(item.template_time for item in items) * 1000 / len(items),
+            "cache_hit_ratio": hits / lookups if lookups else None,
+        })
+    rows.sort(key=lambda row: row["p95_ms"] * row["count"], reverse=True)
+    return rows
+
+
+def performance_view(request):
+    context = dict(
+        admin.site.each_context(request),
+        title="Производительность",
+        rows=summary(),
+        recent=list(buffer())[-50:][::-1],
+        sample_rate=sample_rate(),
+    )
+    return render(request, "admin/performance.html", context)
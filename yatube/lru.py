@@ -0,0 +1,50 @@
+"""
+LRU-кэш в памяти процесса.
+
+Стоит перед общим кэшем или базой для данных, которые читаются на каждой
+странице и почти не меняются. Записи живут не дольше timeout секунд:
+изменения, сделанные другими процессами, становятся видны не позже чем
+через это время.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+
+    def __init__(self, maxsize=1000, timeout=300):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.timeout)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
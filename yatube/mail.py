@@ -0,0 +1,57 @@
+"""
+Отправка писем через очередь задач (posts/jobs.py).
+
+QueuedEmailBackend только ставит письма в очередь, а отправляет их воркер
+run_workers через JOBS_EMAIL_BACKEND: запрос, который отправляет письмо
+(например, сброс пароля), не ждёт почтового сервера.
+
+    EMAIL_BACKEND = "yatube.mail.QueuedEmailBackend"
+    JOBS_EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+"""
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from posts import jobs
+
+
+FIELDS = ("subject", "body", "from_email", "to", "cc", "bcc", "reply_to")
+
+
+def delivery_backend():
+    return getattr(
+        settings, "JOBS_EMAIL_BACKEND",
+        "django.core.mail.backends.smtp.EmailBackend")
+
+
+def serialize(message):
+    data = {name: getattr(message, name) for name in FIELDS}
+    data["headers"] = message.extra_headers
+    data["alternatives"] = [list(item) for item in getattr(message, "alternatives", [])]
+    return data
+
+
+@jobs.task
+def send_email(message):
+    data = dict(message)
+    alternatives = data.pop("alternatives")
+    email = EmailMultiAlternatives(
+        connection=get_connection(delivery_backend()), **data)
+    for content, mimetype in alternatives:
+        email.attach_alternative(content, mimetype)
+    email.send()
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+
+    def send_messages(self, email_messages):
+        direct = []
+        for message in email_messages:
+            if message.attachments:
+                # вложения в JSON задачи не кладём: такие письма уходят сразу
+                direct.append(message)
+            else:
+                jobs.enqueue(send_email, priority=jobs.HIGH, message=serialize(message))
+        if direct:
+            get_connection(delivery_backend()).send_messages(direct)
+        return len(email_messages)
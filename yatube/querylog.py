@@ -0,0 +1,164 @@
+"""
+Журнал медленных и повторяющихся SQL-запросов.
+
+QueryLogMiddleware подключает к каждому запросу обёртку
+connection.execute_wrapper и в конце запроса пишет в логгер
+"yatube.querylog":
+
+* slow — запрос дольше QUERY_LOG_SLOW_MS;
+* duplicate — один и тот же SQL с теми же параметрами выполнен больше
+  одного раза;
+* similar — один и тот же SQL с разными параметрами выполнен не меньше
+  QUERY_LOG_SIMILAR раз (обычно это N+1 в цикле шаблона).
+
+Для каждой находки указываются view, строка кода проекта и строка шаблона,
+из которых выполнялся запрос. Записи в формате JSON (см. JSONFormatter)
+сводит в отчёт команда query_report.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger("yatube.querylog")
+
+# Кадры middleware замеров не показываем как место запроса
+SKIP_FILES = {
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "instrumentation.py"),
+}
+
+# Управление транзакциями повторяется законно
+TRANSACTION_SQL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+def slow_threshold():
+    return getattr(settings, "QUERY_LOG_SLOW_MS", 100) / 1000
+
+
+def similar_threshold():
+    return getattr(settings, "QUERY_LOG_SIMILAR", 5)
+
+
+def locate():
+    """(строка кода проекта, строка шаблона), откуда выполняется запрос."""
+    code = template = None
+    frame = sys._getframe(1)
+    while frame is not None and (code is None or template is None):
+        if template is None and frame.f_code.co_name == "render_annotated":
+            # Node.render_annotated: самый внутренний узел шаблона
+            node = frame.f_locals.get("self")
+            origin = getattr(node, "origin", None)
+            token = getattr(node, "token", None)
+            if origin is not None and token is not None:
+                template = "%s:%s" % (origin.template_name, token.lineno)
+        if code is None:
+            filename = os.path.abspath(frame.f_code.co_filename)
+            if (filename.startswith(settings.BASE_DIR)
+                    and filename not in SKIP_FILES
+                    and "site-packages" not in filename):
+                code = "%s:%d" % (
+                    os.path.relpath(filename, settings.BASE_DIR), frame.f_lineno)
+        frame = frame.f_back
+    return code, template
+
+
+class QueryLog:
+    """Обёртка execute_wrapper: собирает запросы одного HTTP-запроса."""
+
+    def __init__(self):
+        self.slow = []
+        self.identical = {}
+        self.similar = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.add(sql, params, elapsed)
+
+    def add(self, sql, params, elapsed):
+        if elapsed >= slow_threshold():
+            self.slow.append((sql, elapsed, locate()))
+        if sql.lstrip().upper().startswith(TRANSACTION_SQL):
+            return
+
+        key = (sql, repr(params))
+        entry = self.identical.get(key)
+        if entry is None:
+            self.identical[key] = [1, elapsed, None]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if entry[2] is None:
+                # Место запоминаем на первом повторе, а не на каждом запросе
+                entry[2] = locate()
+
+        entry = self.similar.get(sql)
+        if entry is None:
+            self.similar[sql] = [1, elapsed, None]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+            if entry[0] == similar_threshold():
+                entry[2] = locate()
+
+    def findings(self):
+        for sql, elapsed, location in self.slow:
+            yield "slow", sql, 1, elapsed, location
+        variants = {}
+        for (sql, _), (count, elapsed, location) in self.identical.items():
+            variants[sql] = variants.get(sql, 0) + 1
+            if count > 1:
+                yield "duplicate", sql, count, elapsed, location
+        for sql, (count, elapsed, location) in self.similar.items():
+            # Один и тот же запрос без разных параметров — уже duplicate
+            if count >= similar_threshold() and variants[sql] > 1:
+                yield "similar", sql, count, elapsed, location
+
+    def report(self, view, path):
+        for kind, sql, count, elapsed, location in self.findings():
+            code, template = location or (None, None)
+            logger.warning(
+                "%s query in %s (%d times, %.1f ms) at %s%s: %s",
+                kind, view, count, elapsed * 1000, code,
+                " / %s" % template if template else "", sql,
+                extra={"querylog": {
+                    "kind": kind, "view": view, "path": path, "sql": sql,
+                    "count": count, "ms": round(elapsed * 1000, 3),
+                    "code": code, "template": template,
+                }},
+            )
+
+
+class QueryLogMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        log = QueryLog()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(log))
+            response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        log.report(match.view_name if match else "-", request.path)
+        return response
+
+
+class JSONFormatter(logging.Formatter):
+    """Одна находка — одна строка JSON для query_report."""
+
+    def format(self, record):
+        data = dict(getattr(record, "querylog", {}), time=record.created)
+        data.setdefault("message", record.getMessage())
+        return json.dumps(data, ensure_ascii=False)
@@ -0,0 +1,140 @@
+"""
+Ограничение частоты запросов на запись (token bucket).
+
+Политика задаётся в RATE_LIMITS: для каждой области (user, ip) пара
+(скорость «N/период», запас), где запас — сколько запросов можно сделать
+подряд после перерыва. Запрос проверяется по корзине пользователя (если
+он вошёл) и по корзине IP-адреса; если хоть одна пуста, view не
+вызывается, а клиент получает 429 с Retry-After.
+
+IP-адрес клиента берётся из REMOTE_ADDR. За обратным прокси там адрес
+прокси, и все клиенты попали бы в одну корзину: RATELIMIT_PROXY_COUNT —
+число доверенных прокси перед приложением, тогда адрес клиента берётся из
+X-Forwarded-For на столько позиций от конца (левее стоят адреса, которые
+клиент мог подделать).
+
+Корзина хранится в кэше как GCRA: одно число — момент (мс), когда
+корзина снова станет полной. Запрос сдвигает его на интервал между
+токенами атомарным cache.incr(), так что параллельные запросы не
+теряются. Если момент уже прошёл, отсчёт начинается заново через
+cache.set(): в этом редком случае одновременные запросы могут получить
+лишний токен.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+
+PERIODS = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}
+SCOPES = ("user", "ip")
+
+
+def parse_rate(rate):
+    """'20/h' -> интервал между токенами в мс."""
+    count, period = rate.split("/")
+    return PERIODS[period] * 1000 / int(count)
+
+
+def enabled():
+    return getattr(settings, "RATELIMIT_ENABLED", True)
+
+
+def key_timeout():
+    return getattr(settings, "RATELIMIT_KEY_TTL", 60 * 60)
+
+
+def proxy_count():
+    return getattr(settings, "RATELIMIT_PROXY_COUNT", 0)
+
+
+def client_ip(request):
+    remote = request.META.get("REMOTE_ADDR", "")
+    hops = proxy_count()
+    if not hops:
+        return remote
+    forwarded = [
+        address.strip()
+        for address in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+        if address.strip()
+    ]
+    if len(forwarded) < hops:
+        # запрос пришёл не через все прокси
+        return remote
+    return forwarded[-hops]
+
+
+def _key(policy, scope, request):
+    if scope == "user":
+        if not request.user.is_authenticated:
+            return None
+        return "ratelimit:%s:user:%s" % (policy, request.user.pk)
+    return "ratelimit:%s:ip:%s" % (policy, client_ip(request))
+
+
+def acquire(key, interval, burst, now):
+    """
+    Берёт токен из корзины key. Возвращает 0, если запрос разрешён, иначе
+    через сколько мс появится токен.
+    """
+    interval = int(interval)
+    timeout = max(math.ceil(interval * burst / 1000), key_timeout())
+    try:
+        ready = cache.incr(key, interval)
+    except ValueError:
+        if cache.add(key, now + interval, timeout):
+            return 0
+        ready = cache.incr(key, interval)
+    previous = ready - interval
+    if previous < now:
+        # корзина успела наполниться: отсчёт заново от текущего момента
+        cache.set(key, now + interval, timeout)
+        return 0
+    wait = previous - now - (burst - 1) * interval
+    if wait > 0:
+        # отказ токен не тратит
+        cache.decr(key, interval)
+        return wait
+    return 0
+
+
+def check(policy, request):
+    """0, если запрос укладывается в политику, иначе Retry-After в секундах."""
+    rules = settings.RATE_LIMITS[policy]
+    now = int(time.time() * 1000)
+    taken = []
+    for scope in SCOPES:
+        key = _key(policy, scope, request)
+        if key is None or scope not in rules:
+            continue
+        rate, burst = rules[scope]
+        interval = int(parse_rate(rate))
+        wait = acquire(key, interval, burst, now)
+        if wait:
+            # запрос не пройдёт: токены других корзин возвращаются
+            for other, other_interval in taken:
+                cache.decr(other, other_interval)
+            return math.ceil(wait / 1000)
+        taken.append((key, interval))
+    return 0
+
+
+def ratelimit(policy, methods=("POST",)):
+    """Ограничивает view политикой RATE_LIMITS[policy] для методов methods."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if enabled() and request.method in methods:
+                retry_after = check(policy, request)
+                if retry_after:
+                    response = render(
+                        request, "misc/429.html",
+                        {"retry_after": retry_after}, status=429)
+                    response["Retry-After"] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
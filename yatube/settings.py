@@ -47,20 +47,26 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'yatube.instrumentation.InstrumentationMiddleware',
+    'yatube.querylog.QueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yatube.db_router.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar сильно замедляет каждый запрос, он нужен только при отладке
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
@@ -88,13 +94,46 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# WAL, PRAGMA и повтор запросов при занятой базе: см. yatube/sqlite_backend
+SQLITE_OPTIONS = {
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': SQLITE_OPTIONS,
     }
 }
 
+# Реплики для чтения лент (см. yatube/db_router.py). Локально это копии
+# db.sqlite3, которые обновляет manage.py sync_replicas:
+#     YATUBE_REPLICAS=2 python manage.py runserver
+#     YATUBE_REPLICAS=2 python manage.py sync_replicas --interval 1
+DATABASE_REPLICAS = []
+for number in range(1, int(os.environ.get('YATUBE_REPLICAS', 0)) + 1):
+    alias = 'replica%d' % number
+    DATABASES[alias] = {
+        'ENGINE': 'yatube.sqlite_backend',
+        'NAME': os.path.join(BASE_DIR, 'db.%s.sqlite3' % alias),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': SQLITE_OPTIONS,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['yatube.db_router.ReplicaRouter']
+
+# После записи сессия столько секунд читает только primary
+REPLICA_PIN_SECONDS = 10
+# Наибольшее ожидаемое отставание реплик, секунды
+REPLICA_MAX_LAG = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -148,7 +187,10 @@ LOGIN_REDIRECT_URL = "index"
 
 
 #  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+# Письма ставятся в очередь задач, а в файлы их записывает воркер
+# run_workers (см. yatube/mail.py)
+EMAIL_BACKEND = "yatube.mail.QueuedEmailBackend"
+JOBS_EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
@@ -156,12 +198,112 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 # Идентификатор текущего сайта
 SITE_ID = 1
 
+# Общий для всех воркеров кэш в файле SQLite (WAL): сброс версий лент
+# в одном процессе сразу виден остальным
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'yatube.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_BYTES': 64 * 1024 * 1024,
+        },
     }
 }
 
+# Тесты кладут кэш во временный каталог (yatube/testing.py)
+TEST_RUNNER = 'yatube.testing.TestRunner'
+
+# Индекс миниатюр sorl-thumbnail: таблица в базе и LRU в памяти процесса
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_LRU_SIZE = 10000
+THUMBNAIL_LRU_TIMEOUT = 300
+
 INTERNAL_IPS = [
     '127.0.0.1',
-]
\ No newline at end of file
+]
+
+# Лента подписок: посты авторов, у которых подписчиков больше этого числа,
+# не раскладываются по лентам при публикации, а читаются при показе ленты
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Время жизни закэшированных страниц и фрагментов лент. Устаревшими они не
+# бывают: при изменении постов меняется версия ленты в ключе кэша
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Комментарии на странице поста: сколько показать сразу и сколько
+# подгружать кнопкой «Показать ещё»
+COMMENTS_FIRST_PAGE = 20
+COMMENTS_PAGE_SIZE = 50
+
+# Поиск: "fts5" (SQLite FTS5), "python" (обратный индекс в таблицах Django)
+# или "auto" — FTS5, если миграция смогла создать его таблицу
+SEARCH_BACKEND = 'auto'
+# Через столько дней вес поста в выдаче уменьшается вдвое
+SEARCH_RECENCY_DAYS = 30
+
+# Замеры запросов (yatube.instrumentation): доля замеряемых запросов и
+# сколько последних замеров хранит каждый процесс
+PERF_SAMPLE_RATE = 0.01
+PERF_BUFFER_SIZE = 1000
+
+# Журнал медленных и повторяющихся SQL-запросов (yatube.querylog).
+# Отчёт по нему: python manage.py query_report
+QUERY_LOG_SLOW_MS = 100
+QUERY_LOG_SIMILAR = 5
+QUERY_LOG_FILE = os.path.join(BASE_DIR, 'querylog.jsonl')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'querylog': {'()': 'yatube.querylog.JSONFormatter'},
+    },
+    'handlers': {
+        'querylog': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': QUERY_LOG_FILE,
+            'formatter': 'querylog',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'yatube.querylog': {
+            'handlers': ['querylog'],
+            'level': 'WARNING',
+        },
+    },
+}
+
+# ASGI (yatube/asgi.py): потоки для обработки запросов и отдельный пул
+# для запросов к базе из асинхронных view
+ASGI_REQUEST_THREADS = 32
+ASGI_DB_THREADS = 8
+
+# Ограничение частоты записи (yatube/ratelimit.py): для пользователя и
+# IP-адреса — скорость и сколько запросов можно сделать подряд.
+# В тестах выключено, см. yatube/testing.py
+RATE_LIMITS = {
+    'post': {'user': ('30/h', 10), 'ip': ('100/h', 30)},
+    'comment': {'user': ('120/h', 20), 'ip': ('300/h', 60)},
+    'follow': {'user': ('200/h', 30), 'ip': ('500/h', 100)},
+}
+RATELIMIT_ENABLED = True
+# Число доверенных обратных прокси перед приложением: адрес клиента для
+# ограничения по IP берётся из X-Forwarded-For. 0 — только REMOTE_ADDR
+RATELIMIT_PROXY_COUNT = int(os.environ.get('YATUBE_PROXY_COUNT', 0))
+
+# Дайджесты новых постов для подписчиков (posts/notifications.py):
+# период рассылки в секундах и размер пачки получателей
+NOTIFY_DIGEST_INTERVAL = 24 * 60 * 60
+NOTIFY_DIGEST_BATCH = 1000
+NOTIFY_DIGEST_MAX_POSTS = 5
+
+# Очередь задач (posts/jobs.py): пауза перед первым повтором и наибольшая
+# пауза, секунды
+JOBS_RETRY_DELAY = 5
+JOBS_MAX_RETRY_DELAY = 60 * 60
+# Выполнять задачи сразу после коммита, без воркеров (так работают тесты,
+# см. yatube/testing.py)
+JOBS_EAGER = False
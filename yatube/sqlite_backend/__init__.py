@@ -0,0 +1,27 @@
+"""
+Бэкенд базы SQLite с настройками для работы под нагрузкой.
+
+Стандартный бэкенд Django открывает базу в режиме rollback journal, где
+запись блокирует чтение, начинает транзакции с отложенной блокировкой и
+при занятой базе сразу падает с «database is locked». Этот бэкенд:
+
+* включает WAL: читатели не ждут писателя и видят последний коммит;
+* настраивает synchronous, cache_size, mmap_size и busy_timeout;
+* начинает транзакции atomic() с BEGIN IMMEDIATE: писатель берёт
+  блокировку сразу и ждёт её по busy_timeout, а не получает ошибку
+  посреди транзакции при попытке повысить блокировку чтения до записи;
+* повторяет запрос вне транзакции с экспоненциальной паузой, если база
+  всё ещё занята.
+
+Соединения переиспользуются между запросами по CONN_MAX_AGE, и PRAGMA
+выполняются один раз на соединение.
+
+    DATABASES = {
+        "default": {
+            "ENGINE": "yatube.sqlite_backend",
+            "NAME": "db.sqlite3",
+            "CONN_MAX_AGE": 60,
+            "OPTIONS": {"synchronous": "NORMAL", "busy_timeout": 5000},
+        }
+    }
+"""
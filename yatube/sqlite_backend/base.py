@@ -0,0 +1,90 @@
+import random
+import time
+from sqlite3 import OperationalError
+
+from django.db.backends.sqlite3 import base
+
+
+# Значения OPTIONS по умолчанию; эти ключи не передаются в sqlite3.connect()
+DEFAULTS = {
+    "journal_mode": "WAL",
+    # В режиме WAL NORMAL не теряет целостность при сбое питания, но может
+    # потерять последние транзакции; FULL — fsync на каждый коммит
+    "synchronous": "NORMAL",
+    # Отрицательное значение — размер кэша страниц в КиБ
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    "busy_timeout": 5000,
+    "transaction_mode": "IMMEDIATE",
+    "lock_retries": 5,
+    "lock_backoff": 0.02,
+}
+
+PRAGMAS = ("journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout")
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+
+def is_locked(error):
+    return "database is locked" in str(error) or "database table is locked" in str(error)
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    wrapper = None
+
+    def execute(self, query, params=None):
+        return self.wrapper.retry_locked(super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        return self.wrapper.retry_locked(super().executemany, query, param_list)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict["OPTIONS"]
+        self.tuning = {
+            name: options.get(name, default) for name, default in DEFAULTS.items()
+        }
+        if self.tuning["transaction_mode"].upper() not in TRANSACTION_MODES:
+            raise ValueError(
+                "transaction_mode must be one of %s" % ", ".join(TRANSACTION_MODES))
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for name in DEFAULTS:
+            kwargs.pop(name, None)
+        # Тот же busy_timeout, который ставит PRAGMA, в секундах
+        kwargs["timeout"] = self.tuning["busy_timeout"] / 1000
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name in PRAGMAS:
+            conn.execute("PRAGMA %s = %s" % (name, self.tuning[name]))
+        return conn
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.wrapper = self
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        # Как и другие запросы вне транзакции, BEGIN повторяется при
+        # занятой базе
+        self.cursor().execute("BEGIN %s" % self.tuning["transaction_mode"].upper())
+
+    def retry_locked(self, func, *args):
+        """
+        Выполняет func, повторяя её, пока база занята. Внутри транзакции
+        повтор не поможет: блокировки, которые она держит, останутся, —
+        ошибка сразу уходит вызывающему коду.
+        """
+        retries = self.tuning["lock_retries"]
+        for attempt in range(retries + 1):
+            try:
+                return func(*args)
+            except OperationalError as error:
+                if self.in_atomic_block or attempt == retries or not is_locked(error):
+                    raise
+            time.sleep(self.tuning["lock_backoff"] * 2 ** attempt * random.uniform(0.5, 1.5))
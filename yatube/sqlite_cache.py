@@ -0,0 +1,297 @@
+"""
+Кэш в файле SQLite, общий для всех воркеров на одном сервере.
+
+LocMemCache у каждого процесса свой, и сброс версии ленты в одном воркере
+не виден остальным. Этот бэкенд хранит записи в одном файле базы в режиме
+WAL: чтения не блокируют запись, а incr() выполняется в транзакции
+BEGIN IMMEDIATE и атомарен между процессами.
+
+Вытеснение: сначала истёкшие записи, затем давно не читанные (LRU), пока
+объём значений не уложится в MAX_BYTES и число записей — в MAX_ENTRIES.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "yatube.sqlite_cache.SQLiteCache",
+            "LOCATION": "/var/tmp/yatube-cache.sqlite3",
+            "OPTIONS": {"MAX_BYTES": 64 * 1024 * 1024, "MAX_ENTRIES": 100000},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+# Время последнего чтения обновляется не чаще раза в секунду на запись,
+# чтобы чтения не превращались в запись
+ACCESS_RESOLUTION = 1.0
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS cache ("
+    " key TEXT PRIMARY KEY,"
+    " value BLOB NOT NULL,"
+    " expires REAL,"
+    " accessed REAL NOT NULL,"
+    " size INTEGER NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)",
+    "CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)",
+    "CREATE TABLE IF NOT EXISTS cache_stats ("
+    " id INTEGER PRIMARY KEY CHECK (id = 1),"
+    " entries INTEGER NOT NULL,"
+    " bytes INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO cache_stats VALUES (1, 0, 0)",
+)
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._path = location
+        self._max_bytes = int(options.get("MAX_BYTES", 64 * 1024 * 1024))
+        self._busy_timeout = float(options.get("BUSY_TIMEOUT", 5.0))
+        self._local = threading.local()
+
+    # Соединения: своё у каждого потока, новое после fork()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(
+            self._path, timeout=self._busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, func):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(conn)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        return result
+
+    # Внутренние операции, вызываются внутри транзакции записи
+
+    @staticmethod
+    def _remove(conn, key):
+        row = conn.execute(
+            "SELECT size FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        conn.execute(
+            "UPDATE cache_stats SET entries = entries - 1, bytes = bytes - ?",
+            (row[0],))
+        return True
+
+    def _store(self, conn, key, value, expires, now):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._remove(conn, key)
+        conn.execute(
+            "INSERT INTO cache (key, value, expires, accessed, size)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, data, expires, now, len(data)))
+        conn.execute(
+            "UPDATE cache_stats SET entries = entries + 1, bytes = bytes + ?",
+            (len(data),))
+        self._cull(conn, now)
+
+    def _cull(self, conn, now):
+        entries, size = conn.execute(
+            "SELECT entries, bytes FROM cache_stats").fetchone()
+        if entries <= self._max_entries and size <= self._max_bytes:
+            return
+        conn.execute("DELETE FROM cache WHERE expires <= ?", (now,))
+        entries, size = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if entries > self._max_entries or size > self._max_bytes:
+            # Как и в других бэкендах Django, удаляем сразу 1/CULL_FREQUENCY
+            # записей, чтобы не вытеснять по одной на каждом set()
+            victims = max(entries // self._cull_frequency, 1)
+            while entries > 0 and (
+                    entries > self._max_entries or size > self._max_bytes):
+                conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    " SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                    (victims,))
+                entries, size = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+                ).fetchone()
+        conn.execute(
+            "UPDATE cache_stats SET entries = ?, bytes = ?", (entries, size))
+
+    def _touch_accessed(self, conn, keys, now):
+        # Чтение не ждёт блокировку записи: без ожидания (busy_timeout = 0),
+        # а если база занята, отметка для LRU просто пропускается
+        conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            conn.execute(
+                "UPDATE cache SET accessed = ? WHERE key IN (%s)"
+                % ", ".join("?" * len(keys)), [now, *keys])
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.execute(
+                "PRAGMA busy_timeout = %d" % int(self._busy_timeout * 1000))
+
+    @staticmethod
+    def _alive(row, now):
+        return row is not None and (row[1] is None or row[1] > now)
+
+    # API кэша Django
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+
+        def add(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT value, expires FROM cache WHERE key = ?",
+                (key,)).fetchone()
+            if self._alive(row, now):
+                return False
+            self._store(conn, key, value, expires, now)
+            return True
+        return self._write(add)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires, accessed FROM cache WHERE key = ?",
+            (key,)).fetchone()
+        if not self._alive(row, now):
+            return default
+        if now - row[2] > ACCESS_RESOLUTION:
+            self._touch_accessed(conn, [key], now)
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        mapping = {self.make_key(key, version=version): key for key in keys}
+        for key in mapping:
+            self.validate_key(key)
+        if not mapping:
+            return {}
+        conn = self._connection()
+        now = time.time()
+        placeholders = ", ".join("?" * len(mapping))
+        rows = conn.execute(
+            "SELECT key, value, expires, accessed FROM cache WHERE key IN (%s)"
+            % placeholders, list(mapping)).fetchall()
+        found = {}
+        stale = []
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                continue
+            found[mapping[key]] = pickle.loads(value)
+            if now - accessed > ACCESS_RESOLUTION:
+                stale.append(key)
+        # Карточки постов читаются только через get_many: без отметки
+        # их вытесняли бы первыми
+        if stale:
+            self._touch_accessed(conn, stale, now)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+        self._write(
+            lambda conn: self._store(conn, key, value, expires, time.time()))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        items = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            items.append((key, value))
+
+        def set_many(conn):
+            now = time.time()
+            for key, value in items:
+                self._store(conn, key, value, expires, now)
+        self._write(set_many)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+
+        def touch(conn):
+            cursor = conn.execute(
+                "UPDATE cache SET expires = ? WHERE key = ?"
+                " AND (expires IS NULL OR expires > ?)",
+                (expires, key, time.time()))
+            return cursor.rowcount > 0
+        return self._write(touch)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def incr(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT value, expires, size FROM cache WHERE key = ?",
+                (key,)).fetchone()
+            if not self._alive(row, now):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            conn.execute(
+                "UPDATE cache SET value = ?, accessed = ?, size = ?"
+                " WHERE key = ?", (data, now, len(data), key))
+            # Счётчик обычно не меняет размер, и строку статистики
+            # переписывать не нужно
+            if len(data) != row[2]:
+                conn.execute(
+                    "UPDATE cache_stats SET bytes = bytes + ?",
+                    (len(data) - row[2],))
+            return value
+        return self._write(incr)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connection().execute(
+            "SELECT value, expires FROM cache WHERE key = ?",
+            (key,)).fetchone()
+        return self._alive(row, time.time())
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(lambda conn: self._remove(conn, key))
+
+    def clear(self):
+        def clear(conn):
+            conn.execute("DELETE FROM cache")
+            conn.execute("UPDATE cache_stats SET entries = 0, bytes = 0")
+        self._write(clear)
+
+    def close(self, **kwargs):
+        # Соединение переиспользуется между запросами, как у CONN_MAX_AGE
+        pass
@@ -0,0 +1,72 @@
+"""
+Настройки тестов. settings.py о тестах не знает: pytest (фикстура в
+tests/conftest.py) и manage.py test (TEST_RUNNER) подменяют настройки
+сами на время прогона.
+
+Файловый кэш и журнал запросов тестов лежат во временном каталоге: тесты
+очищают кэш перед каждым тестом и не должны трогать кэш и журнал
+разработчика. Задачи очереди выполняются сразу, ограничение частоты
+запросов выключено.
+"""
+import copy
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def test_settings(directory):
+    """Подмена настроек на время тестов; directory — временный каталог."""
+    caches = copy.deepcopy(settings.CACHES)
+    caches["default"]["LOCATION"] = os.path.join(directory, "cache.sqlite3")
+    return {
+        "CACHES": caches,
+        "QUERY_LOG_FILE": os.path.join(directory, "querylog.jsonl"),
+        # тесты проверяют результат запроса сразу, без воркеров очереди
+        "JOBS_EAGER": True,
+        # id пользователей и адрес клиента в тестах одни и те же; тесты
+        # ограничения включают его сами
+        "RATELIMIT_ENABLED": False,
+    }
+
+
+def redirect_query_log(path):
+    """
+    LOGGING применяется один раз при django.setup(), и override_settings
+    его не меняет: обработчик журнала запросов подменяется напрямую.
+    Возвращает функцию, которая вернёт прежние обработчики.
+    """
+    logger = logging.getLogger("yatube.querylog")
+    handlers = logger.handlers[:]
+    handler = logging.FileHandler(path, delay=True)
+    for previous in handlers:
+        handler.setFormatter(previous.formatter)
+        logger.removeHandler(previous)
+    logger.addHandler(handler)
+
+    def restore():
+        logger.removeHandler(handler)
+        handler.close()
+        for previous in handlers:
+            logger.addHandler(previous)
+    return restore
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._directory = tempfile.mkdtemp(prefix="yatube-test-")
+        self._settings = override_settings(**test_settings(self._directory))
+        self._settings.enable()
+        self._restore_query_log = redirect_query_log(settings.QUERY_LOG_FILE)
+
+    def teardown_test_environment(self, **kwargs):
+        self._restore_query_log()
+        self._settings.disable()
+        shutil.rmtree(self._directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
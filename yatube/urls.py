@@ -20,6 +20,8 @@ from django.conf.urls import handler404, handler500
 from django.conf import settings
 from django.conf.urls.static import static
 
+from yatube.instrumentation import performance_view
+
 
 
 handler404 = "posts.views.page_not_found" #noqa
@@ -34,6 +36,8 @@ urlpatterns = [
     path("auth/", include("django.contrib.auth.urls")),
 
     # раздел администратора
+    path("admin/performance/", admin.site.admin_view(performance_view),
+         name="performance"),
     path("admin/", admin.site.urls),
 
     # flatpages